@@ -0,0 +1,224 @@
+"""
+Планировщик анимаций
+- Обработчик сначала считает и фиксирует исход, потом отдаёт кадры сюда и сразу возвращается
+- Кадры играются в отдельной задаче — сессия БД и соединение из пула не держатся на время анимации
+- Кадры одного сообщения идут строго по очереди (финальный текст — после анимации)
+- Ошибка редактирования (сообщение удалено, текст не изменился) не обрывает цепочку
+- Лимиты Telegram: общий token bucket на все правки и рассылки + пауза между правками в одном чате.
+  Под нагрузкой промежуточные кадры выбрасываются, итоговый доставляется всегда
+"""
+import asyncio
+import time
+from typing import NamedTuple
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup, Message
+
+from logger import logger
+
+
+ANIMATION_GLOBAL_RATE = 25  # Правок в секунду на весь бот (лимит Telegram ~30 сообщений/с)
+ANIMATION_GLOBAL_BURST = 25  # Ёмкость bucket
+ANIMATION_CHAT_INTERVAL = 0.25  # Минимум секунд между правками в одном чате
+ANIMATION_MAX_LAG = 0.1  # На сколько можно задержать промежуточный кадр, дальше — выбросить
+ANIMATION_FINAL_RETRIES = 5  # Попыток доставить итоговый кадр при flood-wait
+ANIMATION_PRUNE_CHATS = 10_000  # Сколько чатов помнить, прежде чем вычистить отработавшие паузы
+
+
+class Frame(NamedTuple):
+    """Кадр анимации"""
+    text: str
+    delay: float = 0.0  # Пауза после показа кадра (секунд)
+    reply_markup: InlineKeyboardMarkup | None = None
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> bool:
+        """Взять токен, если есть"""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def take(self) -> None:
+        """Дождаться токена"""
+        while not self.try_take():
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Последняя поставленная задача по сообщению: (chat_id, message_id) -> task
+_chains: dict[tuple[int, int], asyncio.Task] = {}
+
+# Общий лимит исходящих сообщений бота: правки анимаций и рассылки (notifications.py) берут из одного bucket
+telegram_bucket = TokenBucket(ANIMATION_GLOBAL_RATE, ANIMATION_GLOBAL_BURST)
+_chat_next: dict[int, float] = {}  # chat_id -> когда можно следующую правку (monotonic)
+
+_stats = {
+    "frames_sent": 0,
+    "frames_dropped": 0,
+    "flood_waits": 0,
+    "flood_wait_seconds": 0.0,
+}
+
+
+def _chat_wait(chat_id: int) -> float:
+    """Сколько ждать до следующей правки в чате"""
+    return max(0.0, _chat_next.get(chat_id, 0.0) - time.monotonic())
+
+
+def _mark_edit(chat_id: int, pause: float = ANIMATION_CHAT_INTERVAL) -> None:
+    _chat_next[chat_id] = max(_chat_next.get(chat_id, 0.0), time.monotonic() + pause)
+
+
+def _flood_wait(chat_id: int, retry_after: float) -> None:
+    """Telegram попросил подождать — до этого момента чат не трогаем"""
+    _stats["flood_waits"] += 1
+    _stats["flood_wait_seconds"] += retry_after
+    _mark_edit(chat_id, retry_after)
+    logger.warning(f"[Gamification] Flood-wait {retry_after}с в чате {chat_id}")
+
+
+def _prune_chats() -> None:
+    """Забыть чаты, где пауза уже прошла"""
+    now = time.monotonic()
+    for chat_id in [chat_id for chat_id, ready in _chat_next.items() if ready <= now]:
+        del _chat_next[chat_id]
+
+
+async def _show_frame(message: Message, frame: Frame) -> None:
+    """Промежуточный кадр: показать, только если укладываемся в лимиты, иначе выбросить"""
+    chat_id = message.chat.id
+    wait = _chat_wait(chat_id)
+    if wait > ANIMATION_MAX_LAG or not telegram_bucket.try_take():
+        _stats["frames_dropped"] += 1
+        return
+    if wait:
+        await asyncio.sleep(wait)
+
+    _mark_edit(chat_id)
+    try:
+        await message.edit_text(frame.text, reply_markup=frame.reply_markup)
+        _stats["frames_sent"] += 1
+    except TelegramRetryAfter as e:
+        _flood_wait(chat_id, e.retry_after)
+        _stats["frames_dropped"] += 1
+    except Exception as e:
+        logger.debug(f"[Gamification] Кадр анимации не показан: {e}")
+
+
+async def _deliver_final(message: Message, frame: Frame) -> None:
+    """
+    Итоговый кадр: ждём лимиты и flood-wait сколько нужно.
+    Если сообщение не отредактировать — отправляем итог новым сообщением.
+    """
+    chat_id = message.chat.id
+    send_new = False
+
+    for _ in range(ANIMATION_FINAL_RETRIES):
+        wait = _chat_wait(chat_id)
+        if wait:
+            await asyncio.sleep(wait)
+        await telegram_bucket.take()
+        _mark_edit(chat_id)
+
+        try:
+            if send_new:
+                await message.answer(frame.text, reply_markup=frame.reply_markup)
+            else:
+                await message.edit_text(frame.text, reply_markup=frame.reply_markup)
+            _stats["frames_sent"] += 1
+            return
+        except TelegramRetryAfter as e:
+            _flood_wait(chat_id, e.retry_after)
+        except Exception as e:
+            if send_new or "not modified" in str(e):
+                logger.debug(f"[Gamification] Итоговый кадр не показан: {e}")
+                return
+            send_new = True
+
+    logger.warning(f"[Gamification] Итоговый кадр не доставлен в чат {chat_id}")
+
+
+async def play_frames(message: Message, frames) -> None:
+    """
+    Проиграть кадры в сообщении (ждёт окончания анимации).
+    Последний кадр — итог игры, доставляется всегда; промежуточные могут быть выброшены.
+    """
+    frames = list(frames)
+    for index, frame in enumerate(frames):
+        if index == len(frames) - 1:
+            await _deliver_final(message, frame)
+        else:
+            await _show_frame(message, frame)
+        if frame.delay:
+            await asyncio.sleep(frame.delay)
+
+
+async def _play_after(
+    previous: asyncio.Task | None, message: Message, frames: list[Frame], delay: float,
+) -> None:
+    if previous is not None:
+        await asyncio.wait([previous])
+    if delay:
+        await asyncio.sleep(delay)
+    try:
+        await play_frames(message, frames)
+    except Exception as e:
+        logger.warning(f"[Gamification] Ошибка анимации: {e}")
+
+
+def schedule_frames(message: Message, frames, delay: float = 0.0) -> asyncio.Task:
+    """
+    Поставить кадры в очередь сообщения и сразу вернуться.
+    Кадры одного сообщения играются после ранее поставленных.
+    delay — пауза перед первым кадром (сообщение только что отправлено со своим текстом).
+    """
+    if len(_chat_next) > ANIMATION_PRUNE_CHATS:
+        _prune_chats()
+
+    key = (message.chat.id, message.message_id)
+    previous = _chains.get(key)
+    if previous is not None and previous.done():
+        previous = None
+
+    task = asyncio.create_task(_play_after(previous, message, list(frames), delay))
+    _chains[key] = task
+
+    def _forget(done: asyncio.Task):
+        if _chains.get(key) is done:
+            del _chains[key]
+
+    task.add_done_callback(_forget)
+    return task
+
+
+def pending_animations() -> int:
+    """Сколько сообщений сейчас анимируется"""
+    return len(_chains)
+
+
+def animation_stats() -> dict:
+    """Метрики: показано/выброшено кадров, flood-wait (штук и секунд), активных анимаций"""
+    _prune_chats()
+    return {**_stats, "active": len(_chains), "paced_chats": len(_chat_next)}
+
+
+async def wait_animations() -> None:
+    """Дождаться всех анимаций (при остановке бота)"""
+    tasks = list(_chains.values())
+    if tasks:
+        await asyncio.wait(tasks)
@@ -0,0 +1,33 @@
+"""
+Скрипт для заполнения дневного роллапа выигрышей (fox_daily_wins) из истории игр.
+Запустить: python -m modules.gamification.backfill_daily_wins [дней]
+
+Без аргумента пересчитывает всю историю. Повторный запуск безопасен.
+"""
+import asyncio
+import sys
+import os
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from database.db import async_session_maker
+from modules.gamification.init_db import init_gamification_db
+from modules.gamification.leaderboard import backfill_daily_wins
+
+
+async def main(days: int | None):
+    """Создать таблицу (если нет) и пересчитать роллап"""
+    await init_gamification_db()
+    async with async_session_maker() as session:
+        rows = await backfill_daily_wins(session, days=days)
+    print(f"✅ Записано дней-игроков: {rows}")
+
+
+if __name__ == "__main__":
+    DAYS = int(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    period = f"последние {DAYS} дн." if DAYS else "вся история"
+    print(f"🦊 Пересчёт выигрышей по дням ({period})...")
+    asyncio.run(main(DAYS))
+    print("✅ Готово!")
@@ -0,0 +1,223 @@
+"""
+Бенчмарк индексов модуля.
+Запустить: python -m modules.gamification.bench_indexes [игроков]
+
+В отдельной схеме fox_bench создаёт копии таблиц модуля (без индексов и FK),
+заполняет их синтетикой (по умолчанию 1 млн игроков), прогоняет горячие
+запросы модуля, показывает планы и задержки — сначала без индексов, потом
+с индексами из моделей. Рабочие таблицы не трогаются, схема удаляется в конце.
+"""
+import asyncio
+import random
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.db import engine
+from modules.gamification.db import get_active_boosts, get_active_prizes, get_last_deal
+from modules.gamification.init_db import init_gamification_db
+from modules.gamification.models import (
+    FoxBoost, FoxDeal, FoxGameHistory, FoxPlayer, FoxPrize, FoxQuest,
+)
+from modules.gamification.notifications import get_inactive_players
+from modules.gamification.quests import get_player_quests
+
+
+SCHEMA = "fox_bench"
+DEFAULT_PLAYERS = 1_000_000
+CALLS_PER_CASE = 200
+BENCH_TABLES = [FoxPlayer, FoxPrize, FoxGameHistory, FoxBoost, FoxDeal, FoxQuest]
+
+SEED_SQL = [
+    # 1 игрок на tg_id, ~5% никогда не заходили
+    """
+    INSERT INTO fox_players (
+        tg_id, coins, light, free_spins, paid_spins, total_games, total_wins,
+        login_streak, last_login_date, calendar_day, referral_bonus_given,
+        total_referrals, is_vip, created_at, updated_at
+    )
+    SELECT g, (random() * 5000)::int, 0, 0, 0, (random() * 300)::int, (random() * 100)::int,
+           (random() * 30)::int,
+           CASE WHEN random() < 0.05 THEN NULL ELSE now() - random() * interval '60 days' END,
+           0, false, 0, false, now(), now()
+    FROM generate_series(1, :n) g
+    """,
+    # 3 приза на игрока, 90% уже использованы
+    """
+    INSERT INTO fox_prizes (id, tg_id, prize_type, value, is_used, expires_at, created_at)
+    SELECT g, 1 + g % :n, 'coins', 10, random() < 0.9,
+           now() + (random() * 28 - 14) * interval '1 day', now() - random() * interval '30 days'
+    FROM generate_series(1, :n * 3) g
+    """,
+    # 1 буст на игрока, 80% израсходованы
+    """
+    INSERT INTO fox_boosts (id, tg_id, boost_type, uses_left, expires_at, created_at)
+    SELECT g, 1 + g % :n, 'luck_10', CASE WHEN random() < 0.8 THEN 0 ELSE 1 END,
+           CASE WHEN random() < 0.5 THEN NULL ELSE now() + (random() * 48 - 24) * interval '1 hour' END,
+           now()
+    FROM generate_series(1, :n) g
+    """,
+    # 4 квеста на игрока за последние 30 дней
+    """
+    INSERT INTO fox_quests (id, tg_id, quest_type, progress, target, is_completed, is_claimed, day, created_at)
+    SELECT g, 1 + g % :n, 'quest_' || g / :n, 0, 1, false, false, created_at::date, created_at
+    FROM (
+        SELECT g, now() - floor(random() * 30) * interval '1 day' AS created_at
+        FROM generate_series(1, :n * 4) g
+    ) q
+    """,
+    # 1 сделка на игрока
+    """
+    INSERT INTO fox_deals (
+        id, tg_id, stake_type, stake_value, won, multiplier, result_value, chance_percent, created_at
+    )
+    SELECT g, 1 + g % :n, 'coins', 50, random() < 0.4, 2.0, 0, 40, now() - random() * interval '60 days'
+    FROM generate_series(1, :n) g
+    """,
+    # 5 игр на игрока за последние 60 дней
+    """
+    INSERT INTO fox_game_history (id, tg_id, game_type, prize_type, prize_value, boost_used, created_at)
+    SELECT g, 1 + g % :n, 'slots', CASE WHEN random() < 0.6 THEN 'empty' ELSE 'coins' END, 10, false,
+           now() - random() * interval '60 days'
+    FROM generate_series(1, :n * 5) g
+    """,
+]
+
+
+async def _history_last_day(session: AsyncSession, tg_id: int):
+    """Окно по времени по истории игр (как у лидерборда/роллапа)"""
+    since = datetime.utcnow() - timedelta(days=1)
+    result = await session.execute(
+        select(func.count(FoxGameHistory.id)).where(FoxGameHistory.created_at >= since)
+    )
+    return result.scalar_one()
+
+
+async def _quests_legacy(session: AsyncSession, tg_id: int):
+    """Старый запрос квестов: date(created_at) == today — не sargable"""
+    result = await session.execute(
+        select(FoxQuest).where(
+            FoxQuest.tg_id == tg_id,
+            func.date(FoxQuest.created_at) == datetime.utcnow().date(),
+        )
+    )
+    return result.scalars().all()
+
+
+CASES = [
+    ("get_active_prizes", get_active_prizes),
+    ("get_active_boosts", get_active_boosts),
+    ("get_player_quests", get_player_quests),
+    ("quests (date() == today)", _quests_legacy),
+    ("get_last_deal", get_last_deal),
+    ("get_inactive_players", lambda session, tg_id: get_inactive_players(session, days=3, limit=100)),
+    ("history за сутки", _history_last_day),
+]
+
+
+async def prepare_schema(conn, players: int):
+    """Создать схему с копиями таблиц и заполнить их"""
+    await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    for model in BENCH_TABLES:
+        name = model.__tablename__
+        # LIKE без INCLUDING INDEXES — ни индексов, ни внешних ключей
+        await conn.execute(text(f"CREATE TABLE {SCHEMA}.{name} (LIKE public.{name} INCLUDING DEFAULTS)"))
+    await conn.execute(text(f"SET search_path TO {SCHEMA}, public"))
+
+    for sql in SEED_SQL:
+        started = time.perf_counter()
+        await conn.execute(text(sql), {"n": players})
+        await conn.commit()
+        print(f"   засеяно за {time.perf_counter() - started:.1f}с")
+
+    # Первичные ключи есть и без индексов модуля
+    for model in BENCH_TABLES:
+        pk = ", ".join(column.name for column in model.__table__.primary_key)
+        await conn.execute(text(f"ALTER TABLE {model.__tablename__} ADD PRIMARY KEY ({pk})"))
+    await conn.execute(text("ANALYZE"))
+    await conn.commit()
+
+
+async def run_cases(conn, players: int, title: str):
+    """Прогнать запросы: план последнего вызова + задержки"""
+    print(f"\n==================== {title} ====================")
+
+    captured = {}
+
+    def _capture(sync_conn, cursor, statement, parameters, context, executemany):
+        captured["statement"] = statement
+        captured["parameters"] = parameters
+
+    event.listen(conn.sync_connection, "before_cursor_execute", _capture)
+    try:
+        session = AsyncSession(bind=conn)
+        for name, case in CASES:
+            timings = []
+            for _ in range(CALLS_PER_CASE):
+                tg_id = random.randint(1, players)
+                started = time.perf_counter()
+                await case(session, tg_id)
+                timings.append((time.perf_counter() - started) * 1000)
+            session.expunge_all()
+
+            statement, parameters = captured["statement"], captured["parameters"]
+            timings.sort()
+            avg = sum(timings) / len(timings)
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"\n🔹 {name}: avg {avg:.2f} мс, p95 {p95:.2f} мс")
+
+            event.remove(conn.sync_connection, "before_cursor_execute", _capture)
+            plan = await conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+            event.listen(conn.sync_connection, "before_cursor_execute", _capture)
+            for (line,) in plan:
+                print(f"   {line}")
+        await session.close()
+    finally:
+        event.remove(conn.sync_connection, "before_cursor_execute", _capture)
+    await conn.rollback()
+
+
+def _create_indexes(sync_conn):
+    for model in BENCH_TABLES:
+        for index in model.__table__.indexes:
+            index.create(sync_conn)
+
+
+async def main(players: int):
+    await init_gamification_db()
+
+    async with engine.connect() as conn:
+        try:
+            print(f"🦊 Заполнение {SCHEMA}: {players} игроков...")
+            await prepare_schema(conn, players)
+
+            await run_cases(conn, players, "БЕЗ ИНДЕКСОВ")
+
+            await conn.execute(text(f"SET search_path TO {SCHEMA}, public"))
+            started = time.perf_counter()
+            await conn.run_sync(_create_indexes)
+            await conn.execute(text("ANALYZE"))
+            await conn.commit()
+            print(f"\n🔧 Индексы созданы за {time.perf_counter() - started:.1f}с")
+
+            await conn.execute(text(f"SET search_path TO {SCHEMA}, public"))
+            await run_cases(conn, players, "С ИНДЕКСАМИ")
+        finally:
+            await conn.rollback()
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.execute(text("RESET search_path"))
+            await conn.commit()
+
+
+if __name__ == "__main__":
+    PLAYERS = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PLAYERS
+    asyncio.run(main(PLAYERS))
+    print("\n✅ Готово!")
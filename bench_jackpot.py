@@ -0,0 +1,83 @@
+"""
+Нагрузочный тест банка джекпота.
+Запустить: python -m modules.gamification.bench_jackpot [вкладов_на_воркера]
+
+Гоняет параллельные вклады (каждый — отдельная транзакция, как в игре)
+для разного числа воркеров: сначала в один шард (как старая строка id=1),
+потом по всем шардам. Проверяет, что ни один вклад не потерян.
+Запускать на тестовой БД: в конце банк возвращается к исходному значению.
+"""
+import asyncio
+import random
+import sys
+import os
+import time
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from database.db import async_session_maker
+from modules.gamification.init_db import init_gamification_db
+from modules.gamification.jackpot import JACKPOT_SHARDS, add_to_jackpot_shard, get_jackpot_pool
+
+
+WORKERS = [1, 2, 4, 8, 16, 32]
+DEFAULT_OPS_PER_WORKER = 200
+
+
+async def _worker(ops: int, shards: int) -> int:
+    """Сделать ops вкладов, вернуть внесённую сумму"""
+    total = 0
+    async with async_session_maker() as session:
+        for _ in range(ops):
+            amount = random.randint(1, 10)
+            await add_to_jackpot_shard(session, amount, shard=random.randrange(shards))
+            total += amount
+    return total
+
+
+async def _pool() -> int:
+    async with async_session_maker() as session:
+        return await get_jackpot_pool(session)
+
+
+async def run_case(workers: int, shards: int, ops: int) -> tuple[float, bool]:
+    """Один прогон. Возвращает (вкладов в секунду, ничего не потеряно)."""
+    before = await _pool()
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_worker(ops, shards) for _ in range(workers)))
+    elapsed = time.perf_counter() - started
+
+    after = await _pool()
+    return workers * ops / elapsed, after - before == sum(results)
+
+
+async def main(ops: int):
+    await init_gamification_db()
+    initial = await _pool()
+
+    print(f"🦊 Банк джекпота: {initial}, вкладов на воркера: {ops}")
+    print(f"{'воркеры':>8} | {'1 шард, оп/с':>14} | {f'{JACKPOT_SHARDS} шардов, оп/с':>18} | потерь нет")
+
+    all_ok = True
+    for workers in WORKERS:
+        single_rate, single_ok = await run_case(workers, 1, ops)
+        striped_rate, striped_ok = await run_case(workers, JACKPOT_SHARDS, ops)
+        ok = single_ok and striped_ok
+        all_ok = all_ok and ok
+        print(f"{workers:>8} | {single_rate:>14.0f} | {striped_rate:>18.0f} | {'✅' if ok else '❌'}")
+
+    # Возвращаем банк к исходному значению
+    async with async_session_maker() as session:
+        await add_to_jackpot_shard(session, initial - await get_jackpot_pool(session), shard=0)
+
+    if not all_ok:
+        print("❌ Часть вкладов потеряна!")
+        sys.exit(1)
+    print("✅ Готово!")
+
+
+if __name__ == "__main__":
+    ops_per_worker = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_OPS_PER_WORKER
+    asyncio.run(main(ops_per_worker))
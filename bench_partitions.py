@@ -0,0 +1,163 @@
+"""
+Бенчмарк помесячных партиций истории игр.
+Запустить: python -m modules.gamification.bench_partitions [строк в месяц] [месяцев]
+
+В отдельной схеме fox_bench создаёт две копии fox_game_history — обычную и
+партиционированную по месяцам — и «проживает» на них months месяцев синтетики
+(по умолчанию 24 по 1 млн строк). После каждого месяца меряет вставку одной
+игры и оконные запросы лидерборда (топ за неделю, игры за сутки) относительно
+«текущего» момента. Для партиций задержки должны оставаться ровными, как бы
+ни росла история. Рабочие таблицы не трогаются, схема удаляется в конце.
+"""
+import asyncio
+import random
+import sys
+import os
+import time
+from datetime import datetime, timedelta
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+
+from database.db import engine
+from modules.gamification.init_db import init_gamification_db
+from modules.gamification.partitions import add_months, month_start, partition_ddl
+
+
+SCHEMA = "fox_bench"
+DEFAULT_ROWS_PER_MONTH = 1_000_000
+DEFAULT_MONTHS = 24
+PLAYERS = 100_000
+CALLS_PER_CASE = 100
+
+PLAIN = "history_plain"
+PARTITIONED = "history_partitioned"
+
+SEED_SQL = """
+INSERT INTO {table} (id, tg_id, game_type, prize_type, prize_value, boost_used, created_at)
+SELECT CAST(:first_id AS int) + g, 1 + (random() * (CAST(:players AS int) - 1))::int, 'slots',
+       CASE WHEN random() < 0.6 THEN 'empty' ELSE 'coins' END, 10, false,
+       CAST(:month AS timestamp) + random() * (CAST(:next_month AS timestamp) - CAST(:month AS timestamp))
+FROM generate_series(0, CAST(:n AS int) - 1) g
+"""
+
+INSERT_SQL = """
+INSERT INTO {table} (id, tg_id, game_type, prize_type, prize_value, boost_used, created_at)
+VALUES (:id, :tg_id, 'slots', 'coins', 10, false, :created_at)
+"""
+
+# Топ за неделю по истории (как пересчёт роллапа / лидерборд без роллапа)
+TOP_WEEK_SQL = """
+SELECT tg_id, count(*) AS wins FROM {table}
+WHERE created_at >= :since AND created_at < :now AND prize_type <> 'empty'
+GROUP BY tg_id ORDER BY wins DESC LIMIT 10
+"""
+
+LAST_DAY_SQL = "SELECT count(*) FROM {table} WHERE created_at >= :since AND created_at < :now"
+
+
+async def prepare_schema(conn, first_month, months: int):
+    """Схема с двумя копиями истории: обычной и партиционированной"""
+    await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    await conn.execute(text(f"SET search_path TO {SCHEMA}, public"))
+
+    # Без INCLUDING DEFAULTS — id задаём сами, последовательность рабочей таблицы не трогаем
+    await conn.execute(text(f"CREATE TABLE {PLAIN} (LIKE public.fox_game_history)"))
+    await conn.execute(text(f"ALTER TABLE {PLAIN} ADD PRIMARY KEY (id, created_at)"))
+    await conn.execute(text(
+        f"CREATE TABLE {PARTITIONED} (LIKE public.fox_game_history) PARTITION BY RANGE (created_at)"
+    ))
+    await conn.execute(text(f"ALTER TABLE {PARTITIONED} ADD PRIMARY KEY (id, created_at)"))
+    for table in (PLAIN, PARTITIONED):
+        await conn.execute(text(f"CREATE INDEX ON {table} (created_at)"))
+        await conn.execute(text(f"CREATE INDEX ON {table} (tg_id)"))
+    for index in range(months + 1):
+        await conn.execute(text(partition_ddl(PARTITIONED, add_months(first_month, index))))
+    await conn.commit()
+
+
+async def _measure(conn, sql: str, params) -> float:
+    """Среднее время вызова, мс (params — функция, выдающая параметры вызова)"""
+    timings = []
+    for _ in range(CALLS_PER_CASE):
+        started = time.perf_counter()
+        await conn.execute(text(sql), params())
+        timings.append((time.perf_counter() - started) * 1000)
+    return sum(timings) / len(timings)
+
+
+async def run_month(conn, month, rows: int, next_id: int) -> tuple[int, dict]:
+    """Засеять месяц в обе таблицы и замерить задержки на конец месяца"""
+    next_month = add_months(month, 1)
+    for table in (PLAIN, PARTITIONED):
+        await conn.execute(
+            text(SEED_SQL.format(table=table)),
+            {
+                "first_id": next_id, "players": PLAYERS, "n": rows,
+                "month": datetime.combine(month, datetime.min.time()),
+                "next_month": datetime.combine(next_month, datetime.min.time()),
+            },
+        )
+    await conn.commit()
+    await conn.execute(text(f"ANALYZE {PLAIN}"))
+    await conn.execute(text(f"ANALYZE {PARTITIONED}"))
+    await conn.commit()
+    next_id += rows
+
+    now = datetime.combine(next_month, datetime.min.time()) - timedelta(minutes=1)
+    results = {}
+    for table in (PLAIN, PARTITIONED):
+        ids = iter(range(next_id, next_id + CALLS_PER_CASE))
+        results[table] = (
+            await _measure(conn, INSERT_SQL.format(table=table), lambda: {
+                "id": next(ids), "tg_id": random.randint(1, PLAYERS), "created_at": now,
+            }),
+            await _measure(conn, TOP_WEEK_SQL.format(table=table), lambda: {
+                "since": now - timedelta(days=7), "now": now,
+            }),
+            await _measure(conn, LAST_DAY_SQL.format(table=table), lambda: {
+                "since": now - timedelta(days=1), "now": now,
+            }),
+        )
+    await conn.rollback()  # Вставки замера не копим
+    return next_id, results
+
+
+async def main(rows: int, months: int):
+    await init_gamification_db()
+
+    first_month = add_months(month_start(datetime.utcnow()), -months)
+    async with engine.connect() as conn:
+        try:
+            print(f"🦊 {months} мес. по {rows} строк, {PLAYERS} игроков")
+            await prepare_schema(conn, first_month, months)
+
+            print(
+                f"\n{'месяц':>7} {'строк':>12} | {'вставка, мс':^19} | {'топ недели, мс':^19} | {'за сутки, мс':^19}"
+                f"\n{'':>7} {'':>12} | {'обычная':>9} {'партиц.':>9} | {'обычная':>9} {'партиц.':>9}"
+                f" | {'обычная':>9} {'партиц.':>9}"
+            )
+            next_id = 1
+            for index in range(months):
+                month = add_months(first_month, index)
+                next_id, results = await run_month(conn, month, rows, next_id)
+                plain, partitioned = results[PLAIN], results[PARTITIONED]
+                print(
+                    f"{month:%Y-%m} {next_id - 1:>12} | "
+                    + " | ".join(f"{plain[i]:>9.2f} {partitioned[i]:>9.2f}" for i in range(3))
+                )
+        finally:
+            await conn.rollback()
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.execute(text("RESET search_path"))
+            await conn.commit()
+
+
+if __name__ == "__main__":
+    ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS_PER_MONTH
+    MONTHS = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_MONTHS
+    asyncio.run(main(ROWS, MONTHS))
+    print("\n✅ Готово!")
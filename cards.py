@@ -0,0 +1,142 @@
+"""
+Карточный движок казино
+- Карта — int 0..51: ранг = card // 4 (A, 2..10, J, Q, K), масть = card % 4
+- Колода и руки — bytearray (байт на карту), очки и подписи — готовые таблицы
+- BlackjackHand / HiloGame — состояние игры в __slots__, компактно сериализуется для хранилища
+"""
+import random
+
+
+RANKS = ("A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K")
+SUITS = ("♠️", "♥️", "♦️", "♣️")
+
+# Очки по рангу (туз — 11, при переборе считается за 1)
+RANK_POINTS = bytes((11, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10))
+
+# Таблицы по номеру карты
+CARD_POINTS = bytes(RANK_POINTS[card // 4] for card in range(52))
+CARD_LABELS = tuple(f"{RANKS[card // 4]}{SUITS[card % 4]}" for card in range(52))
+ACES = 4  # Карты 0..3 — тузы
+
+DEALER_STANDS_ON = 17  # Лиса добирает до 17+
+
+
+def new_deck() -> bytearray:
+    """Перемешанная колода"""
+    deck = bytearray(range(52))
+    random.shuffle(deck)
+    return deck
+
+
+def hand_points(hand) -> int:
+    """Очки руки в блэкджэке"""
+    total = 0
+    aces = 0
+    for card in hand:
+        total += CARD_POINTS[card]
+        if card < ACES:
+            aces += 1
+
+    # Пересчитываем тузы если перебор
+    while total > 21 and aces:
+        total -= 10
+        aces -= 1
+
+    return total
+
+
+def format_hand(hand) -> str:
+    """Форматирование руки"""
+    return " ".join(f"[ {CARD_LABELS[card]} ]" for card in hand)
+
+
+class BlackjackHand:
+    """Раздача блэкджэка"""
+    __slots__ = ("bet", "player", "dealer", "deck", "reserved")
+
+    def __init__(
+        self, bet: int, player: bytearray, dealer: bytearray, deck: bytearray, reserved: bool = False,
+    ):
+        self.bet = bet
+        self.player = player
+        self.dealer = dealer
+        self.deck = deck
+        self.reserved = reserved  # Ставка списана при раздаче
+
+    @classmethod
+    def deal(cls, bet: int, reserved: bool = False) -> "BlackjackHand":
+        """Новая раздача: по 2 карты игроку и Лисе"""
+        deck = new_deck()
+        player = bytearray((deck.pop(), deck.pop()))
+        dealer = bytearray((deck.pop(), deck.pop()))
+        return cls(bet, player, dealer, deck, reserved)
+
+    def hit(self) -> int:
+        """Карта игроку"""
+        card = self.deck.pop()
+        self.player.append(card)
+        return card
+
+    def dealer_hit(self) -> int:
+        """Карта Лисе"""
+        card = self.deck.pop()
+        self.dealer.append(card)
+        return card
+
+    @property
+    def player_points(self) -> int:
+        return hand_points(self.player)
+
+    @property
+    def dealer_points(self) -> int:
+        return hand_points(self.dealer)
+
+    def to_state(self) -> dict:
+        """Для хранилища: карты — hex-строки (2 символа на карту)"""
+        return {
+            "bet": self.bet,
+            "player": self.player.hex(),
+            "dealer": self.dealer.hex(),
+            "deck": self.deck.hex(),
+            "reserved": self.reserved,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "BlackjackHand":
+        return cls(
+            state["bet"],
+            bytearray.fromhex(state["player"]),
+            bytearray.fromhex(state["dealer"]),
+            bytearray.fromhex(state["deck"]),
+            state.get("reserved", False),
+        )
+
+
+class HiloGame:
+    """Игра Выше/Ниже"""
+    __slots__ = ("bet", "number", "multiplier", "round", "reserved")
+
+    def __init__(self, bet: int, number: int, multiplier: float = 1.0, round: int = 1, reserved: bool = False):
+        self.bet = bet
+        self.number = number
+        self.multiplier = multiplier
+        self.round = round
+        self.reserved = reserved  # Ставка списана при раздаче
+
+    @property
+    def current_win(self) -> int:
+        """Выигрыш, если забрать сейчас"""
+        return int(self.bet * self.multiplier)
+
+    def to_state(self) -> dict:
+        return {
+            "bet": self.bet,
+            "number": self.number,
+            "multiplier": self.multiplier,
+            "round": self.round,
+            "reserved": self.reserved,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "HiloGame":
+        return cls(state["bet"], state["number"], state["multiplier"], state["round"], state.get("reserved", False))
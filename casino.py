@@ -17,13 +17,14 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 
-from sqlalchemy import select, func, update
+from sqlalchemy import column, select, func, table, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.users import get_balance, update_balance
 from logger import logger
 
-from .models import FoxCasinoGame, FoxCasinoSession, FoxCasinoProfile
+from .casino_ledger import record_bet
+from .models import FoxCasinoSession, FoxCasinoProfile
 
 
 # ==================== НАСТРОЙКИ ====================
@@ -581,11 +582,12 @@ async def can_enter_casino(session: AsyncSession, tg_id: int) -> tuple[bool, str
     return True, "ok", {"balance": balance}
 
 
-async def can_play_bet(session: AsyncSession, tg_id: int, bet: float) -> tuple[bool, str]:
-    """Проверить конкретную ставку."""
-    balance = await get_balance(session, tg_id)
-    
-    if balance < bet:
+async def can_play_bet(session: AsyncSession, tg_id: int, bet: float, check_balance: bool = True) -> tuple[bool, str]:
+    """
+    Проверить конкретную ставку.
+    check_balance=False — баланс проверит сам расчёт (settle_balance), лишний SELECT не нужен.
+    """
+    if check_balance and await get_balance(session, tg_id) < bet:
         return False, "no_balance"
     if bet < MIN_BET:
         return False, "min_bet"
@@ -595,6 +597,49 @@ async def can_play_bet(session: AsyncSession, tg_id: int, bet: float) -> tuple[b
     return True, "ok"
 
 
+# ==================== РАСЧЁТ СТАВКИ ====================
+
+# Баланс игрока — в таблице бота users; меняется только через database.users.update_balance,
+# здесь — колонки для блокирующего чтения
+_users = table("users", column("tg_id"), column("balance"))
+
+
+async def settle_balance(session: AsyncSession, tg_id: int, debit: int = 0, credit: int = 0) -> int | None:
+    """
+    Списать debit, начислить credit и вернуть новый баланс.
+    Строка users блокируется (SELECT ... FOR UPDATE) до конца транзакции: проверка
+    balance >= debit и изменение через update_balance идут под блокировкой —
+    две одновременные ставки не уведут баланс в минус.
+    None — баланса не хватило, ничего не списано. Коммит — за вызывающим.
+    """
+    balance = (await session.execute(
+        select(_users.c.balance).where(_users.c.tg_id == tg_id).with_for_update()
+    )).scalar_one_or_none()
+    if balance is None or balance < debit:
+        return None
+    if credit != debit:
+        await update_balance(session, tg_id, credit - debit)
+    return int(balance + credit - debit)
+
+
+async def reserve_bet(session: AsyncSession, tg_id: int, bet: int) -> int | None:
+    """
+    Списать ставку карточной игры при раздаче (расчёт — record_casino_game(reserved=True)).
+    Возвращает новый баланс; None — не хватает баланса, раздачу не начинаем.
+    """
+    balance = await settle_balance(session, tg_id, debit=bet)
+    if balance is not None:
+        await session.commit()
+    return balance
+
+
+async def release_bet(session: AsyncSession, tg_id: int, bet: int) -> int | None:
+    """Вернуть зарезервированную ставку (ничья без расчёта, брошенная раздача при "refund")"""
+    balance = await settle_balance(session, tg_id, credit=bet)
+    await session.commit()
+    return balance
+
+
 # ==================== ПРИВЕТСТВЕННЫЕ СООБЩЕНИЯ ====================
 
 def is_night_mode() -> bool:
@@ -686,12 +731,18 @@ async def get_current_session(session: AsyncSession, tg_id: int) -> Optional[Fox
 
 async def end_session(session: AsyncSession, tg_id: int) -> Optional[str]:
     """Завершить сессию и вернуть текст статистики."""
+    from .casino_ledger import flush_casino_ledger
+    
     profile = await get_or_create_casino_profile(session, tg_id)
     casino_session = await get_current_session(session, tg_id)
     
     if not casino_session:
         return None
     
+    # Счётчики сессии считает журнал ставок — дописываем его и перечитываем сессию
+    await flush_casino_ledger()
+    await session.refresh(casino_session)
+    
     # Закрываем сессию
     casino_session.is_active = False
     casino_session.ended_at = datetime.utcnow()
@@ -738,46 +789,52 @@ async def end_session(session: AsyncSession, tg_id: int) -> Optional[str]:
 # ==================== ИГРОВАЯ ЛОГИКА ====================
 
 async def add_to_jackpot(session: AsyncSession, amount: int):
-    """Добавить в джекпот."""
-    from .jackpot import get_or_create_jackpot
-    jackpot = await get_or_create_jackpot(session)
-    jackpot.pool += amount
-    await session.commit()
+    """Добавить в джекпот (вклад копится в памяти, в БД пишется фоном)."""
+    from .jackpot import add_to_jackpot as add_to_jackpot_pool
+    await add_to_jackpot_pool(session, amount)
 
 
 async def win_jackpot(session: AsyncSession, tg_id: int) -> int:
     """Выиграть джекпот. Возвращает сумму."""
-    from .jackpot import get_or_create_jackpot, FoxJackpotWin, JACKPOT_START_POOL
-    jackpot = await get_or_create_jackpot(session)
-    
-    amount = jackpot.pool
-    
-    # Сбрасываем джекпот
-    jackpot.pool = JACKPOT_START_POOL
-    jackpot.last_winner_id = tg_id
-    jackpot.last_win_amount = amount
-    jackpot.last_win_date = datetime.utcnow()
-    jackpot.total_won += amount
-    
-    # Записываем выигрыш
-    win_record = FoxJackpotWin(tg_id=tg_id, amount=amount)
-    session.add(win_record)
-    
-    await session.commit()
-    return amount
+    from .jackpot import drain_jackpot
+    return await drain_jackpot(session, tg_id)
 
 
 async def get_current_jackpot(session: AsyncSession) -> int:
-    """Получить текущий размер джекпота."""
-    from .jackpot import get_or_create_jackpot
-    jackpot = await get_or_create_jackpot(session)
-    return jackpot.pool
+    """Получить текущий размер джекпота для меню (через кеш с TTL)."""
+    from .jackpot import get_cached_jackpot_pool
+    return await get_cached_jackpot_pool(session)
 
 
-async def play_casino_phase1(session: AsyncSession, tg_id: int, bet: int) -> tuple[CasinoResult | Phase1Result, str]:
+def phase1_thresholds(bonus_x2: float = 0.0, bonus_x3: float = 0.0) -> tuple[float, float, float, float]:
+    """
+    Пороги броска первой фазы (roll от 0 до 100) с учётом бонусов.
+    Возвращает (проигрыш, ×1.5, ×2, ×3), всё что выше — ×5.
+    Используется и в игре, и в симуляторе (simulator.py).
+    """
+    chance_win_x15 = BASE_CHANCE_WIN_X15
+    chance_win_x2 = BASE_CHANCE_WIN_X2 + bonus_x2
+    chance_win_x3 = BASE_CHANCE_WIN_X3 + bonus_x3
+    chance_win_x5 = BASE_CHANCE_WIN_X5
+    
+    # Корректируем проигрыш чтобы сумма была 100
+    total_wins = chance_win_x15 + chance_win_x2 + chance_win_x3 + chance_win_x5
+    chance_lose = 100.0 - total_wins
+    
+    # Пороги
+    threshold_lose = chance_lose
+    threshold_x15 = threshold_lose + chance_win_x15
+    threshold_x2 = threshold_x15 + chance_win_x2
+    threshold_x3 = threshold_x2 + chance_win_x3
+    # threshold_x5 = 100 (всё что осталось)
+    return threshold_lose, threshold_x15, threshold_x2, threshold_x3
+
+
+async def play_casino_phase1(session: AsyncSession, tg_id: int, bet: int) -> tuple[CasinoResult | Phase1Result | None, str]:
     """
     Первая фаза игры.
     Возвращает либо финальный результат, либо промежуточный (для риска).
+    (None, "no_balance") — баланса не хватило на ставку.
     
     Математика (маржа ~40%):
     - 65% проигрыш (с шансом 0.2% на джекпот!)
@@ -791,15 +848,6 @@ async def play_casino_phase1(session: AsyncSession, tg_id: int, bet: int) -> tup
     profile = await get_or_create_casino_profile(session, tg_id)
     casino_session = await get_current_session(session, tg_id)
     
-    # Списываем ставку
-    await update_balance(session, tg_id, -bet)
-    
-    # 5% от ставки идёт в джекпот
-    jackpot_contribution = max(1, int(bet * JACKPOT_CONTRIBUTION))
-    await add_to_jackpot(session, jackpot_contribution)
-    
-    balance = int(await get_balance(session, tg_id))
-    
     # Модификаторы шансов
     bonus_x2 = 0.0
     bonus_x3 = 0.0
@@ -815,35 +863,38 @@ async def play_casino_phase1(session: AsyncSession, tg_id: int, bet: int) -> tup
     
     # Бросаем кость (используем float для точности)
     roll = random.uniform(0, 100)
+    threshold_lose, threshold_x15, threshold_x2, threshold_x3 = phase1_thresholds(bonus_x2, bonus_x3)
     
-    # Расчёт шансов с бонусами
-    chance_lose = BASE_CHANCE_LOSE
-    chance_win_x15 = BASE_CHANCE_WIN_X15
-    chance_win_x2 = BASE_CHANCE_WIN_X2 + bonus_x2
-    chance_win_x3 = BASE_CHANCE_WIN_X3 + bonus_x3
-    chance_win_x5 = BASE_CHANCE_WIN_X5
+    # Исход известен до расчёта: ставка и выигрыш — одним settle_balance
+    if roll < threshold_x15:
+        multiplier, comments = 0, None  # Проигрыш или ×1.5 (выплата — во второй фазе)
+    elif roll < threshold_x2:
+        multiplier, comments = 2, FOX_COMMENTS_WIN_X2
+    elif roll < threshold_x3:
+        multiplier, comments = 3, FOX_COMMENTS_WIN_X3
+    else:
+        multiplier, comments = 5, FOX_COMMENTS_WIN_X5  # 💎 редкий!
+    payout = bet * multiplier
     
-    # Корректируем проигрыш чтобы сумма была 100
-    total_wins = chance_win_x15 + chance_win_x2 + chance_win_x3 + chance_win_x5
-    chance_lose = 100.0 - total_wins
+    balance = await settle_balance(session, tg_id, debit=bet, credit=payout)
+    if balance is None:
+        return None, "no_balance"
     
-    # Пороги
-    threshold_lose = chance_lose
-    threshold_x15 = threshold_lose + chance_win_x15
-    threshold_x2 = threshold_x15 + chance_win_x2
-    threshold_x3 = threshold_x2 + chance_win_x3
-    # threshold_x5 = 100 (всё что осталось)
+    # 5% от ставки идёт в джекпот
+    jackpot_contribution = max(1, int(bet * JACKPOT_CONTRIBUTION))
+    await add_to_jackpot(session, jackpot_contribution)
     
     if roll < threshold_lose:
         # ПРОИГРЫШ — но проверяем джекпот!
         jackpot_roll = random.uniform(0, 100)
-        current_jackpot = await get_current_jackpot(session)
         
-        if jackpot_roll < BASE_CHANCE_JACKPOT and current_jackpot >= JACKPOT_MIN_POOL:
+        # Банк читаем только если выпал шанс — не суммируем шарды на каждом проигрыше.
+        # Для выплаты — точное значение из БД, не кеш меню
+        from .jackpot import get_jackpot_pool
+        if jackpot_roll < BASE_CHANCE_JACKPOT and await get_jackpot_pool(session) >= JACKPOT_MIN_POOL:
             # 🏆 ДЖЕКПОТ!!!
             jackpot_amount = await win_jackpot(session, tg_id)
-            await update_balance(session, tg_id, jackpot_amount)
-            balance = int(await get_balance(session, tg_id))
+            balance = await settle_balance(session, tg_id, credit=jackpot_amount)
             
             # Обновляем статистику как выигрыш
             await update_game_stats(session, profile, casino_session, bet, True, jackpot_amount)
@@ -889,8 +940,9 @@ async def play_casino_phase1(session: AsyncSession, tg_id: int, bet: int) -> tup
         await save_game(session, tg_id, casino_session, result)
         return result, "final"
     
-    elif roll < threshold_x15:
-        # ПРОМЕЖУТОЧНЫЙ ВЫИГРЫШ ×1.5 — можно рискнуть
+    if roll < threshold_x15:
+        # ПРОМЕЖУТОЧНЫЙ ВЫИГРЫШ ×1.5 — можно рискнуть (ставка уже списана)
+        await session.commit()
         current_value = int(bet * 1.5)
         
         return Phase1Result(
@@ -901,65 +953,20 @@ async def play_casino_phase1(session: AsyncSession, tg_id: int, bet: int) -> tup
             balance=balance,
         ), "phase1"
     
-    elif roll < threshold_x2:
-        # ВЫИГРЫШ ×2
-        payout = bet * 2
-        await update_balance(session, tg_id, payout)
-        balance = int(await get_balance(session, tg_id))
-        
-        await update_game_stats(session, profile, casino_session, bet, True, payout)
-        
-        result = CasinoResult(
-            outcome="win_x2",
-            bet=bet,
-            multiplier=2,
-            winnings=payout - bet,
-            new_balance=balance,
-            comment=random.choice(FOX_COMMENTS_WIN_X2),
-        )
-        
-        await save_game(session, tg_id, casino_session, result)
-        return result, "final"
+    # ВЫИГРЫШ ×2 / ×3 / ×5
+    await update_game_stats(session, profile, casino_session, bet, True, payout)
     
-    elif roll < threshold_x3:
-        # ВЫИГРЫШ ×3
-        payout = bet * 3
-        await update_balance(session, tg_id, payout)
-        balance = int(await get_balance(session, tg_id))
-        
-        await update_game_stats(session, profile, casino_session, bet, True, payout)
-        
-        result = CasinoResult(
-            outcome="win_x3",
-            bet=bet,
-            multiplier=3,
-            winnings=payout - bet,
-            new_balance=balance,
-            comment=random.choice(FOX_COMMENTS_WIN_X3),
-        )
-        
-        await save_game(session, tg_id, casino_session, result)
-        return result, "final"
+    result = CasinoResult(
+        outcome=f"win_x{multiplier}",
+        bet=bet,
+        multiplier=multiplier,
+        winnings=payout - bet,
+        new_balance=balance,
+        comment=random.choice(comments),
+    )
     
-    else:
-        # 💎 ВЫИГРЫШ ×5 (редкий!)
-        payout = bet * 5
-        await update_balance(session, tg_id, payout)
-        balance = int(await get_balance(session, tg_id))
-        
-        await update_game_stats(session, profile, casino_session, bet, True, payout)
-        
-        result = CasinoResult(
-            outcome="win_x5",
-            bet=bet,
-            multiplier=5,
-            winnings=payout - bet,
-            new_balance=balance,
-            comment=random.choice(FOX_COMMENTS_WIN_X5),
-        )
-        
-        await save_game(session, tg_id, casino_session, result)
-        return result, "final"
+    await save_game(session, tg_id, casino_session, result)
+    return result, "final"
 
 
 async def play_casino_phase2_take(session: AsyncSession, tg_id: int, bet: int, current_value: int) -> CasinoResult:
@@ -971,8 +978,7 @@ async def play_casino_phase2_take(session: AsyncSession, tg_id: int, bet: int, c
     casino_session = await get_current_session(session, tg_id)
     
     # Выплачиваем ×1.5
-    await update_balance(session, tg_id, current_value)
-    balance = int(await get_balance(session, tg_id))
+    balance = await settle_balance(session, tg_id, credit=current_value)
     
     await update_game_stats(session, profile, casino_session, bet, True, current_value)
     
@@ -998,79 +1004,31 @@ async def play_casino_phase2_risk(session: AsyncSession, tg_id: int, bet: int) -
     
     # Шансы на второй фазе (60% проигрыш, 30% x2, 8% x3, 2% x5)
     roll = random.randint(1, 100)
-    balance = int(await get_balance(session, tg_id))
     
     if roll <= PHASE2_CHANCE_LOSE:
-        # ПРОИГРЫШ — теряет всё
-        await update_game_stats(session, profile, casino_session, bet, False, 0)
-        
-        result = CasinoResult(
-            outcome="lose",
-            bet=bet,
-            multiplier=0,
-            winnings=-bet,
-            new_balance=balance,
-            comment=random.choice(FOX_COMMENTS_RISK_LOSE),
-            phase=2,
-            was_risk=True,
-        )
-    
+        multiplier, comments = 0, FOX_COMMENTS_RISK_LOSE  # Теряет всё
     elif roll <= PHASE2_CHANCE_LOSE + PHASE2_CHANCE_WIN_X2:
-        # ВЫИГРЫШ ×2
-        payout = bet * 2
-        await update_balance(session, tg_id, payout)
-        balance = int(await get_balance(session, tg_id))
-        
-        await update_game_stats(session, profile, casino_session, bet, True, payout)
-        
-        result = CasinoResult(
-            outcome="win_x2",
-            bet=bet,
-            multiplier=2,
-            winnings=payout - bet,
-            new_balance=balance,
-            comment=random.choice(FOX_COMMENTS_RISK_WIN),
-            phase=2,
-            was_risk=True,
-        )
-    
+        multiplier, comments = 2, FOX_COMMENTS_RISK_WIN
     elif roll <= PHASE2_CHANCE_LOSE + PHASE2_CHANCE_WIN_X2 + PHASE2_CHANCE_WIN_X3:
-        # ВЫИГРЫШ ×3
-        payout = bet * 3
-        await update_balance(session, tg_id, payout)
-        balance = int(await get_balance(session, tg_id))
-        
-        await update_game_stats(session, profile, casino_session, bet, True, payout)
-        
-        result = CasinoResult(
-            outcome="win_x3",
-            bet=bet,
-            multiplier=3,
-            winnings=payout - bet,
-            new_balance=balance,
-            comment=random.choice(FOX_COMMENTS_RISK_WIN),
-            phase=2,
-            was_risk=True,
-        )
-    
+        multiplier, comments = 3, FOX_COMMENTS_RISK_WIN
     else:
-        # 💎 ВЫИГРЫШ ×5 (редкий при риске!)
-        payout = bet * 5
-        await update_balance(session, tg_id, payout)
-        balance = int(await get_balance(session, tg_id))
-        
-        await update_game_stats(session, profile, casino_session, bet, True, payout)
-        
-        result = CasinoResult(
-            outcome="win_x5",
-            bet=bet,
-            multiplier=5,
-            winnings=payout - bet,
-            new_balance=balance,
-            comment=random.choice(FOX_COMMENTS_WIN_X5),
-            phase=2,
-            was_risk=True,
-        )
+        multiplier, comments = 5, FOX_COMMENTS_WIN_X5  # 💎 редкий при риске!
+    payout = bet * multiplier
+    
+    # Выплата и новый баланс — одним settle_balance (ставка списана в первой фазе)
+    balance = await settle_balance(session, tg_id, credit=payout)
+    await update_game_stats(session, profile, casino_session, bet, payout > 0, payout)
+    
+    result = CasinoResult(
+        outcome=f"win_x{multiplier}" if payout else "lose",
+        bet=bet,
+        multiplier=multiplier,
+        winnings=payout - bet,
+        new_balance=balance,
+        comment=random.choice(comments),
+        phase=2,
+        was_risk=True,
+    )
     
     await save_game(session, tg_id, casino_session, result)
     return result
@@ -1130,22 +1088,14 @@ async def update_game_stats(
         profile.current_lose_streak = 0
         logger.info(f"[Casino] {profile.tg_id}: принудительный перерыв после {FORCED_BREAK_AFTER_LOSSES} проигрышей")
     
-    # Сессия
+    # Сессия: серии; игры и суммы досчитывает журнал ставок (casino_ledger)
     if casino_session:
-        casino_session.games_played += 1
-        casino_session.total_bet += bet
-        
         if won:
-            casino_session.total_won += payout - bet
-            casino_session.net_result += payout - bet
-            
             # Текущая серия побед в сессии
             win_streak = profile.current_win_streak
             if win_streak > casino_session.max_win_streak:
                 casino_session.max_win_streak = win_streak
         else:
-            casino_session.net_result -= bet
-            
             # Текущая серия проигрышей в сессии
             lose_streak = profile.current_lose_streak
             if lose_streak > casino_session.max_lose_streak:
@@ -1160,21 +1110,20 @@ async def save_game(
     casino_session: Optional[FoxCasinoSession],
     result: CasinoResult
 ):
-    """Сохранить игру в историю."""
-    game = FoxCasinoGame(
+    """Сохранить игру в историю (журнал ставок, в БД — пачкой)."""
+    record_bet(
         tg_id=tg_id,
         bet=result.bet,
         won=result.outcome not in ("lose", "near_miss"),
         multiplier=result.multiplier,
-        payout=result.bet * result.multiplier if result.multiplier > 0 else 0,
+        payout=result.jackpot_amount or (result.bet * result.multiplier if result.multiplier > 0 else 0),
+        balance_after=result.new_balance,
+        session_id=casino_session.id if casino_session else None,
         phase=result.phase,
         was_doubled=result.was_risk,
         near_miss=result.outcome == "near_miss",
         near_miss_text=result.near_miss_text,
-        session_id=casino_session.id if casino_session else None,
     )
-    session.add(game)
-    await session.commit()
     
     logger.info(
         f"[Casino] {tg_id}: ставка {result.bet}₽, исход {result.outcome}, "
@@ -1188,20 +1137,23 @@ async def record_casino_game(
     bet: int,
     won: bool,
     multiplier: float,
-    payout: int
-):
-    """Универсальная функция записи игры для всех игр казино."""
-    from database.users import update_balance, get_balance
-    
+    payout: int,
+    reserved: bool = False,
+) -> int | None:
+    """
+    Универсальная функция записи игры для всех игр казино.
+    Ставка и выигрыш — одним settle_balance. Возвращает новый баланс;
+    None — баланса на ставку уже не хватает, игра не засчитана.
+    reserved=True — ставка списана при раздаче (reserve_bet), начисляется только выигрыш.
+    """
     profile = await get_or_create_casino_profile(session, tg_id)
     casino_session = await get_current_session(session, tg_id)
     
-    # Списываем ставку
-    await update_balance(session, tg_id, -bet)
-    
-    # Если выиграл — начисляем выигрыш (payout уже передан с учётом ставки)
-    if won and payout > 0:
-        await update_balance(session, tg_id, payout)
+    # Списываем ставку и начисляем выигрыш (payout уже передан с учётом ставки)
+    balance = await settle_balance(session, tg_id, debit=0 if reserved else bet, credit=payout if won else 0)
+    if balance is None:
+        logger.warning(f"[Casino] {tg_id}: не хватило баланса на расчёт ставки {bet}₽, игра не засчитана")
+        return None
     
     # Джекпот — часть ставки идёт в пул
     jackpot_contribution = max(1, int(bet * JACKPOT_CONTRIBUTION))
@@ -1236,33 +1188,69 @@ async def record_casino_game(
     
     # Кулдауны теперь управляются отдельно для каждой игры в router.py
     
-    # Обновляем сессию если есть
-    if casino_session:
-        casino_session.games_played += 1
-        casino_session.total_bet += bet
-        
-        if won:
-            casino_session.total_won += payout - bet
-            casino_session.net_result += payout - bet
-        else:
-            casino_session.net_result -= bet
+    session_id = casino_session.id if casino_session else None
+    await session.commit()
     
-    # Сохраняем игру
-    game = FoxCasinoGame(
+    # Сохраняем игру (журнал ставок досчитает и сессию)
+    record_bet(
         tg_id=tg_id,
         bet=bet,
         won=won,
         multiplier=multiplier,
         payout=payout if won else 0,
-        phase=1,
-        was_doubled=False,
-        near_miss=False,
-        session_id=casino_session.id if casino_session else None,
+        balance_after=balance,
+        session_id=session_id,
     )
-    session.add(game)
-    await session.commit()
     
     logger.info(f"[Casino] {tg_id}: игра bet={bet}, won={won}, multiplier={multiplier}, payout={payout}")
+    return balance
+
+
+async def settle_abandoned_hand(
+    session: AsyncSession,
+    namespace: str,
+    tg_id: int,
+    state,
+    policy: str = "forfeit",
+):
+    """
+    Закрыть брошенную раздачу (истёк TTL или вытеснена из памяти).
+    - "forfeit" — засчитываем проигрыш ставки
+    - "refund" — ставка возвращается
+    Кости после 1-й фазы: ставка уже списана. Карточные игры списывают ставку при раздаче
+    (reserved в состоянии); раздачи без reserved — только при расчёте.
+    """
+    from .state_store import STATE_CASINO_BET
+    
+    if namespace == STATE_CASINO_BET:
+        bet = int(state[0])
+        if policy == "refund":
+            await settle_balance(session, tg_id, credit=bet)
+            await session.commit()
+        else:
+            profile = await get_or_create_casino_profile(session, tg_id)
+            casino_session = await get_current_session(session, tg_id)
+            await update_game_stats(session, profile, casino_session, bet, False, 0)
+            balance = int(await get_balance(session, tg_id))
+            result = CasinoResult(
+                outcome="lose",
+                bet=bet,
+                multiplier=0,
+                winnings=-bet,
+                new_balance=balance,
+                comment="",
+                phase=2,
+            )
+            await save_game(session, tg_id, casino_session, result)
+    else:
+        bet = int(state["bet"])
+        reserved = state.get("reserved", False)
+        if policy != "refund":
+            await record_casino_game(session, tg_id, bet, False, 0, 0, reserved=reserved)
+        elif reserved:
+            await release_bet(session, tg_id, bet)
+    
+    logger.info(f"[Casino] {tg_id}: брошенная раздача {namespace} закрыта ({policy}), ставка {bet}₽")
 
 
 async def self_block_casino(session: AsyncSession, tg_id: int) -> str:
@@ -0,0 +1,261 @@
+"""
+Журнал ставок казино (append-only)
+- Каждая рассчитанная ставка — событие: строка fox_casino_games с event_id и балансом после расчёта
+- Событие сразу дописывается в файл журнала процесса (journal.py) и копится в памяти; в БД уходит пачкой
+  (один INSERT на пачку) раз в CASINO_LEDGER_FLUSH_INTERVAL или при CASINO_LEDGER_BATCH событиях
+- Запись в журнал — с fsync до возврата из record_bet: после него событие переживает и падение ОС.
+  Окно потери остаётся одно — между коммитом баланса и fsync (record_bet вызывается после расчёта);
+  упавший в нём процесс оставит баланс без строки журнала
+- Счётчики сессии (игр, поставлено, выиграно, итог) считаются из пачки в той же транзакции
+- Повтор пачки после падения безопасен: ON CONFLICT (event_id, created_at) DO NOTHING,
+  счётчики — только по реально вставленным строкам
+- Строки журнала не меняются и не удаляются
+"""
+import asyncio
+import json
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from logger import logger
+
+from .journal import flushing_path, orphaned_journals, process_journal_path
+from .models import FoxCasinoGame, FoxCasinoSession
+
+
+CASINO_LEDGER_FLUSH_INTERVAL = 1.0  # Секунд между сбросами в БД
+CASINO_LEDGER_BATCH = 200  # Событий в буфере, после которых сброс не ждёт интервала
+CASINO_LEDGER_MAX_INSERT = 1000  # Строк в одном INSERT (лимит параметров драйвера)
+# Несброшенные события (JSON Lines); у каждого процесса свой файл: casino_ledger.<хост>.<pid>.log
+CASINO_LEDGER_JOURNAL_PATH = Path(__file__).parent / "casino_ledger.log"
+
+_pending: list[dict] = []  # События, ещё не записанные в БД
+_journal = None  # Открытый на дозапись файл журнала
+_journal_path: Path | None = None  # Журнал этого процесса
+_flush_lock = asyncio.Lock()
+_flush_task: asyncio.Task | None = None
+_kick_task: asyncio.Task | None = None
+
+
+def _read_journal(path: Path) -> list[dict]:
+    """События из файла журнала"""
+    if not path.exists():
+        return []
+
+    events = []
+    for line in path.read_text().splitlines():
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            pass  # Недописанная строка при падении
+    return events
+
+
+def _append(events: list[dict]) -> None:
+    """Дописать события в журнал процесса и дождаться записи на диск (fsync)"""
+    journal = _open_journal()
+    for event in events:
+        journal.write(json.dumps(event) + "\n")
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+def _open_journal():
+    """
+    Открыть журнал процесса. При первом открытии события, оставшиеся
+    от прошлого запуска и от завершившихся воркеров этого хоста, возвращаются в буфер.
+    """
+    global _journal, _journal_path
+    if _journal is not None:
+        return _journal
+
+    _journal_path = process_journal_path(CASINO_LEDGER_JOURNAL_PATH)
+    _journal = open(_journal_path, "a", buffering=1)
+
+    replayed = _read_journal(_journal_path)
+
+    # Сброс, прерванный падением, и чужие осиротевшие журналы: переносим в свой журнал.
+    # Повтор уже записанного безопасен — event_id не вставится дважды
+    for path in [flushing_path(_journal_path), *orphaned_journals(CASINO_LEDGER_JOURNAL_PATH)]:
+        adopted = _read_journal(path)
+        # Чужой файл удаляем, только когда его события уже на диске в нашем
+        _append(adopted)
+        replayed += adopted
+        path.unlink(missing_ok=True)
+
+    if replayed:
+        _pending.extend(replayed)
+        logger.info(f"[Casino] Журнал ставок: восстановлено {len(replayed)} событий")
+    return _journal
+
+
+def record_bet(
+    tg_id: int,
+    bet: float,
+    won: bool,
+    multiplier: float,
+    payout: float,
+    balance_after: float | None,
+    session_id: int | None = None,
+    phase: int = 1,
+    was_doubled: bool = False,
+    near_miss: bool = False,
+    near_miss_text: str | None = None,
+) -> str:
+    """
+    Записать рассчитанную ставку в журнал (с fsync). Возвращает event_id.
+    В БД событие попадёт при ближайшем flush_casino_ledger().
+    """
+    event = {
+        "event_id": uuid.uuid4().hex,
+        "tg_id": tg_id,
+        "bet": bet,
+        "won": won,
+        "multiplier": multiplier,
+        "payout": payout,
+        "balance_after": balance_after,
+        "phase": phase,
+        "was_doubled": was_doubled,
+        "near_miss": near_miss,
+        "near_miss_text": near_miss_text,
+        "session_id": session_id,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    _append([event])
+    _pending.append(event)
+
+    if len(_pending) >= CASINO_LEDGER_BATCH:
+        _kick_flush()
+    return event["event_id"]
+
+
+def get_pending_bets() -> int:
+    """События, накопленные в памяти и ещё не записанные в БД"""
+    return len(_pending)
+
+
+def _kick_flush() -> None:
+    """Сбросить буфер сейчас, не дожидаясь интервала"""
+    global _kick_task
+    if _kick_task is None or _kick_task.done():
+        _kick_task = asyncio.create_task(_safe_flush())
+
+
+async def write_events(session: AsyncSession, events: list[dict]) -> int:
+    """
+    Вставить события и обновить по ним счётчики сессий (коммит — за вызывающим).
+    Уже записанные event_id пропускаются. Возвращает число вставленных строк.
+    """
+    inserted = []
+    for start in range(0, len(events), CASINO_LEDGER_MAX_INSERT):
+        rows = [
+            {**event, "created_at": datetime.fromisoformat(event["created_at"])}
+            for event in events[start:start + CASINO_LEDGER_MAX_INSERT]
+        ]
+        result = await session.execute(
+            insert(FoxCasinoGame)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=[FoxCasinoGame.event_id, FoxCasinoGame.created_at])
+            .returning(FoxCasinoGame.session_id, FoxCasinoGame.bet, FoxCasinoGame.won, FoxCasinoGame.payout)
+        )
+        inserted += result.all()
+
+    # session_id -> [игр, поставлено, выиграно, итог]
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    for row in inserted:
+        if row.session_id is None:
+            continue
+        item = totals[row.session_id]
+        item[0] += 1
+        item[1] += row.bet
+        if row.won:
+            item[2] += row.payout - row.bet
+        item[3] += (row.payout if row.won else 0) - row.bet
+
+    for session_id, (games, wagered, won, net) in totals.items():
+        await session.execute(
+            update(FoxCasinoSession)
+            .where(FoxCasinoSession.id == session_id)
+            .values(
+                games_played=FoxCasinoSession.games_played + games,
+                total_bet=FoxCasinoSession.total_bet + wagered,
+                total_won=FoxCasinoSession.total_won + won,
+                net_result=FoxCasinoSession.net_result + net,
+            )
+        )
+    return len(inserted)
+
+
+async def flush_casino_ledger() -> int:
+    """
+    Записать накопленные события в БД (в своей сессии, одной транзакцией).
+    Возвращает число записанных событий.
+    """
+    global _journal
+    from database.db import async_session_maker
+
+    async with _flush_lock:
+        _open_journal()
+        if not _pending:
+            return 0
+
+        # Забираем буфер и ротируем журнал — новые события идут в свежий файл
+        events = _pending[:]
+        _pending.clear()
+        _journal.close()
+        _journal = None
+        _journal_path.replace(flushing_path(_journal_path))
+        _journal = open(_journal_path, "a", buffering=1)
+
+        try:
+            async with async_session_maker() as session:
+                written = await write_events(session, events)
+                await session.commit()
+        except Exception:
+            # Не получилось — возвращаем события в буфер и журнал
+            _pending[:0] = events
+            _append(events)
+            raise
+        finally:
+            flushing_path(_journal_path).unlink(missing_ok=True)
+
+    if written != len(events):
+        logger.info(f"[Casino] Журнал ставок: {len(events) - written} событий уже были в БД")
+    return written
+
+
+async def _safe_flush():
+    try:
+        await flush_casino_ledger()
+    except Exception as e:
+        logger.warning(f"[Casino] Ошибка сброса журнала ставок: {e}")
+
+
+async def _flush_loop():
+    """Фоновый сброс событий"""
+    while True:
+        await asyncio.sleep(CASINO_LEDGER_FLUSH_INTERVAL)
+        await _safe_flush()
+
+
+def start_casino_ledger():
+    """Запустить фоновый сброс журнала ставок (и проиграть журнал, если он остался)"""
+    global _flush_task
+    _open_journal()
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop_casino_ledger():
+    """Остановить фоновый сброс и записать остаток в БД"""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        _flush_task = None
+    await flush_casino_ledger()
@@ -3,19 +3,92 @@
 """
 from datetime import datetime, timedelta
 
-from sqlalchemy import select, update
-from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import BigInteger, any_, bindparam, case, event, func, inspect, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
 from logger import logger
 
-from .models import FoxBoost, FoxGameHistory, FoxPlayer, FoxPrize
+from .models import FoxBoost, FoxDailyWins, FoxGameHistory, FoxPlayer, FoxPrize
+from .ranking import (
+    BOARD_COINS, BOARD_GAMES, BOARD_STREAK, BOARD_WINS_WEEK,
+    increment_board_score, set_board_score,
+)
+
+
+# ==================== Контекст игрока ====================
+#
+# Сессия живёт в пределах одного апдейта (её выдаёт middleware), поэтому
+# игрок, загруженный один раз, кешируется в session.info и переиспользуется
+# всеми хелперами модуля. Значения из UPDATE ... RETURNING записываются
+# обратно в закешированный объект, так что повторный SELECT не нужен.
+
+_PLAYER_CACHE_KEY = "fox_players"
+
+
+def _drop_player_cache(sync_session, *args) -> None:
+    """Сбросить кеш игроков (после отката значения в нём могут быть неверны)."""
+    sync_session.info.pop(_PLAYER_CACHE_KEY, None)
+
+
+def _player_cache(session: AsyncSession) -> dict[int, FoxPlayer]:
+    """Кеш игроков текущей сессии (tg_id -> FoxPlayer)."""
+    cache = session.info.get(_PLAYER_CACHE_KEY)
+    if cache is None:
+        cache = session.info[_PLAYER_CACHE_KEY] = {}
+        sync_session = session.sync_session
+        if not event.contains(sync_session, "after_soft_rollback", _drop_player_cache):
+            event.listen(sync_session, "after_soft_rollback", _drop_player_cache)
+    return cache
+
+
+def get_cached_player(session: AsyncSession, tg_id: int) -> FoxPlayer | None:
+    """Получить игрока из контекста запроса без обращения к БД."""
+    player = _player_cache(session).get(tg_id)
+    if player is None:
+        return None
+    
+    # Объект мог быть отсоединён или протухнуть после коммита (expire_on_commit)
+    state = inspect(player)
+    if state.detached or state.deleted or state.expired_attributes:
+        _player_cache(session).pop(tg_id, None)
+        return None
+    return player
+
+
+def sync_cached_player(session: AsyncSession, tg_id: int, **values) -> None:
+    """
+    Записать в закешированного игрока значения, полученные из БД
+    (например, из UPDATE ... RETURNING). Объект не помечается изменённым.
+    """
+    player = get_cached_player(session, tg_id)
+    if player is None:
+        return
+    for key, value in values.items():
+        set_committed_value(player, key, value)
+
+
+def forget_player(session: AsyncSession, tg_id: int | None = None) -> None:
+    """Убрать игрока (или всех игроков) из контекста запроса."""
+    if tg_id is None:
+        session.info.pop(_PLAYER_CACHE_KEY, None)
+    else:
+        _player_cache(session).pop(tg_id, None)
 
 
 # ==================== FoxPlayer ====================
 
-async def get_or_create_player(session: AsyncSession, tg_id: int) -> FoxPlayer:
-    """Получить или создать игрока"""
+async def get_or_create_player(session: AsyncSession, tg_id: int, commit: bool = True) -> FoxPlayer:
+    """
+    Получить или создать игрока.
+    Игрок загружается один раз за запрос, дальше берётся из контекста.
+    commit=False — не коммитить (для работы внутри общей транзакции).
+    """
+    player = get_cached_player(session, tg_id)
+    if player is not None:
+        return player
+    
     result = await session.execute(
         select(FoxPlayer).where(FoxPlayer.tg_id == tg_id)
     )
@@ -24,70 +97,87 @@ async def get_or_create_player(session: AsyncSession, tg_id: int) -> FoxPlayer:
     if not player:
         player = FoxPlayer(tg_id=tg_id)
         session.add(player)
-        await session.commit()
-        await session.refresh(player)
+        if commit:
+            await session.commit()
+            await session.refresh(player)
+        else:
+            await session.flush()
         logger.info(f"[Gamification] Создан игрок: {tg_id}")
     
+    _player_cache(session)[tg_id] = player
     return player
 
 
 async def get_player(session: AsyncSession, tg_id: int) -> FoxPlayer | None:
     """Получить игрока"""
+    player = get_cached_player(session, tg_id)
+    if player is not None:
+        return player
+    
     result = await session.execute(
         select(FoxPlayer).where(FoxPlayer.tg_id == tg_id)
     )
-    return result.scalar_one_or_none()
+    player = result.scalar_one_or_none()
+    if player is not None:
+        _player_cache(session)[tg_id] = player
+    return player
 
 
-async def update_player_coins(session: AsyncSession, tg_id: int, amount: int) -> int:
+async def update_player_coins(session: AsyncSession, tg_id: int, amount: int, commit: bool = True) -> int:
     """Изменить баланс Лискоинов (может быть отрицательным)"""
     result = await session.execute(
         update(FoxPlayer)
         .where(FoxPlayer.tg_id == tg_id)
         .values(coins=FoxPlayer.coins + amount, updated_at=datetime.utcnow())
-        .returning(FoxPlayer.coins)
+        .returning(FoxPlayer.coins, FoxPlayer.updated_at)
     )
-    new_balance = result.scalar_one_or_none()
-    await session.commit()
+    row = result.one_or_none()
+    new_balance = row.coins if row else None
+    if row:
+        sync_cached_player(session, tg_id, coins=row.coins, updated_at=row.updated_at)
+        set_board_score(BOARD_COINS, tg_id, row.coins)
+    if commit:
+        await session.commit()
     return new_balance or 0
 
 
-async def check_and_reset_daily_spin(session: AsyncSession, tg_id: int) -> bool:
-    """
-    Проверить и восстановить бесплатную попытку.
-    Попытка восстанавливается каждые 3 часа, НЕ суммируется (максимум 1).
-    Возвращает True, если попытка доступна.
-    """
-    from datetime import timedelta
-    
-    player = await get_or_create_player(session, tg_id)
-    now = datetime.utcnow()
-    
-    # Интервал восстановления — 3 часа
-    SPIN_COOLDOWN_HOURS = 3
-    
-    # Если уже есть бесплатная попытка — не добавляем (не суммируется!)
+# Бесплатная попытка восстанавливается через 3 часа после траты прошлой
+# и не копится (максимум 1). Восстановление не пишется в БД: доступность
+# считается из last_free_spin_date, который ставится при трате бесплатной попытки.
+# Раньше дата ставилась при восстановлении — старые строки переводит init_db._migrate_free_spin_date.
+FREE_SPIN_COOLDOWN = timedelta(hours=3)
+
+
+def available_free_spins(player: FoxPlayer, now: datetime | None = None) -> int:
+    """Сколько бесплатных попыток доступно сейчас (без запросов и записи)"""
     if player.free_spins >= 1:
-        return True
-    
-    # Проверяем прошло ли 3 часа с последнего восстановления
+        return player.free_spins
     if player.last_free_spin_date is None:
-        # Первый раз — даём попытку
-        should_restore = True
-    else:
-        time_since_last = now - player.last_free_spin_date
-        should_restore = time_since_last >= timedelta(hours=SPIN_COOLDOWN_HOURS)
-    
-    if should_restore:
-        await session.execute(
-            update(FoxPlayer)
-            .where(FoxPlayer.tg_id == tg_id)
-            .values(free_spins=1, last_free_spin_date=now)
-        )
-        await session.commit()
-        return True
-    
-    return player.free_spins > 0
+        return 1
+    return 1 if (now or datetime.utcnow()) - player.last_free_spin_date >= FREE_SPIN_COOLDOWN else 0
+
+
+def _free_spins_available(now: datetime):
+    """SQL-выражение для available_free_spins: записанные в free_spins или восстановившаяся по времени"""
+    return case(
+        (FoxPlayer.free_spins > 0, FoxPlayer.free_spins),
+        (
+            (FoxPlayer.last_free_spin_date.is_(None))
+            | (FoxPlayer.last_free_spin_date <= now - FREE_SPIN_COOLDOWN),
+            1,
+        ),
+        else_=0,
+    )
+
+
+async def check_and_reset_daily_spin(session: AsyncSession, tg_id: int, commit: bool = True) -> bool:
+    """
+    Проверить, доступна ли бесплатная попытка.
+    Ничего не пишет: восстановленная попытка записывается при трате (use_spin).
+    commit оставлен для совместимости.
+    """
+    player = await get_or_create_player(session, tg_id, commit=commit)
+    return available_free_spins(player) > 0
 
 
 async def get_next_free_spin_time(session: AsyncSession, tg_id: int) -> str | None:
@@ -95,25 +185,14 @@ async def get_next_free_spin_time(session: AsyncSession, tg_id: int) -> str | No
     Получить время до следующей бесплатной попытки.
     Возвращает строку вида "2ч 15м" или None если попытка уже доступна.
     """
-    from datetime import timedelta
-    
     player = await get_or_create_player(session, tg_id)
-    
-    # Если попытка есть — не показываем таймер
-    if player.free_spins >= 1:
-        return None
-    
-    if player.last_free_spin_date is None:
-        return None
-    
-    SPIN_COOLDOWN_HOURS = 3
-    next_spin_time = player.last_free_spin_date + timedelta(hours=SPIN_COOLDOWN_HOURS)
     now = datetime.utcnow()
     
-    if next_spin_time <= now:
+    # Если попытка есть — не показываем таймер
+    if available_free_spins(player, now) >= 1:
         return None
     
-    remaining = next_spin_time - now
+    remaining = player.last_free_spin_date + FREE_SPIN_COOLDOWN - now
     hours = int(remaining.total_seconds() // 3600)
     minutes = int((remaining.total_seconds() % 3600) // 60)
     
@@ -123,43 +202,86 @@ async def get_next_free_spin_time(session: AsyncSession, tg_id: int) -> str | No
         return f"{minutes}м"
 
 
-async def use_spin(session: AsyncSession, tg_id: int) -> tuple[bool, str]:
+async def use_spin(session: AsyncSession, tg_id: int, commit: bool = True) -> tuple[bool, str | None]:
     """
     Использовать попытку. Сначала бесплатные, потом купленные.
+    Один запрос без отдельного SELECT: CTE блокирует строку игрока и считает доступные
+    бесплатные до списания, UPDATE списывает и возвращает тип попытки —
+    два одновременных тапа не спишут лишнего и не уведут счётчик в минус.
     Возвращает (успех, тип: 'free' | 'paid' | None).
     """
-    player = await get_or_create_player(session, tg_id)
-    
-    # Сначала пробуем бесплатную
-    if player.free_spins > 0:
-        await session.execute(
-            update(FoxPlayer)
-            .where(FoxPlayer.tg_id == tg_id)
-            .values(free_spins=FoxPlayer.free_spins - 1)
+    now = datetime.utcnow()
+    before = (
+        select(FoxPlayer.tg_id, _free_spins_available(now).label("free_available"))
+        .where(FoxPlayer.tg_id == tg_id)
+        .with_for_update()
+        .cte("before")
+    )
+    use_free = before.c.free_available > 0
+    result = await session.execute(
+        update(FoxPlayer)
+        .where(FoxPlayer.tg_id == before.c.tg_id, use_free | (FoxPlayer.paid_spins > 0))
+        .values(
+            free_spins=case((FoxPlayer.free_spins > 0, FoxPlayer.free_spins - 1), else_=0),
+            paid_spins=case((use_free, FoxPlayer.paid_spins), else_=FoxPlayer.paid_spins - 1),
+            # Потраченная бесплатная — следующая через FREE_SPIN_COOLDOWN
+            last_free_spin_date=case((use_free, now), else_=FoxPlayer.last_free_spin_date),
         )
-        await session.commit()
-        return True, "free"
+        .returning(
+            FoxPlayer.free_spins, FoxPlayer.paid_spins, FoxPlayer.last_free_spin_date,
+            use_free.label("used_free"),
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        return False, None
     
-    # Потом купленную
-    if player.paid_spins > 0:
-        await session.execute(
-            update(FoxPlayer)
-            .where(FoxPlayer.tg_id == tg_id)
-            .values(paid_spins=FoxPlayer.paid_spins - 1)
+    sync_cached_player(
+        session, tg_id,
+        free_spins=row.free_spins, paid_spins=row.paid_spins, last_free_spin_date=row.last_free_spin_date,
+    )
+    if commit:
+        await session.commit()
+    return True, "free" if row.used_free else "paid"
+
+
+async def use_spins(session: AsyncSession, tg_id: int, count: int, commit: bool = True) -> bool:
+    """
+    Использовать сразу count попыток одним UPDATE: сначала бесплатные, потом купленные.
+    Списывает всё или ничего (если попыток меньше count — False).
+    """
+    now = datetime.utcnow()
+    free_available = _free_spins_available(now)
+    free_used = func.least(free_available, count)
+    result = await session.execute(
+        update(FoxPlayer)
+        .where(FoxPlayer.tg_id == tg_id, free_available + FoxPlayer.paid_spins >= count)
+        .values(
+            free_spins=FoxPlayer.free_spins - func.least(FoxPlayer.free_spins, count),
+            paid_spins=FoxPlayer.paid_spins - (count - free_used),
+            last_free_spin_date=case((free_used > 0, now), else_=FoxPlayer.last_free_spin_date),
         )
+        .returning(FoxPlayer.free_spins, FoxPlayer.paid_spins, FoxPlayer.last_free_spin_date)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return False
+    sync_cached_player(
+        session, tg_id,
+        free_spins=row.free_spins, paid_spins=row.paid_spins, last_free_spin_date=row.last_free_spin_date,
+    )
+    if commit:
         await session.commit()
-        return True, "paid"
-    
-    return False, None
+    return True
 
 
 async def has_any_spins(session: AsyncSession, tg_id: int) -> bool:
     """Проверить есть ли хоть одна попытка (бесплатная или купленная)"""
     player = await get_or_create_player(session, tg_id)
-    return player.free_spins > 0 or player.paid_spins > 0
+    return available_free_spins(player) > 0 or player.paid_spins > 0
 
 
-async def add_paid_spin(session: AsyncSession, tg_id: int, count: int = 1) -> int:
+async def add_paid_spin(session: AsyncSession, tg_id: int, count: int = 1, commit: bool = True) -> int:
     """Добавить купленные попытки. Возвращает новое количество."""
     result = await session.execute(
         update(FoxPlayer)
@@ -168,20 +290,55 @@ async def add_paid_spin(session: AsyncSession, tg_id: int, count: int = 1) -> in
         .returning(FoxPlayer.paid_spins)
     )
     new_count = result.scalar_one()
-    await session.commit()
+    sync_cached_player(session, tg_id, paid_spins=new_count)
+    if commit:
+        await session.commit()
     return new_count
 
 
+async def grant_players_bonus(
+    session: AsyncSession,
+    tg_ids: list[int],
+    coins: int = 0,
+    spins: int = 0,
+    commit: bool = True,
+) -> int:
+    """
+    Начислить Лискоины и купленные попытки сразу многим игрокам:
+    один UPDATE ... WHERE tg_id = ANY(...). Возвращает число обновлённых игроков.
+    """
+    if not tg_ids or not (coins or spins):
+        return 0
+    result = await session.execute(
+        update(FoxPlayer)
+        .where(FoxPlayer.tg_id == any_(bindparam("tg_ids", list(tg_ids), type_=ARRAY(BigInteger))))
+        .values(
+            coins=FoxPlayer.coins + coins,
+            paid_spins=FoxPlayer.paid_spins + spins,
+            updated_at=datetime.utcnow(),
+        )
+        .returning(FoxPlayer.tg_id, FoxPlayer.coins, FoxPlayer.paid_spins)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    for row in rows:
+        sync_cached_player(session, row.tg_id, coins=row.coins, paid_spins=row.paid_spins)
+        set_board_score(BOARD_COINS, row.tg_id, row.coins)
+    if commit:
+        await session.commit()
+    return len(rows)
+
+
 # Алиас для обратной совместимости
-async def use_free_spin(session: AsyncSession, tg_id: int) -> bool:
+async def use_free_spin(session: AsyncSession, tg_id: int, commit: bool = True) -> bool:
     """Deprecated: используй use_spin()"""
-    success, _ = await use_spin(session, tg_id)
+    success, _ = await use_spin(session, tg_id, commit=commit)
     return success
 
 
-async def update_login_streak(session: AsyncSession, tg_id: int) -> int:
+async def update_login_streak(session: AsyncSession, tg_id: int, commit: bool = True) -> int:
     """Обновить серию входов. Возвращает текущую серию."""
-    player = await get_or_create_player(session, tg_id)
+    player = await get_or_create_player(session, tg_id, commit=commit)
     today = datetime.utcnow().date()
     
     if player.last_login_date is None:
@@ -196,12 +353,14 @@ async def update_login_streak(session: AsyncSession, tg_id: int) -> int:
         # Пропустил день — серия сбрасывается
         new_streak = 1
     
-    await session.execute(
-        update(FoxPlayer)
-        .where(FoxPlayer.tg_id == tg_id)
-        .values(login_streak=new_streak, last_login_date=datetime.utcnow())
-    )
-    await session.commit()
+    # Меняем через ORM — объект в контексте запроса остаётся актуальным
+    player.login_streak = new_streak
+    player.last_login_date = datetime.utcnow()
+    set_board_score(BOARD_STREAK, tg_id, new_streak)
+    if commit:
+        await session.commit()
+    else:
+        await session.flush()
     return new_streak
 
 
@@ -214,10 +373,11 @@ async def add_prize(
     value: int,
     description: str | None = None,
     expires_in_days: int = 14,
+    commit: bool = True,
 ) -> FoxPrize:
     """Добавить приз пользователю"""
     # Убедимся, что игрок существует
-    await get_or_create_player(session, tg_id)
+    await get_or_create_player(session, tg_id, commit=commit)
     
     prize = FoxPrize(
         tg_id=tg_id,
@@ -227,12 +387,39 @@ async def add_prize(
         expires_at=datetime.utcnow() + timedelta(days=expires_in_days),
     )
     session.add(prize)
-    await session.commit()
-    await session.refresh(prize)
+    if commit:
+        await session.commit()
+        await session.refresh(prize)
+    else:
+        await session.flush()
     logger.info(f"[Gamification] Приз добавлен: {tg_id} - {prize_type}:{value}")
     return prize
 
 
+async def add_prizes(
+    session: AsyncSession,
+    tg_id: int,
+    prizes: list[tuple[str, int, str | None]],
+    expires_in_days: int = 14,
+    commit: bool = True,
+) -> None:
+    """Добавить несколько призов (тип, значение, описание) одним flush"""
+    if not prizes:
+        return
+    await get_or_create_player(session, tg_id, commit=commit)
+    
+    expires_at = datetime.utcnow() + timedelta(days=expires_in_days)
+    session.add_all([
+        FoxPrize(tg_id=tg_id, prize_type=prize_type, value=value, description=description, expires_at=expires_at)
+        for prize_type, value, description in prizes
+    ])
+    if commit:
+        await session.commit()
+    else:
+        await session.flush()
+    logger.info(f"[Gamification] Призов добавлено: {tg_id} - {len(prizes)}")
+
+
 async def get_active_prizes(session: AsyncSession, tg_id: int) -> list[FoxPrize]:
     """Получить активные (неиспользованные, не истёкшие) призы"""
     now = datetime.utcnow()
@@ -248,7 +435,7 @@ async def get_active_prizes(session: AsyncSession, tg_id: int) -> list[FoxPrize]
     return list(result.scalars().all())
 
 
-async def use_prize(session: AsyncSession, prize_id: int, tg_id: int) -> FoxPrize | None:
+async def use_prize(session: AsyncSession, prize_id: int, tg_id: int, commit: bool = True) -> FoxPrize | None:
     """Использовать приз. Возвращает приз если успешно."""
     result = await session.execute(
         select(FoxPrize)
@@ -264,13 +451,14 @@ async def use_prize(session: AsyncSession, prize_id: int, tg_id: int) -> FoxPriz
     if prize:
         prize.is_used = True
         prize.used_at = datetime.utcnow()
-        await session.commit()
+        if commit:
+            await session.commit()
         logger.info(f"[Gamification] Приз использован: {prize_id} пользователем {tg_id}")
     
     return prize
 
 
-async def mark_prize_used(session: AsyncSession, prize_id: int) -> bool:
+async def mark_prize_used(session: AsyncSession, prize_id: int, commit: bool = True) -> bool:
     """Пометить приз как использованный."""
     result = await session.execute(
         update(FoxPrize)
@@ -279,7 +467,8 @@ async def mark_prize_used(session: AsyncSession, prize_id: int) -> bool:
         .returning(FoxPrize.id)
     )
     success = result.scalar_one_or_none() is not None
-    await session.commit()
+    if commit:
+        await session.commit()
     if success:
         logger.info(f"[Gamification] Приз {prize_id} помечен как использованный")
     return success
@@ -295,6 +484,7 @@ async def add_game_history(
     prize_value: int | None = None,
     prize_description: str | None = None,
     boost_used: bool = False,
+    commit: bool = True,
 ) -> FoxGameHistory:
     """Записать игру в историю"""
     # Проверяем, это выигрыш или проигрыш
@@ -302,14 +492,30 @@ async def add_game_history(
     is_win = prize_type and prize_type not in ("empty", "nothing", "lose", None)
     
     # Обновляем статистику игрока
-    await session.execute(
+    result = await session.execute(
         update(FoxPlayer)
         .where(FoxPlayer.tg_id == tg_id)
         .values(
             total_games=FoxPlayer.total_games + 1,
             total_wins=FoxPlayer.total_wins + (1 if is_win else 0),
         )
+        .returning(FoxPlayer.total_games, FoxPlayer.total_wins)
     )
+    row = result.one_or_none()
+    if row:
+        sync_cached_player(session, tg_id, total_games=row.total_games, total_wins=row.total_wins)
+        set_board_score(BOARD_GAMES, tg_id, row.total_games)
+    
+    # Роллап выигрышей по дням для лидербордов
+    if is_win:
+        stmt = insert(FoxDailyWins).values(tg_id=tg_id, day=datetime.utcnow().date(), wins=1)
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[FoxDailyWins.tg_id, FoxDailyWins.day],
+                set_={"wins": FoxDailyWins.wins + 1},
+            )
+        )
+        increment_board_score(BOARD_WINS_WEEK, tg_id)
     
     game = FoxGameHistory(
         tg_id=tg_id,
@@ -320,10 +526,55 @@ async def add_game_history(
         boost_used=boost_used,
     )
     session.add(game)
-    await session.commit()
+    if commit:
+        await session.commit()
     return game
 
 
+async def add_game_history_batch(
+    session: AsyncSession,
+    tg_id: int,
+    games: list[dict],
+    commit: bool = True,
+) -> None:
+    """
+    Записать пачку игр: статистика игрока и роллап выигрышей — по одному UPDATE,
+    строки истории — одним bulk INSERT.
+    games: словари с ключами game_type, prize_type, prize_value, prize_description, boost_used.
+    """
+    if not games:
+        return
+    wins = sum(1 for game in games if game["prize_type"] not in ("empty", "nothing", "lose", None))
+    
+    result = await session.execute(
+        update(FoxPlayer)
+        .where(FoxPlayer.tg_id == tg_id)
+        .values(
+            total_games=FoxPlayer.total_games + len(games),
+            total_wins=FoxPlayer.total_wins + wins,
+        )
+        .returning(FoxPlayer.total_games, FoxPlayer.total_wins)
+    )
+    row = result.one_or_none()
+    if row:
+        sync_cached_player(session, tg_id, total_games=row.total_games, total_wins=row.total_wins)
+        set_board_score(BOARD_GAMES, tg_id, row.total_games)
+    
+    if wins:
+        stmt = insert(FoxDailyWins).values(tg_id=tg_id, day=datetime.utcnow().date(), wins=wins)
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[FoxDailyWins.tg_id, FoxDailyWins.day],
+                set_={"wins": FoxDailyWins.wins + wins},
+            )
+        )
+        increment_board_score(BOARD_WINS_WEEK, tg_id, wins)
+    
+    await session.execute(insert(FoxGameHistory), [{"tg_id": tg_id, **game} for game in games])
+    if commit:
+        await session.commit()
+
+
 # ==================== FoxBoost ====================
 
 async def add_boost(
@@ -332,9 +583,10 @@ async def add_boost(
     boost_type: str,
     uses: int = 1,
     expires_in_hours: int | None = None,
+    commit: bool = True,
 ) -> FoxBoost:
     """Добавить буст пользователю"""
-    await get_or_create_player(session, tg_id)
+    await get_or_create_player(session, tg_id, commit=commit)
     
     expires_at = None
     if expires_in_hours:
@@ -347,7 +599,8 @@ async def add_boost(
         expires_at=expires_at,
     )
     session.add(boost)
-    await session.commit()
+    if commit:
+        await session.commit()
     return boost
 
 
@@ -365,16 +618,17 @@ async def get_active_boosts(session: AsyncSession, tg_id: int) -> list[FoxBoost]
     return list(result.scalars().all())
 
 
-async def use_boost(session: AsyncSession, boost_id: int) -> bool:
-    """Использовать буст. Возвращает True если успешно."""
+async def use_boost(session: AsyncSession, boost_id: int, commit: bool = True, uses: int = 1) -> bool:
+    """Использовать буст (uses раз, но не больше оставшегося). Возвращает True если успешно."""
     result = await session.execute(
         update(FoxBoost)
         .where(FoxBoost.id == boost_id, FoxBoost.uses_left > 0)
-        .values(uses_left=FoxBoost.uses_left - 1)
+        .values(uses_left=func.greatest(FoxBoost.uses_left - uses, 0))
         .returning(FoxBoost.uses_left)
     )
     success = result.scalar_one_or_none() is not None
-    await session.commit()
+    if commit:
+        await session.commit()
     return success
 
 
@@ -472,6 +726,7 @@ async def create_deal(
     result_value: int,
     chance_percent: int,
     fox_comment: str,
+    commit: bool = True,
 ) -> FoxDeal:
     """Создать запись о сделке."""
     deal = FoxDeal(
@@ -485,6 +740,9 @@ async def create_deal(
         fox_comment=fox_comment,
     )
     session.add(deal)
-    await session.commit()
-    await session.refresh(deal)
+    if commit:
+        await session.commit()
+        await session.refresh(deal)
+    else:
+        await session.flush()
     return deal
@@ -85,6 +85,9 @@ class DealResult:
     fox_comment: str
 
 
+MULTIPLIER_X3_CHANCE = 0.15  # Доля выигрышей с x3 (остальные — x2)
+
+
 def calculate_dynamic_chance(stats: dict) -> int:
     """
     Рассчитывает динамический шанс победы.
@@ -114,7 +117,7 @@ def calculate_dynamic_chance(stats: dict) -> int:
 
 def get_multiplier() -> float:
     """Случайный множитель: x2 (85%) или x3 (15%)"""
-    return 3.0 if random.random() < 0.15 else 2.0
+    return 3.0 if random.random() < MULTIPLIER_X3_CHANCE else 2.0
 
 
 def get_greeting(stats: dict) -> str:
@@ -1,52 +1,35 @@
 """
 Игровая механика "Испытать удачу"
 """
-import asyncio
 import random
-from dataclasses import dataclass
 
-from aiogram.types import Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from logger import logger
 
+from .animation import Frame
 from .db import (
     add_game_history,
     add_prize,
-    check_and_reset_daily_spin,
+    available_free_spins,
     get_active_boosts,
     get_or_create_player,
     update_player_coins,
     use_boost,
     use_free_spin,
 )
+from .paytable import (
+    DOUBLE, SYMBOL_IDS, SYMBOLS, TRIPLE, WEIGHTS, Prize, lookup_prize, prize_for_roll, roll, roll_many, to_emoji,
+)
 
 
 # ==================== СИМВОЛЫ ДЛЯ СЛОТОВ ====================
+# Символы, веса и выплаты — в paytable.py
 
-SLOT_SYMBOLS = ["🦊", "💎", "🦊", "🔮", "⭐", "💰", "🎁", "❌"]
+SLOT_SYMBOLS = list(SYMBOLS)
 
 # Веса символов (чем меньше вес, тем реже выпадает)
-SYMBOL_WEIGHTS = {
-    "🦊": 5,   # Лиса - редкий (джекпот если 3)
-    "💎": 8,   # Алмаз - редкий
-    "🔮": 10,  # Клевер - необычный
-    "⭐": 12,  # Звезда - необычный
-    "💰": 15,  # Деньги - обычный
-    "🦊": 18,  # Монета - обычный
-    "🎁": 12,  # Подарок - необычный
-    "❌": 20,  # Пусто - частый
-}
-
-
-@dataclass
-class Prize:
-    """Структура приза"""
-    prize_type: str  # "vpn_days", "coins", "balance", "empty", "boost"
-    value: int
-    description: str
-    rarity: str  # "common", "uncommon", "rare", "epic", "legendary"
-    emoji: str
+SYMBOL_WEIGHTS = dict(zip(SYMBOLS, WEIGHTS))
 
 
 # Цвета редкости для отображения
@@ -73,224 +56,128 @@ SPIN_COST_COINS = 30
 # ==================== ОПРЕДЕЛЕНИЕ ПРИЗА ПО КОМБИНАЦИИ ====================
 
 def get_prize_for_combination(symbols: list[str], boost_percent: int = 0) -> Prize:
-    """
-    Определяет приз на основе выпавших символов.
-    3 одинаковых = джекпот
-    2 одинаковых = средний приз
-    Все разные = маленький приз или ничего
-    """
-    s1, s2, s3 = symbols
-    
-    # Считаем одинаковые символы
-    if s1 == s2 == s3:
-        # ТРИ ОДИНАКОВЫХ - ДЖЕКПОТ!
-        return get_jackpot_prize(s1, boost_percent)
-    
-    elif s1 == s2 or s2 == s3 or s1 == s3:
-        # ДВА ОДИНАКОВЫХ - средний приз
-        matching = s1 if s1 == s2 or s1 == s3 else s2
-        return get_double_prize(matching, boost_percent)
-    
-    else:
-        # ВСЕ РАЗНЫЕ
-        # 35% - ничего, 65% - лискоины (легче зарабатывать)
-        if random.random() < 0.35:
-            return Prize("empty", 0, "Ничего не выпало", "common", "❌")
-        else:
-            coins = random.choice([5, 8, 10, 12, 15])
-            return Prize("coins", coins, f"+{coins} Лискоинов", "common", "🦊")
+    """Определяет приз на основе выпавших символов (эмодзи)"""
+    return prize_for_roll([SYMBOL_IDS[symbol] for symbol in symbols], boost_percent)
 
 
 def get_jackpot_prize(symbol: str, boost_percent: int = 0) -> Prize:
     """Приз за 3 одинаковых символа"""
-    
-    # Буст увеличивает ценность приза
-    multiplier = 1 + (boost_percent / 100)
-    
-    if symbol == "🦊":
-        # ТРИ ЛИСЫ - ЛЕГЕНДАРНЫЙ ДЖЕКПОТ!
-        return Prize("vpn_days", 60, "+60 дней VPN!", "legendary", "🦊")
-    
-    elif symbol == "💎":
-        # Три алмаза
-        days = int(30 * multiplier)
-        return Prize("vpn_days", days, f"+{days} дней VPN!", "epic", "💎")
-    
-    elif symbol == "🔮":
-        # Три клевера - буст удачи
-        return Prize("boost", 30, "Буст удачи +30%!", "epic", "🔮")
-    
-    elif symbol == "⭐":
-        # Три звезды
-        days = int(14 * multiplier)
-        return Prize("vpn_days", days, f"+{days} дней VPN!", "rare", "⭐")
-    
-    elif symbol == "💰":
-        # Три мешка денег - рубли на баланс
-        return Prize("balance", 50, "+25₽ на баланс!", "legendary", "💰")
-    
-    elif symbol == "🦊":
-        # Три монеты
-        coins = int(100 * multiplier)
-        return Prize("coins", coins, f"+{coins} Лискоинов!", "rare", "🦊")
-    
-    elif symbol == "🎁":
-        # Три подарка
-        days = int(7 * multiplier)
-        return Prize("vpn_days", days, f"+{days} дней VPN!", "rare", "🎁")
-    
-    elif symbol == "❌":
-        # Три креста - ничего, но даём утешительные монеты
-        return Prize("coins", 15, "+15 Лискоинов (утешительный)", "common", "❌")
-    
-    return Prize("coins", 50, "+50 Лискоинов", "uncommon", "🦊")
+    return lookup_prize(TRIPLE, SYMBOL_IDS[symbol], boost_percent)
 
 
 def get_double_prize(symbol: str, boost_percent: int = 0) -> Prize:
-    """Приз за 2 одинаковых символа — улучшенные награды"""
-    
-    multiplier = 1 + (boost_percent / 100)
-    
-    if symbol == "🦊":
-        # Две лисы - хороший бонус лискоинов
-        coins = int(35 * multiplier)
-        return Prize("coins", coins, f"+{coins} Лискоинов", "rare", "🦊")
-    
-    elif symbol == "💎":
-        # Два алмаза
-        coins = int(40 * multiplier)
-        return Prize("coins", coins, f"+{coins} Лискоинов", "uncommon", "💎")
-    
-    elif symbol == "🔮":
-        return Prize("boost", 10, "Буст удачи +10%", "uncommon", "🔮")
-    
-    elif symbol == "⭐":
-        coins = int(25 * multiplier)
-        return Prize("coins", coins, f"+{coins} Лискоинов", "uncommon", "⭐")
-    
-    elif symbol == "💰":
-        coins = int(50 * multiplier)
-        return Prize("coins", coins, f"+{coins} Лискоинов", "uncommon", "💰")
-    
-    elif symbol == "🎁":
-        coins = int(20 * multiplier)
-        return Prize("coins", coins, f"+{coins} Лискоинов", "common", "🎁")
-    
-    elif symbol == "❌":
-        # Два крестика — утешительный приз
-        return Prize("coins", 5, "+5 Лискоинов", "common", "❌")
-    
-    return Prize("coins", 20, "+20 Лискоинов", "common", "🦊")
+    """Приз за 2 одинаковых символа"""
+    return lookup_prize(DOUBLE, SYMBOL_IDS[symbol], boost_percent)
 
 
 def roll_symbol() -> str:
     """Случайный выбор символа с учётом весов"""
-    symbols = list(SYMBOL_WEIGHTS.keys())
-    weights = list(SYMBOL_WEIGHTS.values())
-    return random.choices(symbols, weights=weights, k=1)[0]
+    return SYMBOLS[roll()[0]]
 
 
 def roll_slots() -> list[str]:
     """Крутим 3 барабана"""
-    return [roll_symbol() for _ in range(3)]
+    return to_emoji(roll())
 
 
 # ==================== АНИМАЦИЯ ====================
+# Кадры строятся заранее и проигрываются планировщиком (animation.py) — обработчик их не ждёт
 
-async def animate_slots(message: Message, final_symbols: list[str]) -> None:
-    """Анимация слотов — простая и красивая"""
+def slots_frames(final_symbols: list[str]) -> list[Frame]:
+    """Кадры слотов — простые и красивые"""
     
     random_symbols = list(SYMBOL_WEIGHTS.keys())
     
     # Фаза 1: Все крутятся
-    await message.edit_text(
+    frames = [Frame(
         "🎰 <b>СЛОТЫ</b>\n\n"
         "[ ❓ ] [ ❓ ] [ ❓ ]\n\n"
-        "🔥 <i>Барабаны раскручиваются...</i>"
-    )
-    await asyncio.sleep(1.0)
+        "🔥 <i>Барабаны раскручиваются...</i>",
+        1.0,
+    )]
     
     # Фаза 2: Мелькают случайные символы
     for _ in range(4):
         s1, s2, s3 = random.choices(random_symbols, k=3)
-        await message.edit_text(
+        frames.append(Frame(
             "🎰 <b>СЛОТЫ</b>\n\n"
             f"[ {s1} ] [ {s2} ] [ {s3} ]\n\n"
-            "🎲 <i>Крутятся...</i>"
-        )
-        await asyncio.sleep(0.35)
+            "🎲 <i>Крутятся...</i>",
+            0.35,
+        ))
     
     # Фаза 3: Первый остановился
-    await message.edit_text(
+    frames.append(Frame(
         "🎰 <b>СЛОТЫ</b>\n\n"
         f"[ {final_symbols[0]} ] [ ❓ ] [ ❓ ]\n\n"
-        "⏳ <i>Первый...</i>"
-    )
-    await asyncio.sleep(0.9)
+        "⏳ <i>Первый...</i>",
+        0.9,
+    ))
     
     # Фаза 4: Второй остановился
-    await message.edit_text(
+    frames.append(Frame(
         "🎰 <b>СЛОТЫ</b>\n\n"
         f"[ {final_symbols[0]} ] [ {final_symbols[1]} ] [ ❓ ]\n\n"
-        "⏳ <i>Второй...</i>"
-    )
-    await asyncio.sleep(1.0)
+        "⏳ <i>Второй...</i>",
+        1.0,
+    ))
     
     # Фаза 5: Последний
-    await message.edit_text(
+    frames.append(Frame(
         "🎰 <b>СЛОТЫ</b>\n\n"
         f"[ {final_symbols[0]} ] [ {final_symbols[1]} ] [ ❓ ]\n\n"
-        "🤞 <i>Последний...</i>"
-    )
-    await asyncio.sleep(1.2)
+        "🤞 <i>Последний...</i>",
+        1.2,
+    ))
+    return frames
 
 
-async def animate_chest_opening(message: Message, chosen_chest: int) -> None:
-    """Анимация открытия выбранного сундука — простая"""
+def chest_frames(chosen_chest: int) -> list[Frame]:
+    """Кадры открытия выбранного сундука — простые"""
     
     chest_num = chosen_chest + 1
     
-    # Фаза 1: Выбор сделан
-    await message.edit_text(
-        f"📦 <b>СУНДУКИ ЛИСЫ</b>\n\n"
-        f"Ты выбрал сундук <b>№{chest_num}</b>!\n\n"
-        f"🔒 Сундук закрыт...\n\n"
-        "<i>Открываем...</i>"
-    )
-    await asyncio.sleep(1.0)
-    
-    # Фаза 2: Открывается
-    await message.edit_text(
-        f"📦 <b>СУНДУКИ ЛИСЫ</b>\n\n"
-        f"Сундук <b>№{chest_num}</b>\n\n"
-        f"🔓 Замок щёлкает...\n\n"
-        "<i>Что внутри?</i>"
-    )
-    await asyncio.sleep(0.8)
-    
-    # Фаза 3: Сияние
-    await message.edit_text(
-        f"📦 <b>СУНДУКИ ЛИСЫ</b>\n\n"
-        f"Сундук <b>№{chest_num}</b>\n\n"
-        f"✨ Сияние изнутри! ✨\n\n"
-        "<i>Смотрим приз...</i>"
-    )
-    await asyncio.sleep(1.0)
+    return [
+        # Фаза 1: Выбор сделан
+        Frame(
+            f"📦 <b>СУНДУКИ ЛИСЫ</b>\n\n"
+            f"Ты выбрал сундук <b>№{chest_num}</b>!\n\n"
+            f"🔒 Сундук закрыт...\n\n"
+            "<i>Открываем...</i>",
+            1.0,
+        ),
+        # Фаза 2: Открывается
+        Frame(
+            f"📦 <b>СУНДУКИ ЛИСЫ</b>\n\n"
+            f"Сундук <b>№{chest_num}</b>\n\n"
+            f"🔓 Замок щёлкает...\n\n"
+            "<i>Что внутри?</i>",
+            0.8,
+        ),
+        # Фаза 3: Сияние
+        Frame(
+            f"📦 <b>СУНДУКИ ЛИСЫ</b>\n\n"
+            f"Сундук <b>№{chest_num}</b>\n\n"
+            f"✨ Сияние изнутри! ✨\n\n"
+            "<i>Смотрим приз...</i>",
+            1.0,
+        ),
+    ]
 
 
-async def animate_wheel(message: Message, final_sector: int) -> None:
-    """Анимация колеса удачи — простая"""
+def wheel_frames(final_sector: int) -> list[Frame]:
+    """Кадры колеса удачи — простые"""
     
     # Секторы колеса
     sectors = ["🦊", "💎", "🦊", "🔮", "⭐", "💰", "🎁", "❌"]
     
     # Фаза 1: Начало
-    await message.edit_text(
+    frames = [Frame(
         "🎡 <b>КОЛЕСО УДАЧИ</b>\n\n"
         "🦊 Лиса крутит колесо...\n\n"
-        "⏳ <i>Раскручивается...</i>"
-    )
-    await asyncio.sleep(1.0)
+        "⏳ <i>Раскручивается...</i>",
+        1.0,
+    )]
     
     # Фаза 2: Крутится — показываем мелькающие символы
     spin_count = 8 + random.randint(0, 4)
@@ -308,21 +195,22 @@ async def animate_wheel(message: Message, final_sector: int) -> None:
             status = "⏳ Замедляется..."
             delay = 0.5 + (i - 6) * 0.2
         
-        await message.edit_text(
+        frames.append(Frame(
             "🎡 <b>КОЛЕСО УДАЧИ</b>\n\n"
             f"➤ {current} ◀\n\n"
-            f"<i>{status}</i>"
-        )
-        await asyncio.sleep(min(delay, 0.9))
+            f"<i>{status}</i>",
+            min(delay, 0.9),
+        ))
     
     # Фаза 3: Останавливается
     final_symbol = sectors[final_sector % len(sectors)]
-    await message.edit_text(
+    frames.append(Frame(
         "🎡 <b>КОЛЕСО УДАЧИ</b>\n\n"
         f"🎯 ➤ {final_symbol} ◀ 🎯\n\n"
-        "<i>Колесо остановилось!</i>"
-    )
-    await asyncio.sleep(1.0)
+        "<i>Колесо остановилось!</i>",
+        1.0,
+    ))
+    return frames
 
 
 # ==================== ОСНОВНАЯ ИГРА ====================
@@ -331,7 +219,6 @@ async def play_game(
     session: AsyncSession,
     tg_id: int,
     use_coins: bool = False,
-    message: Message = None,
     game_type: str = None,
     test_mode: bool = False,
     chosen_chest: int = None,
@@ -342,177 +229,185 @@ async def play_game(
     game_type: "slots", "chest", "wheel" или None (случайный)
     test_mode: если True - бесконечные попытки для тестирования
     chosen_chest: индекс выбранного сундука (0, 1, 2) для игры с сундуками
-    """
-    player = await get_or_create_player(session, tg_id)
-    
-    # Проверяем и сбрасываем ежедневную попытку
-    await check_and_reset_daily_spin(session, tg_id)
-    
-    # Обновляем данные игрока
-    player = await get_or_create_player(session, tg_id)
     
-    coins_spent = 0
-    
-    # В тестовом режиме пропускаем проверку попыток
-    if test_mode:
-        pass  # Бесконечные попытки
-    elif player.free_spins > 0 or player.paid_spins > 0:
-        # Используем попытку (сначала бесплатные, потом купленные)
+    Все записи спина идут одной транзакцией с одним коммитом:
+    либо спин применён целиком, либо не применён вовсе.
+    Анимацию не проигрывает: кадры возвращаются в result["frames"].
+    """
+    try:
+        coins_spent = 0
+        new_balance = None  # Баланс дочитаем в конце, если его не вернёт UPDATE
+        
+        # Попытка — одним атомарным UPDATE, без предварительного SELECT игрока
+        # (сначала бесплатные, потом купленные); двойной тап не спишет лишнего
         from .db import use_spin
-        success, spin_type = await use_spin(session, tg_id)
+        if test_mode:
+            # Бесконечные попытки
+            await get_or_create_player(session, tg_id, commit=False)
+            success = True
+        else:
+            success, _ = await use_spin(session, tg_id, commit=False)
         if not success:
+            # Попыток нет (или игрока ещё нет — создаём, у нового есть бесплатная)
+            player = await get_or_create_player(session, tg_id, commit=False)
+            new_balance = player.coins
+            if available_free_spins(player) > 0 or player.paid_spins > 0:
+                success, _ = await use_spin(session, tg_id, commit=False)
+        
+        if success:
+            pass
+        elif use_coins:
+            if player.coins < SPIN_COST_COINS:
+                await session.rollback()
+                return {
+                    "success": False,
+                    "error": f"Недостаточно Лискоинов. Нужно {SPIN_COST_COINS}, у вас {new_balance}.",
+                    "game_type": None,
+                    "prize": None,
+                    "symbols": None,
+                    "coins_spent": 0,
+                    "new_balance": new_balance,
+                }
+            
+            new_balance = await update_player_coins(session, tg_id, -SPIN_COST_COINS, commit=False)
+            coins_spent = SPIN_COST_COINS
+        else:
+            await session.rollback()
             return {
                 "success": False,
-                "error": "Не удалось использовать попытку.",
-                "game_type": None,
-                "prize": None,
-                "symbols": None,
-                "coins_spent": 0,
-                "new_balance": player.coins,
-            }
-    elif use_coins:
-        if player.coins < SPIN_COST_COINS:
-            return {
-                "success": False,
-                "error": f"Недостаточно Лискоинов. Нужно {SPIN_COST_COINS}, у вас {player.coins}.",
+                "error": "no_spins",
                 "game_type": None,
                 "prize": None,
                 "symbols": None,
                 "coins_spent": 0,
-                "new_balance": player.coins,
+                "new_balance": new_balance,
             }
         
-        new_balance = await update_player_coins(session, tg_id, -SPIN_COST_COINS)
-        coins_spent = SPIN_COST_COINS
-    else:
-        return {
-            "success": False,
-            "error": "no_spins",
-            "game_type": None,
-            "prize": None,
-            "symbols": None,
-            "coins_spent": 0,
-            "new_balance": player.coins,
-        }
-    
-    # Проверяем активные бусты
-    boost_percent = 0
-    boosts = await get_active_boosts(session, tg_id)
-    for boost in boosts:
-        if boost.boost_type.startswith("luck_"):
-            try:
-                boost_percent += int(boost.boost_type.split("_")[1])
-                await use_boost(session, boost.id)
-            except (ValueError, IndexError):
-                pass
-    
-    # Бонус счастливого часа
-    from .events import get_happy_hour_boost
-    boost_percent += get_happy_hour_boost()
-    
-    # Выбираем тип игры
-    if game_type is None:
-        game_type = random.choice(["slots", "chest", "wheel"])
-    
-    # Крутим символы
-    symbols = roll_slots()
-    
-    # Параметры для анимаций
-    chest_index = chosen_chest if chosen_chest is not None else random.randint(0, 2)
-    wheel_sector = random.randint(0, 7)
-    
-    # Анимация (если есть сообщение)
-    if message:
-        try:
-            if game_type == "slots":
-                await animate_slots(message, symbols)
-            elif game_type == "chest":
-                await animate_chest_opening(message, chest_index)
-            elif game_type == "wheel":
-                await animate_wheel(message, wheel_sector)
-        except Exception as e:
-            logger.warning(f"[Gamification] Ошибка анимации: {e}")
-    
-    # Определяем приз
-    prize = get_prize_for_combination(symbols, boost_percent)
-    
-    # Применяем приз
-    if prize.prize_type == "coins":
-        new_balance = await update_player_coins(session, tg_id, prize.value)
-    elif prize.prize_type == "empty":
-        player = await get_or_create_player(session, tg_id)
-        new_balance = player.coins
-    elif prize.prize_type == "boost":
-        from .db import add_boost
-        await add_boost(session, tg_id, f"luck_{prize.value}", uses=1)
-        player = await get_or_create_player(session, tg_id)
-        new_balance = player.coins
-    else:
-        # VPN дни и баланс сохраняем как призы
-        await add_prize(
+        # Проверяем активные бусты
+        boost_percent = 0
+        boosts = await get_active_boosts(session, tg_id)
+        for boost in boosts:
+            if boost.boost_type.startswith("luck_"):
+                try:
+                    boost_percent += int(boost.boost_type.split("_")[1])
+                    await use_boost(session, boost.id, commit=False)
+                except (ValueError, IndexError):
+                    pass
+        
+        # Бонус счастливого часа
+        from .events import get_happy_hour_boost
+        boost_percent += get_happy_hour_boost()
+        
+        # Выбираем тип игры
+        if game_type is None:
+            game_type = random.choice(["slots", "chest", "wheel"])
+        
+        # Крутим символы
+        slot_roll = roll()
+        symbols = to_emoji(slot_roll)
+        
+        # Параметры для анимаций
+        chest_index = chosen_chest if chosen_chest is not None else random.randint(0, 2)
+        wheel_sector = random.randint(0, 7)
+        
+        # Определяем приз
+        prize = prize_for_roll(slot_roll, boost_percent)
+        
+        # Применяем приз
+        if prize.prize_type == "coins":
+            new_balance = await update_player_coins(session, tg_id, prize.value, commit=False)
+        elif prize.prize_type == "empty":
+            pass
+        elif prize.prize_type == "boost":
+            from .db import add_boost
+            await add_boost(session, tg_id, f"luck_{prize.value}", uses=1, commit=False)
+        else:
+            # VPN дни и баланс сохраняем как призы
+            await add_prize(
+                session=session,
+                tg_id=tg_id,
+                prize_type=prize.prize_type,
+                value=prize.value,
+                description=prize.description,
+                commit=False,
+            )
+        
+        # Записываем в историю
+        await add_game_history(
             session=session,
             tg_id=tg_id,
+            game_type=game_type,
             prize_type=prize.prize_type,
-            value=prize.value,
-            description=prize.description,
+            prize_value=prize.value,
+            prize_description=prize.description,
+            boost_used=boost_percent > 0,
+            commit=False,
         )
-        player = await get_or_create_player(session, tg_id)
-        new_balance = player.coins
-    
-    # Записываем в историю
-    await add_game_history(
-        session=session,
-        tg_id=tg_id,
-        game_type=game_type,
-        prize_type=prize.prize_type,
-        prize_value=prize.value,
-        prize_description=prize.description,
-        boost_used=boost_percent > 0,
-    )
-    
-    # Обновляем квесты
-    try:
-        from .quests import update_quest_progress, QuestType
         
-        # Квест "сыграть игру"
-        await update_quest_progress(session, tg_id, QuestType.PLAY_GAME)
+        # Второстепенные шаги — в SAVEPOINT: их ошибка откатывает только их,
+        # а не весь спин
         
-        # Квест "сыграть 3 игры"
-        await update_quest_progress(session, tg_id, QuestType.PLAY_3_GAMES)
+        # Обновляем квесты
+        try:
+            from .quests import update_quests_progress, QuestType
+            
+            # "Сыграть игру", "сыграть 3 игры" и "выиграть" (если не пустышка) — одним UPDATE
+            increments = {QuestType.PLAY_GAME: 1, QuestType.PLAY_3_GAMES: 1}
+            if prize.prize_type != "empty":
+                increments[QuestType.WIN_GAME] = 1
+            
+            async with session.begin_nested():
+                await update_quests_progress(session, tg_id, increments, commit=False)
+        except Exception as e:
+            logger.warning(f"[Gamification] Ошибка обновления квестов: {e}")
         
-        # Квест "выиграть" (если не пустышка)
-        if prize.prize_type != "empty":
-            await update_quest_progress(session, tg_id, QuestType.WIN_GAME)
-    except Exception as e:
-        logger.warning(f"[Gamification] Ошибка обновления квестов: {e}")
-    
-    # Реферальный бонус при первой игре
-    try:
-        from .referrals import give_referral_bonus
-        ref_result = await give_referral_bonus(session, tg_id)
-        if ref_result:
-            logger.info(f"[Gamification] Реф бонус: {tg_id} от {ref_result['referrer_id']}")
-    except Exception as e:
-        logger.warning(f"[Gamification] Ошибка реферального бонуса: {e}")
-    
-    # Прогрессивный джекпот
-    jackpot_win = None
-    try:
-        from .jackpot import add_to_jackpot, try_win_jackpot
+        # Реферальный бонус при первой игре
+        try:
+            from .referrals import give_referral_bonus
+            async with session.begin_nested():
+                ref_result = await give_referral_bonus(session, tg_id, commit=False)
+            if ref_result:
+                logger.info(f"[Gamification] Реф бонус: {tg_id} от {ref_result['referrer_id']}")
+        except Exception as e:
+            logger.warning(f"[Gamification] Ошибка реферального бонуса: {e}")
         
-        # Добавляем в банк
-        await add_to_jackpot(session)
+        # Прогрессивный джекпот
+        jackpot_win = None
+        try:
+            from .jackpot import add_to_jackpot, try_win_jackpot
+            
+            async with session.begin_nested():
+                # Добавляем в банк
+                await add_to_jackpot(session, commit=False)
+                
+                # Проверяем на выигрыш джекпота
+                jackpot_win = await try_win_jackpot(session, tg_id, commit=False)
+                if jackpot_win:
+                    # Выдаём джекпот
+                    jackpot_balance = await update_player_coins(session, tg_id, jackpot_win, commit=False)
+            if jackpot_win:
+                new_balance = jackpot_balance
+                logger.info(f"[Gamification] 🎰 ДЖЕКПОТ! {tg_id} выиграл {jackpot_win} 🦊")
+        except Exception as e:
+            jackpot_win = None
+            logger.warning(f"[Gamification] Ошибка джекпота: {e}")
         
-        # Проверяем на выигрыш джекпота
-        jackpot_win = await try_win_jackpot(session, tg_id)
-        if jackpot_win:
-            # Выдаём джекпот
-            await update_player_coins(session, tg_id, jackpot_win)
-            player = await get_or_create_player(session, tg_id)
-            new_balance = player.coins
-            logger.info(f"[Gamification] 🎰 ДЖЕКПОТ! {tg_id} выиграл {jackpot_win} 🦊")
-    except Exception as e:
-        logger.warning(f"[Gamification] Ошибка джекпота: {e}")
+        if new_balance is None:
+            new_balance = (await get_or_create_player(session, tg_id, commit=False)).coins
+        
+        # Единственный коммит за спин
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    
+    # Кадры анимации — проигрывает вызывающий через планировщик, уже без сессии
+    if game_type == "slots":
+        frames = slots_frames(symbols)
+    elif game_type == "chest":
+        frames = chest_frames(chest_index)
+    else:
+        frames = wheel_frames(wheel_sector)
     
     logger.info(
         f"[Gamification] Игра {tg_id}: {game_type} [{symbols}] -> {prize.rarity} {prize.prize_type}:{prize.value}"
@@ -527,6 +422,152 @@ async def play_game(
         "coins_spent": coins_spent,
         "new_balance": new_balance,
         "jackpot_win": jackpot_win,
+        "frames": frames,
+    }
+
+
+BATCH_SIZES = (5, 10)  # Кнопки «×5 / ×10» после игры
+
+
+async def play_games_batch(
+    session: AsyncSession,
+    tg_id: int,
+    n: int,
+    game_type: str = "slots",
+    test_mode: bool = False,
+) -> dict:
+    """
+    Сыграть n раз подряд за попытки — одной транзакцией и без анимации.
+    
+    Попытки списываются одним UPDATE (все n или ни одной), n спинов крутятся
+    одним вызовом roll_many, Лискоины начисляются одним UPDATE, история пишется
+    одним bulk INSERT, квесты и джекпот обновляются один раз на пачку.
+    Буст удачи действует на столько спинов, сколько у него осталось использований.
+    """
+    from .db import add_boost, add_game_history_batch, add_prizes, use_spins
+    
+    try:
+        player = await get_or_create_player(session, tg_id, commit=False)
+        
+        if not test_mode and not await use_spins(session, tg_id, n, commit=False):
+            await session.rollback()
+            return {
+                "success": False,
+                "error": "no_spins",
+                "spins_left": available_free_spins(player) + player.paid_spins,
+                "new_balance": player.coins,
+            }
+        
+        # Буст на i-й спин: сумма бустов, у которых осталось больше i использований
+        spin_boosts = [0] * n
+        for boost in await get_active_boosts(session, tg_id):
+            if not boost.boost_type.startswith("luck_"):
+                continue
+            try:
+                percent = int(boost.boost_type.split("_")[1])
+            except (ValueError, IndexError):
+                continue
+            uses = min(boost.uses_left, n)
+            for index in range(uses):
+                spin_boosts[index] += percent
+            await use_boost(session, boost.id, commit=False, uses=uses)
+        
+        from .events import get_happy_hour_boost
+        happy_hour = get_happy_hour_boost()
+        
+        rolls = roll_many(n)
+        prizes = [prize_for_roll(slot_roll, boost + happy_hour) for slot_roll, boost in zip(rolls, spin_boosts)]
+        
+        # Применяем призы: Лискоины — суммой, призы и бусты — пачкой
+        coins_won = sum(prize.value for prize in prizes if prize.prize_type == "coins")
+        new_balance = player.coins
+        if coins_won:
+            new_balance = await update_player_coins(session, tg_id, coins_won, commit=False)
+        
+        for prize in prizes:
+            if prize.prize_type == "boost":
+                await add_boost(session, tg_id, f"luck_{prize.value}", uses=1, commit=False)
+        await add_prizes(
+            session,
+            tg_id,
+            [
+                (prize.prize_type, prize.value, prize.description)
+                for prize in prizes if prize.prize_type in ("vpn_days", "balance")
+            ],
+            commit=False,
+        )
+        
+        await add_game_history_batch(
+            session,
+            tg_id,
+            [
+                {
+                    "game_type": game_type,
+                    "prize_type": prize.prize_type,
+                    "prize_value": prize.value,
+                    "prize_description": prize.description,
+                    "boost_used": boost + happy_hour > 0,
+                }
+                for prize, boost in zip(prizes, spin_boosts)
+            ],
+            commit=False,
+        )
+        
+        wins = sum(1 for prize in prizes if prize.prize_type != "empty")
+        
+        # Квесты — одним UPDATE на всю пачку
+        try:
+            from .quests import update_quests_progress, QuestType
+            
+            increments = {QuestType.PLAY_GAME: n, QuestType.PLAY_3_GAMES: n, QuestType.WIN_GAME: wins}
+            async with session.begin_nested():
+                await update_quests_progress(session, tg_id, increments, commit=False)
+        except Exception as e:
+            logger.warning(f"[Gamification] Ошибка обновления квестов: {e}")
+        
+        # Реферальный бонус при первой игре
+        try:
+            from .referrals import give_referral_bonus
+            async with session.begin_nested():
+                ref_result = await give_referral_bonus(session, tg_id, commit=False)
+            if ref_result:
+                logger.info(f"[Gamification] Реф бонус: {tg_id} от {ref_result['referrer_id']}")
+        except Exception as e:
+            logger.warning(f"[Gamification] Ошибка реферального бонуса: {e}")
+        
+        # Джекпот: вклад за n игр и n шансов — одним розыгрышем
+        jackpot_win = None
+        try:
+            from .jackpot import JACKPOT_CONTRIBUTION, add_to_jackpot, try_win_jackpot
+            
+            async with session.begin_nested():
+                await add_to_jackpot(session, JACKPOT_CONTRIBUTION * n, commit=False)
+                jackpot_win = await try_win_jackpot(session, tg_id, commit=False, chances=n)
+                if jackpot_win:
+                    jackpot_balance = await update_player_coins(session, tg_id, jackpot_win, commit=False)
+            if jackpot_win:
+                new_balance = jackpot_balance
+                logger.info(f"[Gamification] 🎰 ДЖЕКПОТ! {tg_id} выиграл {jackpot_win} 🦊")
+        except Exception as e:
+            jackpot_win = None
+            logger.warning(f"[Gamification] Ошибка джекпота: {e}")
+        
+        # Единственный коммит за пачку
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    
+    logger.info(f"[Gamification] Пачка {tg_id}: {game_type} ×{n} -> {wins} выигрышей, +{coins_won} 🦊")
+    
+    return {
+        "success": True,
+        "error": None,
+        "game_type": game_type,
+        "spins": [(to_emoji(slot_roll), prize) for slot_roll, prize in zip(rolls, prizes)],
+        "coins_won": coins_won,
+        "new_balance": new_balance,
+        "jackpot_win": jackpot_win,
     }
 
 
@@ -589,3 +630,27 @@ def format_prize_message(game_type: str, prize: Prize, symbols: list[str], coins
     message += f"🦊 Баланс: <b>{new_balance}</b> Лискоинов"
     
     return message
+
+
+def format_batch_message(game_type: str, spins: list[tuple[list[str], Prize]], coins_won: int, new_balance: int) -> str:
+    """Итог пачки спинов одним сообщением"""
+    title = "🎰 <b>СЛОТЫ</b>" if game_type == "slots" else "🎡 <b>КОЛЕСО УДАЧИ</b>"
+    lines = []
+    for symbols, prize in spins:
+        result = "—" if prize.prize_type == "empty" else f"{prize.emoji} {prize.description}"
+        if game_type == "slots":
+            lines.append(f"[ {' '.join(symbols)} ] {result}")
+        else:
+            lines.append(f"🎯 {result}")
+    
+    message = f"{title} ×{len(spins)}\n\n" + "\n".join(lines) + "\n\n"
+    
+    wins = sum(1 for _, prize in spins if prize.prize_type != "empty")
+    message += f"🏆 Выигрышей: <b>{wins}</b> из {len(spins)}\n"
+    if coins_won:
+        message += f"🦊 Лискоинов: <b>+{coins_won}</b>\n"
+    if any(prize.prize_type in ("vpn_days", "balance") for _, prize in spins):
+        message += "📦 <i>Призы сохранены в «Мои призы»</i>\n"
+    
+    message += f"\n🦊 Баланс: <b>{new_balance}</b> Лискоинов"
+    return message
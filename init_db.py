@@ -1,35 +1,147 @@
 """
 Инициализация таблиц БД для модуля геймификации
 """
+from sqlalchemy import inspect, text
+
 from database.db import engine
 from logger import logger
 
 from .models import (
-    Base, FoxBoost, FoxGameHistory, FoxPlayer, FoxPrize,
-    FoxDeal, FoxQuest, FoxCasinoSession, FoxCasinoGame, FoxCasinoProfile
+    Base, FoxBoost, FoxDailyWins, FoxGameHistory, FoxPlayer, FoxPrize,
+    FoxDeal, FoxQuest, FoxCasinoSession, FoxCasinoGame, FoxCasinoProfile,
+    FoxNotifyCampaign, FoxNotifyDelivery,
 )
-from .jackpot import FoxJackpot, FoxJackpotWin
+from .jackpot import FoxJackpot, FoxJackpotBatch, FoxJackpotShard, FoxJackpotWin
+from .partitions import ensure_partitions, needs_conversion
+from .state_store import FoxGameState
+
+
+# Таблицы модуля в порядке создания
+# ВАЖНО: FoxCasinoSession должна быть создана ДО FoxCasinoGame из-за FK
+GAMIFICATION_TABLES = [
+    FoxPlayer.__table__,
+    FoxPrize.__table__,
+    FoxGameHistory.__table__,
+    FoxDailyWins.__table__,
+    FoxBoost.__table__,
+    FoxDeal.__table__,
+    FoxQuest.__table__,
+    FoxCasinoSession.__table__,
+    FoxCasinoGame.__table__,
+    FoxCasinoProfile.__table__,
+    FoxJackpot.__table__,
+    FoxJackpotShard.__table__,
+    FoxJackpotWin.__table__,
+    FoxJackpotBatch.__table__,
+    FoxGameState.__table__,
+    FoxNotifyCampaign.__table__,
+    FoxNotifyDelivery.__table__,
+]
+
+# Таблицы с помесячными партициями по created_at (partitions.py)
+PARTITIONED_TABLES = [FoxGameHistory.__table__, FoxCasinoGame.__table__]
+
+
+def _migrate_quest_day(sync_conn):
+    """
+    fox_quests.day — день квеста для уникального ключа (tg_id, day, quest_type).
+    Для старых таблиц: добавляем колонку, заполняем из created_at
+    и убираем дубли за день (оставляем первый квест), иначе ключ не создать.
+    """
+    columns = {column["name"] for column in inspect(sync_conn).get_columns("fox_quests")}
+    if "day" in columns:
+        return
+    
+    sync_conn.execute(text("ALTER TABLE fox_quests ADD COLUMN day DATE"))
+    sync_conn.execute(text("UPDATE fox_quests SET day = COALESCE(created_at, now())::date"))
+    sync_conn.execute(text(
+        "DELETE FROM fox_quests a USING fox_quests b "
+        "WHERE a.tg_id = b.tg_id AND a.day = b.day AND a.quest_type = b.quest_type AND a.id > b.id"
+    ))
+    sync_conn.execute(text("ALTER TABLE fox_quests ALTER COLUMN day SET NOT NULL"))
+    logger.info("[Gamification] fox_quests: добавлена колонка day")
+
+
+def _migrate_free_spin_date(sync_conn):
+    """
+    fox_players.last_free_spin_date раньше означал «попытка восстановлена», теперь — «потрачена».
+    Один раз (до создания ix_fox_players_free_spin_ready): тем, у кого по старой записи
+    попытка уже восстановилась, но не записана, пишем free_spins = 1, как сделал бы
+    старый check_and_reset_daily_spin. Иначе они попали бы в окна пуша «попытка
+    восстановилась» сразу после обновления. У остальных время до попытки не меняется.
+    """
+    from datetime import datetime
+
+    from .db import FREE_SPIN_COOLDOWN
+
+    indexes = {index["name"] for index in inspect(sync_conn).get_indexes("fox_players")}
+    if "ix_fox_players_free_spin_ready" in indexes:
+        return
+    
+    result = sync_conn.execute(
+        text(
+            "UPDATE fox_players SET free_spins = 1 "
+            "WHERE free_spins = 0 AND last_free_spin_date <= :ready_before"
+        ),
+        {"ready_before": datetime.utcnow() - FREE_SPIN_COOLDOWN},
+    )
+    logger.info(f"[Gamification] fox_players: восстановлено бесплатных попыток по старой дате — {result.rowcount}")
+
+
+def _migrate_casino_ledger(sync_conn):
+    """
+    fox_casino_games стал журналом ставок: event_id и balance_after.
+    Журнал пишет с ON CONFLICT (event_id, created_at) — таблице, ещё не переведённой
+    на партиции, нужен уникальный индекс под этот ключ (у партиционированной он в модели).
+    """
+    columns = {column["name"] for column in inspect(sync_conn).get_columns("fox_casino_games")}
+    if "event_id" not in columns:
+        sync_conn.execute(text("ALTER TABLE fox_casino_games ADD COLUMN event_id VARCHAR(32)"))
+        logger.info("[Gamification] fox_casino_games: добавлена колонка event_id")
+    if "balance_after" not in columns:
+        sync_conn.execute(text("ALTER TABLE fox_casino_games ADD COLUMN balance_after FLOAT"))
+    if needs_conversion(sync_conn, "fox_casino_games"):
+        sync_conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_fox_casino_games_event_id "
+            "ON fox_casino_games (event_id, created_at)"
+        ))
+
+
+def _ensure_partitions(sync_conn):
+    """
+    Помесячные партиции истории на ближайшие месяцы.
+    Старые обычные таблицы здесь не переводятся — это долгая переливка под блокировкой,
+    её делает migrate_partitions.py; до перевода таблица работает как раньше.
+    """
+    for table in PARTITIONED_TABLES:
+        if needs_conversion(sync_conn, table.name):
+            logger.warning(
+                f"[Gamification] {table.name} не партиционирована — запусти "
+                f"python -m modules.gamification.migrate_partitions"
+            )
+            continue
+        ensure_partitions(sync_conn, table.name)
+
+
+def _create_missing_indexes(sync_conn):
+    """
+    Создать индексы, которых ещё нет.
+    create_all пропускает существующие таблицы целиком, поэтому индексы,
+    добавленные в модели позже, докатываются здесь.
+    """
+    for table in GAMIFICATION_TABLES:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
 
 
 async def init_gamification_db():
-    """Создать таблицы модуля геймификации"""
+    """Создать таблицы и индексы модуля геймификации"""
     async with engine.begin() as conn:
         # Создаём только таблицы этого модуля
-        # ВАЖНО: FoxCasinoSession должна быть создана ДО FoxCasinoGame из-за FK
-        await conn.run_sync(
-            Base.metadata.create_all,
-            tables=[
-                FoxPlayer.__table__,
-                FoxPrize.__table__,
-                FoxGameHistory.__table__,
-                FoxBoost.__table__,
-                FoxDeal.__table__,
-                FoxQuest.__table__,
-                FoxCasinoSession.__table__,
-                FoxCasinoGame.__table__,
-                FoxCasinoProfile.__table__,
-                FoxJackpot.__table__,
-                FoxJackpotWin.__table__,
-            ]
-        )
+        await conn.run_sync(Base.metadata.create_all, tables=GAMIFICATION_TABLES)
+        await conn.run_sync(_migrate_quest_day)
+        await conn.run_sync(_migrate_free_spin_date)
+        await conn.run_sync(_migrate_casino_ledger)
+        await conn.run_sync(_ensure_partitions)
+        await conn.run_sync(_create_missing_indexes)
     logger.info("[Gamification] Таблицы БД созданы/проверены")
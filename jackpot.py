@@ -4,16 +4,23 @@
 - Очень редкий шанс выиграть весь банк
 - Банк отображается в меню
 """
+import asyncio
 import json
 import os
 import random
-from datetime import datetime
+import time
+import uuid
+from datetime import datetime, timedelta
 from pathlib import Path
 
-from sqlalchemy import BigInteger, Column, DateTime, Float, Integer, String
+from sqlalchemy import BigInteger, Column, DateTime, Float, Integer, String, delete, event, func, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import Base
+from logger import logger
+
+from .journal import flushing_path, orphaned_journals, process_journal_path
 
 
 # Настройки джекпота
@@ -21,6 +28,11 @@ JACKPOT_CONTRIBUTION = 5  # Лискоинов с каждой игры в ба
 JACKPOT_WIN_CHANCE = 0.001  # 0.1% шанс на джекпот (1 из 1000)
 JACKPOT_MIN_POOL = 100  # Минимальный банк для розыгрыша
 JACKPOT_START_POOL = 500  # Начальный банк
+JACKPOT_SHARDS = 16  # Количество шардов банка (вклады раскидываются по ним)
+JACKPOT_FLUSH_INTERVAL = 5  # Секунд между сбросами накопленных вкладов в БД
+JACKPOT_JOURNAL_PATH = Path(__file__).parent / "jackpot_journal.log"  # Журнал несброшенных вкладов (свой у процесса)
+JACKPOT_BATCH_RETENTION_DAYS = 7  # Сколько хранить id записанных пачек вкладов
+JACKPOT_CACHE_TTL = 3  # Секунд, которые меню показывают закешированный банк
 
 
 class FoxJackpot(Base):
@@ -28,13 +40,25 @@ class FoxJackpot(Base):
     __tablename__ = "fox_jackpot"
     
     id = Column(Integer, primary_key=True, default=1)
-    pool = Column(Integer, default=JACKPOT_START_POOL, nullable=False)  # Текущий банк
+    pool = Column(Integer, default=JACKPOT_START_POOL, nullable=False)  # Базовая часть банка (без шардов)
     last_winner_id = Column(BigInteger, nullable=True)  # Последний победитель
     last_win_amount = Column(Integer, nullable=True)  # Последний выигрыш
     last_win_date = Column(DateTime, nullable=True)  # Когда был выигран
     total_won = Column(Integer, default=0, nullable=False)  # Всего выиграно за всё время
 
 
+class FoxJackpotShard(Base):
+    """
+    Шард банка джекпота.
+    Вклады идут в случайный шард атомарным pool = pool + x,
+    поэтому игроки не упираются в блокировку одной строки.
+    """
+    __tablename__ = "fox_jackpot_shards"
+    
+    shard_id = Column(Integer, primary_key=True, autoincrement=False)
+    pool = Column(BigInteger, default=0, nullable=False)  # Накопленные вклады
+
+
 class FoxJackpotWin(Base):
     """История выигрышей джекпота"""
     __tablename__ = "fox_jackpot_wins"
@@ -45,56 +69,386 @@ class FoxJackpotWin(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
-async def get_or_create_jackpot(session: AsyncSession) -> FoxJackpot:
-    """Получить или создать запись джекпота"""
-    from sqlalchemy import select
+class FoxJackpotBatch(Base):
+    """
+    Пачка вкладов из журнала, уже записанная в шарды.
+    Пишется в одной транзакции с шардом — повтор пачки после падения ничего не удвоит.
+    """
+    __tablename__ = "fox_jackpot_batches"
+    
+    batch_id = Column(String(32), primary_key=True)
+    amount = Column(BigInteger, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+async def get_or_create_jackpot(session: AsyncSession, for_update: bool = False) -> FoxJackpot:
+    """
+    Получить или создать запись джекпота.
+    for_update=True — заблокировать строку до конца транзакции (для выплаты).
+    """
+    query = select(FoxJackpot).where(FoxJackpot.id == 1)
+    if for_update:
+        query = query.with_for_update().execution_options(populate_existing=True)
     
-    result = await session.execute(select(FoxJackpot).where(FoxJackpot.id == 1))
+    result = await session.execute(query)
     jackpot = result.scalar_one_or_none()
     
     if not jackpot:
-        jackpot = FoxJackpot(id=1, pool=JACKPOT_START_POOL)
-        session.add(jackpot)
+        # ON CONFLICT — запись могла создать параллельная транзакция
+        await session.execute(
+            insert(FoxJackpot)
+            .values(id=1, pool=JACKPOT_START_POOL, total_won=0)
+            .on_conflict_do_nothing(index_elements=[FoxJackpot.id])
+        )
         await session.commit()
+        result = await session.execute(query)
+        jackpot = result.scalar_one()
     
     return jackpot
 
 
-async def get_jackpot_pool(session: AsyncSession) -> int:
-    """Получить текущий размер джекпота"""
-    jackpot = await get_or_create_jackpot(session)
-    return jackpot.pool
+async def get_shards_total(session: AsyncSession) -> int:
+    """Сумма вкладов по всем шардам"""
+    result = await session.execute(
+        select(func.coalesce(func.sum(FoxJackpotShard.pool), 0))
+    )
+    return int(result.scalar_one())
 
 
-async def add_to_jackpot(session: AsyncSession, amount: int = JACKPOT_CONTRIBUTION) -> int:
-    """Добавить в банк джекпота. Возвращает новый размер."""
+async def get_stored_pool(session: AsyncSession) -> int:
+    """Банк, записанный в БД (база + все шарды)"""
     jackpot = await get_or_create_jackpot(session)
-    jackpot.pool += amount
-    await session.commit()
-    return jackpot.pool
+    return jackpot.pool + await get_shards_total(session)
+
+
+async def get_jackpot_pool(session: AsyncSession) -> int:
+    """Получить текущий размер джекпота (база + все шарды + несброшенные вклады)"""
+    return await get_stored_pool(session) + get_pending_contributions()
+
+
+# ==================== Кеш банка для меню ====================
+#
+# Меню показывают банк на каждом открытии — им хватает значения не старше
+# JACKPOT_CACHE_TTL секунд. Кешируется только часть из БД, несброшенные
+# вклады этого процесса добавляются сверху, так что рост банка виден сразу.
+# Выплаты кешем не пользуются.
+
+_pool_cache: tuple[float, int] | None = None  # (когда протухает, банк в БД)
+
+
+def _set_pool_cache(stored_pool: int) -> None:
+    global _pool_cache
+    _pool_cache = (time.monotonic() + JACKPOT_CACHE_TTL, stored_pool)
+
+
+def invalidate_jackpot_cache() -> None:
+    """Сбросить кеш банка"""
+    global _pool_cache
+    _pool_cache = None
+
+
+async def get_cached_jackpot_pool(session: AsyncSession) -> int:
+    """Размер джекпота для отображения (через кеш с TTL)"""
+    if _pool_cache is None or _pool_cache[0] <= time.monotonic():
+        _set_pool_cache(await get_stored_pool(session))
+    return _pool_cache[1] + get_pending_contributions()
 
 
-async def try_win_jackpot(session: AsyncSession, tg_id: int) -> int | None:
+async def add_to_jackpot_shard(
+    session: AsyncSession,
+    amount: int,
+    shard: int | None = None,
+    commit: bool = True,
+) -> None:
     """
-    Попытаться выиграть джекпот.
-    Возвращает сумму выигрыша или None.
+    Записать вклад в БД.
+    Вклад атомарно прибавляется к одному шарду (случайному, если не указан),
+    строка шарда создаётся при первом вкладе.
     """
-    jackpot = await get_or_create_jackpot(session)
+    if shard is None:
+        shard = random.randrange(JACKPOT_SHARDS)
     
-    # Проверяем минимальный банк
-    if jackpot.pool < JACKPOT_MIN_POOL:
-        return None
+    stmt = insert(FoxJackpotShard).values(shard_id=shard, pool=amount)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[FoxJackpotShard.shard_id],
+            set_={"pool": FoxJackpotShard.pool + stmt.excluded.pool},
+        )
+    )
+    if commit:
+        await session.commit()
+
+
+# ==================== Буфер вкладов (write-behind) ====================
+#
+# Вклад попадает в буфер только после коммита транзакции игры: откат
+# (в том числе savepoint'а) его отменяет. Буфер копится в памяти процесса
+# и раз в JACKPOT_FLUSH_INTERVAL секунд пишется в БД одним UPDATE.
+# Каждый вклад дописывается строкой в журнал процесса (journal.py): если
+# процесс упал до сброса, журнал проигрывается при следующем старте.
+# Сброс идёт пачкой: batch_id дописывается в файл пачки до записи в БД,
+# а в БД — в одной транзакции с шардом (fox_jackpot_batches). Пачка,
+# уже записанная до падения, при повторе пропускается.
+# Журнал не fsync'ится — при падении всей машины теряется не больше
+# одного интервала вкладов (банк чуть меньше, балансы игроков не затронуты).
+
+_BATCH_PREFIX = "batch:"  # Строка журнала с id пачки
+_SESSION_KEY = "jackpot_contributions"  # session.info: [(транзакция, сумма), ...] до коммита
+
+_pending_pool = 0  # Вклады в журнале, ещё не собранные в пачку
+_batches: dict[Path, tuple[str, int]] = {}  # Файл пачки -> (batch_id, сумма); ещё не подтверждены БД
+_journal = None  # Открытый на дозапись файл журнала
+_journal_path: Path | None = None  # Журнал этого процесса
+_flush_lock = asyncio.Lock()
+_flush_task: asyncio.Task | None = None
+
+
+def _read_journal(path: Path) -> tuple[str | None, int]:
+    """Id пачки (первый в файле) и сумма вкладов в файле журнала"""
+    if not path.exists():
+        return None, 0
     
-    # Проверяем шанс
-    if random.random() > JACKPOT_WIN_CHANCE:
-        return None
+    batch_id = None
+    total = 0
+    for line in path.read_text().splitlines():
+        if line.startswith(_BATCH_PREFIX):
+            batch_id = batch_id or line[len(_BATCH_PREFIX):]
+            continue
+        try:
+            total += int(line)
+        except ValueError:
+            pass  # Недописанная строка при падении
+    return batch_id, total
+
+
+def _claim_batch(path: Path) -> None:
+    """
+    Поставить файл журнала в очередь сброса пачкой, дописав batch_id, если его ещё нет.
+    Если файл одновременно подбирают два процесса, оба возьмут первый дописанный id.
+    """
+    batch_id, amount = _read_journal(path)
+    if batch_id is None:
+        if amount == 0:
+            path.unlink(missing_ok=True)
+            return
+        with open(path, "a") as file:
+            # С новой строки: последняя строка могла остаться недописанной
+            file.write(f"\n{_BATCH_PREFIX}{uuid.uuid4().hex}\n")
+        batch_id, amount = _read_journal(path)
+    _batches[path] = (batch_id, amount)
+
+
+def _open_journal():
+    """
+    Открыть журнал. При первом открытии подбираем то, что осталось от прошлого
+    запуска и от завершившихся воркеров этого хоста, — уйдёт в БД при ближайшем сбросе.
+    """
+    global _journal, _journal_path, _pending_pool
+    if _journal is not None:
+        return _journal
     
-    # ДЖЕКПОТ!
-    win_amount = jackpot.pool
+    _journal_path = process_journal_path(JACKPOT_JOURNAL_PATH)
+    _journal = open(_journal_path, "a", buffering=1)
+    
+    # Свой журнал (тот же хост и pid) ещё не сбрасывался — просто продолжаем его
+    _, replayed = _read_journal(_journal_path)
+    _pending_pool += replayed
+    
+    # Прерванный сброс и журналы завершившихся процессов — пачками со своим batch_id
+    for path in [flushing_path(_journal_path), *orphaned_journals(JACKPOT_JOURNAL_PATH)]:
+        if path.exists():
+            _claim_batch(path)
+    replayed += sum(amount for _, amount in _batches.values())
+    
+    if replayed:
+        logger.info(f"[Gamification] Джекпот: из журнала восстановлено {replayed}")
+    return _journal
+
+
+def get_pending_contributions() -> int:
+    """Вклады, накопленные в процессе и ещё не записанные в БД"""
+    return _pending_pool + sum(amount for _, amount in _batches.values())
+
+
+def _buffer_contribution(amount: int) -> None:
+    """Вклад в буфер и журнал"""
+    global _pending_pool
+    _open_journal().write(f"{amount}\n")
+    _pending_pool += amount
+
+
+def _on_commit(session) -> None:
+    """Коммит транзакции: вклады из неё — в буфер"""
+    if session.get_nested_transaction() is not None:
+        return  # Отпущен savepoint — ждём коммита всей транзакции
+    for _, amount in session.info.pop(_SESSION_KEY, []):
+        _buffer_contribution(amount)
+
+
+def _on_soft_rollback(session, previous_transaction) -> None:
+    """Откат транзакции или savepoint'а отменяет вклады, сделанные внутри него"""
+    def rolled_back(transaction) -> bool:
+        while transaction is not None:
+            if transaction is previous_transaction:
+                return True
+            transaction = transaction.parent
+        return False
+    
+    contributions = session.info.get(_SESSION_KEY)
+    if contributions:
+        contributions[:] = [item for item in contributions if not rolled_back(item[0])]
+
+
+def _on_transaction_end(session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_SESSION_KEY, None)  # Транзакция закрыта без коммита
+
+
+async def add_to_jackpot(
+    session: AsyncSession,
+    amount: int = JACKPOT_CONTRIBUTION,
+    commit: bool = True,
+) -> None:
+    """
+    Добавить в банк джекпота.
+    Вклад попадает в буфер после коммита транзакции session (откат его отменяет),
+    в БД — при ближайшем flush_jackpot(). commit здесь не используется
+    (оставлен для совместимости): коммитит вызывающий вместе с игрой.
+    """
+    sync_session = session.sync_session
+    transaction = sync_session.get_nested_transaction() or sync_session.get_transaction()
+    if transaction is None:
+        _buffer_contribution(amount)  # Транзакции нет — ждать нечего
+        return
+    
+    if not event.contains(sync_session, "after_commit", _on_commit):
+        event.listen(sync_session, "after_commit", _on_commit)
+        event.listen(sync_session, "after_soft_rollback", _on_soft_rollback)
+        event.listen(sync_session, "after_transaction_end", _on_transaction_end)
+    sync_session.info.setdefault(_SESSION_KEY, []).append((transaction, amount))
+
+
+async def apply_jackpot_batch(session: AsyncSession, batch_id: str, amount: int) -> int:
+    """
+    Записать пачку вкладов в шард, если она ещё не записана (коммит — за вызывающим).
+    Возвращает записанную сумму (0 — пачка уже в БД).
+    """
+    applied = await session.scalar(
+        insert(FoxJackpotBatch)
+        .values(batch_id=batch_id, amount=amount)
+        .on_conflict_do_nothing(index_elements=[FoxJackpotBatch.batch_id])
+        .returning(FoxJackpotBatch.batch_id)
+    )
+    if applied is None:
+        logger.info(f"[Gamification] Джекпот: пачка {batch_id} уже записана, пропускаем")
+        return 0
+    
+    await add_to_jackpot_shard(session, amount, commit=False)
+    return amount
+
+
+async def flush_jackpot() -> int:
+    """
+    Записать накопленные вклады в БД (в своей сессии, одной транзакцией).
+    Возвращает записанную сумму.
+    """
+    global _pending_pool, _journal, _pool_cache
+    from database.db import async_session_maker
+    
+    async with _flush_lock:
+        _open_journal()
+        
+        # Буфер — в пачку: ротируем журнал (новые вклады идут в свежий файл).
+        # Пока прошлая пачка не записана, новая не собирается — прошлая повторяется с тем же id
+        own_batch = flushing_path(_journal_path)
+        if _pending_pool and own_batch not in _batches:
+            _journal.close()
+            _journal_path.replace(own_batch)
+            _journal = open(_journal_path, "a", buffering=1)
+            _pending_pool = 0
+            _claim_batch(own_batch)
+        
+        if not _batches:
+            return 0
+        
+        # Не получилось — пачки остаются в очереди и в файлах до следующего сброса
+        async with async_session_maker() as session:
+            amount = 0
+            for batch_id, batch_amount in _batches.values():
+                amount += await apply_jackpot_batch(session, batch_id, batch_amount)
+            await session.execute(
+                delete(FoxJackpotBatch)
+                .where(FoxJackpotBatch.applied_at < datetime.utcnow() - timedelta(days=JACKPOT_BATCH_RETENTION_DAYS))
+            )
+            await session.commit()
+        
+        for path in _batches:
+            path.unlink(missing_ok=True)
+        _batches.clear()
+        
+        # Вклады переехали из буфера в БД — переносим их и в кеш
+        if _pool_cache is not None:
+            _pool_cache = (_pool_cache[0], _pool_cache[1] + amount)
+    
+    return amount
+
+
+async def _flush_loop():
+    """Фоновый сброс вкладов"""
+    while True:
+        await asyncio.sleep(JACKPOT_FLUSH_INTERVAL)
+        try:
+            await flush_jackpot()
+        except Exception as e:
+            logger.warning(f"[Gamification] Ошибка сброса джекпота: {e}")
+
+
+def start_jackpot_flusher():
+    """Запустить фоновый сброс вкладов (и проиграть журнал, если он остался)"""
+    global _flush_task
+    _open_journal()
+    if _flush_task is None or _flush_task.done():
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop_jackpot_flusher():
+    """Остановить фоновый сброс и записать остаток в БД"""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        _flush_task = None
+    await flush_jackpot()
+
+
+async def drain_jackpot(session: AsyncSession, tg_id: int, commit: bool = True) -> int:
+    """
+    Забрать весь банк: обнулить шарды, сбросить базу, записать победителя.
+    Строка джекпота и шарды блокируются до конца транзакции — второй
+    победитель дождётся коммита и увидит уже сброшенный банк.
+    Возвращает сумму выигрыша.
+    """
+    # Сначала дописываем в БД всё накопленное — выплата должна быть точной
+    await flush_jackpot()
+    
+    jackpot = await get_or_create_jackpot(session, for_update=True)
+    
+    result = await session.execute(
+        select(FoxJackpotShard.shard_id, FoxJackpotShard.pool)
+        .with_for_update()
+    )
+    shards = result.all()
+    
+    if shards:
+        await session.execute(
+            update(FoxJackpotShard)
+            .where(FoxJackpotShard.shard_id.in_([row.shard_id for row in shards]))
+            .values(pool=0)
+        )
+    
+    win_amount = jackpot.pool + sum(row.pool for row in shards)
     
     # Записываем историю
-    win = FoxJackpotWin(tg_id=tg_id, amount=win_amount)
-    session.add(win)
+    session.add(FoxJackpotWin(tg_id=tg_id, amount=win_amount))
     
     # Обновляем джекпот
     jackpot.pool = JACKPOT_START_POOL  # Сбрасываем банк
@@ -103,17 +457,39 @@ async def try_win_jackpot(session: AsyncSession, tg_id: int) -> int | None:
     jackpot.last_win_date = datetime.utcnow()
     jackpot.total_won += win_amount
     
-    await session.commit()
+    if commit:
+        await session.commit()
+    
+    # Банк сброшен — меню сразу должны увидеть начальное значение
+    _set_pool_cache(JACKPOT_START_POOL)
     
     return win_amount
 
 
+async def try_win_jackpot(session: AsyncSession, tg_id: int, commit: bool = True, chances: int = 1) -> int | None:
+    """
+    Попытаться выиграть джекпот.
+    chances — сколько игр разыгрывается сразу (пачка спинов): шанс как у chances попыток подряд.
+    Возвращает сумму выигрыша или None.
+    """
+    # Сначала шанс — в 99.9% случаев в БД вообще не идём
+    if random.random() > 1 - (1 - JACKPOT_WIN_CHANCE) ** chances:
+        return None
+    
+    # Проверяем минимальный банк
+    if await get_jackpot_pool(session) < JACKPOT_MIN_POOL:
+        return None
+    
+    # ДЖЕКПОТ!
+    return await drain_jackpot(session, tg_id, commit=commit)
+
+
 async def get_jackpot_info(session: AsyncSession) -> dict:
     """Получить информацию о джекпоте"""
     jackpot = await get_or_create_jackpot(session)
     
     return {
-        "pool": jackpot.pool,
+        "pool": jackpot.pool + await get_shards_total(session) + get_pending_contributions(),
         "last_winner_id": jackpot.last_winner_id,
         "last_win_amount": jackpot.last_win_amount,
         "last_win_date": jackpot.last_win_date,
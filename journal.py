@@ -0,0 +1,49 @@
+"""
+Файлы журналов write-behind (джекпот, журнал ставок казино)
+- У каждого процесса свой файл: <имя>.<хост>.<pid>.<расширение> — воркеры не пишут в один журнал
+- Журналы процессов, которых уже нет на этом хосте, подбирает следующий запуск
+- Старый общий журнал (<имя>.<расширение>, до разделения по процессам) подбирается так же
+"""
+import os
+import socket
+from pathlib import Path
+
+
+FLUSHING_SUFFIX = ".flushing"  # Журнал пачки, которая сейчас пишется в БД
+
+
+def process_journal_path(base: Path) -> Path:
+    """Журнал текущего процесса для базового пути base"""
+    return base.with_name(f"{base.stem}.{socket.gethostname()}.{os.getpid()}{base.suffix}")
+
+
+def flushing_path(path: Path) -> Path:
+    return path.with_suffix(FLUSHING_SUFFIX)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Процесс есть, но чужой
+    return True
+
+
+def orphaned_journals(base: Path) -> list[Path]:
+    """
+    Журналы завершившихся процессов этого хоста (и старый общий журнал).
+    Журналы текущего процесса не входят — их читает он сам.
+    """
+    orphans = [path for path in (base, flushing_path(base)) if path.exists()]
+
+    prefix = f"{base.stem}.{socket.gethostname()}."
+    for path in base.parent.glob(f"{prefix}*"):
+        if path.suffix not in (base.suffix, FLUSHING_SUFFIX):
+            continue
+        pid = path.name[len(prefix):-len(path.suffix)]
+        if not pid.isdigit() or int(pid) == os.getpid() or _pid_alive(int(pid)):
+            continue
+        orphans.append(path)
+    return orphans
@@ -1,92 +1,181 @@
 """
 Лидерборд — топ игроков
 """
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
 
 from sqlalchemy import desc, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .models import FoxGameHistory, FoxPlayer
+from .models import FoxDailyWins, FoxGameHistory, FoxPlayer
+from .ranking import (
+    BOARD_COINS, BOARD_GAMES, BOARD_STREAK, BOARD_WINS_WEEK,
+    SortedSet, get_loaded_board, set_board,
+)
 
 
-async def get_top_winners_week(session: AsyncSession, limit: int = 10) -> list[dict]:
-    """Топ по выигрышам за последнюю неделю"""
-    week_ago = datetime.utcnow() - timedelta(days=7)
+# Доски в памяти перечитываются из БД раз в этот интервал (секунд) —
+# так подтягиваются изменения из других процессов и откаченные транзакции
+BOARD_RELOAD_INTERVAL = 600
+
+_boards_loaded_at: dict[str, float] = {}
+_wins_week_day = None  # День, на который загружена доска недели
+
+
+async def get_top_winners(session: AsyncSession, days: int, limit: int = 10) -> list[dict]:
+    """
+    Топ по выигрышам за последние days дней.
+    Считается по дневному роллапу fox_daily_wins, а не по всей истории игр.
+    """
+    since = (datetime.utcnow() - timedelta(days=days)).date()
     
     result = await session.execute(
         select(
-            FoxGameHistory.tg_id,
-            func.count(FoxGameHistory.id).label("wins_count")
-        )
-        .where(
-            FoxGameHistory.created_at >= week_ago,
-            FoxGameHistory.prize_type.isnot(None),
-            FoxGameHistory.prize_type.notin_(["empty", "nothing", "lose"])
+            FoxDailyWins.tg_id,
+            func.sum(FoxDailyWins.wins).label("wins_count")
         )
-        .group_by(FoxGameHistory.tg_id)
+        .where(FoxDailyWins.day >= since)
+        .group_by(FoxDailyWins.tg_id)
         .order_by(desc("wins_count"))
         .limit(limit)
     )
     
-    return [{"tg_id": row.tg_id, "wins": row.wins_count} for row in result.fetchall()]
+    return [{"tg_id": row.tg_id, "wins": int(row.wins_count)} for row in result.fetchall()]
+
+
+async def get_top_winners_week(session: AsyncSession, limit: int = 10) -> list[dict]:
+    """Топ по выигрышам за последнюю неделю (из доски в памяти)"""
+    return await get_top_from_board(session, BOARD_WINS_WEEK, "wins", limit)
 
 
 async def get_top_winners_month(session: AsyncSession, limit: int = 10) -> list[dict]:
     """Топ по выигрышам за последний месяц"""
-    month_ago = datetime.utcnow() - timedelta(days=30)
+    return await get_top_winners(session, days=30, limit=limit)
+
+
+async def backfill_daily_wins(
+    session: AsyncSession,
+    days: int | None = None,
+    start: date | None = None,
+    end: date | None = None,
+) -> int:
+    """
+    Пересчитать fox_daily_wins из fox_game_history.
+    days=None — вся история, иначе только последние days дней.
+    start/end — только дни из [start, end) (месяц партиции перед удалением).
+    Повторный запуск безопасен: дневные значения перезаписываются.
+    Возвращает количество записанных дней-игроков.
+    """
+    from sqlalchemy.dialects.postgresql import insert
     
-    result = await session.execute(
+    day = func.date(FoxGameHistory.created_at)
+    query = (
         select(
             FoxGameHistory.tg_id,
-            func.count(FoxGameHistory.id).label("wins_count")
+            day.label("day"),
+            func.count(FoxGameHistory.id).label("wins"),
         )
         .where(
-            FoxGameHistory.created_at >= month_ago,
             FoxGameHistory.prize_type.isnot(None),
             FoxGameHistory.prize_type.notin_(["empty", "nothing", "lose"])
         )
-        .group_by(FoxGameHistory.tg_id)
-        .order_by(desc("wins_count"))
-        .limit(limit)
+        .group_by(FoxGameHistory.tg_id, day)
     )
+    if days is not None:
+        since = (datetime.utcnow() - timedelta(days=days)).date()
+        query = query.where(FoxGameHistory.created_at >= since)
+    if start is not None:
+        query = query.where(FoxGameHistory.created_at >= start)
+    if end is not None:
+        query = query.where(FoxGameHistory.created_at < end)
     
-    return [{"tg_id": row.tg_id, "wins": row.wins_count} for row in result.fetchall()]
+    stmt = insert(FoxDailyWins).from_select(["tg_id", "day", "wins"], query)
+    result = await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[FoxDailyWins.tg_id, FoxDailyWins.day],
+            set_={"wins": stmt.excluded.wins},
+        )
+    )
+    await session.commit()
+    return result.rowcount
 
 
-async def get_top_streak(session: AsyncSession, limit: int = 10) -> list[dict]:
-    """Топ по серии входов"""
-    result = await session.execute(
-        select(FoxPlayer.tg_id, FoxPlayer.login_streak)
-        .where(FoxPlayer.login_streak > 0)
-        .order_by(desc(FoxPlayer.login_streak))
-        .limit(limit)
+async def _load_board(session: AsyncSession, name: str) -> SortedSet:
+    """Загрузить доску из БД"""
+    if name == BOARD_WINS_WEEK:
+        since = (datetime.utcnow() - timedelta(days=7)).date()
+        query = (
+            select(FoxDailyWins.tg_id, func.sum(FoxDailyWins.wins))
+            .where(FoxDailyWins.day >= since)
+            .group_by(FoxDailyWins.tg_id)
+        )
+    else:
+        column = {
+            BOARD_COINS: FoxPlayer.coins,
+            BOARD_STREAK: FoxPlayer.login_streak,
+            BOARD_GAMES: FoxPlayer.total_games,
+        }[name]
+        query = select(FoxPlayer.tg_id, column).where(column > 0)
+    
+    board = SortedSet()
+    result = await session.stream(query.execution_options(yield_per=10000))
+    async for tg_id, score in result:
+        if score:
+            board.add(tg_id, int(score))
+    return board
+
+
+async def get_board(session: AsyncSession, name: str) -> SortedSet:
+    """Доска рейтинга в памяти (загружается из БД при первом запросе и по интервалу)"""
+    global _wins_week_day
+    
+    board = get_loaded_board(name)
+    today = datetime.utcnow().date()
+    stale = (
+        board is None
+        or time.monotonic() - _boards_loaded_at.get(name, 0) > BOARD_RELOAD_INTERVAL
+        # Окно недели сдвигается раз в день — старые дни надо вычесть
+        or (name == BOARD_WINS_WEEK and _wins_week_day != today)
     )
     
-    return [{"tg_id": row.tg_id, "streak": row.login_streak} for row in result.fetchall()]
+    if stale:
+        board = await _load_board(session, name)
+        set_board(name, board)
+        _boards_loaded_at[name] = time.monotonic()
+        if name == BOARD_WINS_WEEK:
+            _wins_week_day = today
+    
+    return board
+
+
+async def get_top_from_board(session: AsyncSession, name: str, value_key: str, limit: int = 10) -> list[dict]:
+    """Топ игроков из доски в памяти"""
+    board = await get_board(session, name)
+    return [{"tg_id": tg_id, value_key: score} for tg_id, score in board.top(limit)]
+
+
+async def get_player_rank(session: AsyncSession, name: str, tg_id: int) -> tuple[int, int] | None:
+    """Место игрока в доске и его очки: (место, очки) или None если вне рейтинга"""
+    board = await get_board(session, name)
+    rank = board.rank(tg_id)
+    if rank is None:
+        return None
+    return rank, board.score(tg_id)
+
+
+async def get_top_streak(session: AsyncSession, limit: int = 10) -> list[dict]:
+    """Топ по серии входов"""
+    return await get_top_from_board(session, BOARD_STREAK, "streak", limit)
 
 
 async def get_top_coins(session: AsyncSession, limit: int = 10) -> list[dict]:
     """Топ по количеству Лискоинов"""
-    result = await session.execute(
-        select(FoxPlayer.tg_id, FoxPlayer.coins)
-        .where(FoxPlayer.coins > 0)
-        .order_by(desc(FoxPlayer.coins))
-        .limit(limit)
-    )
-    
-    return [{"tg_id": row.tg_id, "coins": row.coins} for row in result.fetchall()]
+    return await get_top_from_board(session, BOARD_COINS, "coins", limit)
 
 
 async def get_top_games(session: AsyncSession, limit: int = 10) -> list[dict]:
     """Топ по количеству сыгранных игр"""
-    result = await session.execute(
-        select(FoxPlayer.tg_id, FoxPlayer.total_games)
-        .where(FoxPlayer.total_games > 0)
-        .order_by(desc(FoxPlayer.total_games))
-        .limit(limit)
-    )
-    
-    return [{"tg_id": row.tg_id, "games": row.total_games} for row in result.fetchall()]
+    return await get_top_from_board(session, BOARD_GAMES, "games", limit)
 
 
 def format_leaderboard(
@@ -117,3 +206,11 @@ def format_leaderboard(
         lines.append(f"{medal} {user_display}: <b>{value}</b> {value_emoji}")
     
     return "\n".join(lines)
+
+
+def format_player_rank(rank: tuple[int, int] | None, value_emoji: str) -> str:
+    """Строка с местом игрока под лидербордом"""
+    if rank is None:
+        return "\n\n👤 <i>Ты пока вне рейтинга</i>"
+    place, value = rank
+    return f"\n\n👤 Твоё место: <b>#{place}</b> ({value} {value_emoji})"
@@ -0,0 +1,129 @@
+"""
+Блокировки по игроку
+- Двойной тап («Ещё раз», ставка в казино) запускает два обработчика одного игрока параллельно:
+  они гоняются за состоянием раздачи и читают баланс до списания соседа
+- PlayerLocks — реестр asyncio.Lock по tg_id; замок живёт, пока его держат или ждут (weakref)
+- Замок занят — второй тап сразу получает «подожди», в очередь не встаёт
+- PLAYER_LOCK_BACKEND = "db" — поверх локального замка pg_try_advisory_xact_lock
+  на отдельном соединении (несколько воркеров бота)
+- PlayerLockMiddleware — оборачивает обработчики с флагом PLAYER_LOCK
+"""
+import asyncio
+import hashlib
+import weakref
+from contextlib import asynccontextmanager
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from sqlalchemy import func, select
+
+from logger import logger
+
+
+# "memory" — один процесс; "db" — несколько воркеров (advisory-lock в Postgres, держит соединение из пула)
+PLAYER_LOCK_BACKEND = "memory"
+
+PLAYER_BUSY_TEXT = "⏳ Подожди, предыдущее действие ещё выполняется"
+
+# Флаг обработчика: @router.callback_query(..., flags=PLAYER_LOCK)
+PLAYER_LOCK = {"player_lock": True}
+
+
+class PlayerBusy(Exception):
+    """Игрок уже выполняет действие"""
+
+
+def advisory_key(tg_id: int) -> int:
+    """Ключ advisory-lock игрока (bigint, не пересекается с числовыми ключами других модулей на практике)"""
+    digest = hashlib.blake2b(f"fox_player:{tg_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+@asynccontextmanager
+async def _advisory_lock(tg_id: int, wait: bool):
+    """
+    Advisory-lock на время блока: транзакция на отдельном соединении,
+    чтобы commit() в обработчике не снимал блокировку.
+    """
+    from database.db import engine
+
+    async with engine.connect() as conn:
+        async with conn.begin():
+            if wait:
+                await conn.execute(select(func.pg_advisory_xact_lock(advisory_key(tg_id))))
+            elif not await conn.scalar(select(func.pg_try_advisory_xact_lock(advisory_key(tg_id)))):
+                raise PlayerBusy(tg_id)
+            yield
+
+
+class PlayerLocks:
+    """Реестр замков по tg_id"""
+
+    def __init__(self):
+        self._locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+        self.acquired = 0
+        self.rejected = 0
+
+    def _get(self, tg_id: int) -> asyncio.Lock:
+        lock = self._locks.get(tg_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[tg_id] = lock
+        return lock
+
+    def locked(self, tg_id: int) -> bool:
+        lock = self._locks.get(tg_id)
+        return lock is not None and lock.locked()
+
+    @asynccontextmanager
+    async def hold(self, tg_id: int, wait: bool = False):
+        """
+        Выполнить блок под замком игрока.
+        wait=False — если замок занят (здесь или в другом воркере), сразу PlayerBusy.
+        """
+        lock = self._get(tg_id)  # Сильная ссылка на время блока — замок не соберётся
+        if lock.locked() and not wait:
+            self.rejected += 1
+            raise PlayerBusy(tg_id)
+
+        async with lock:
+            if PLAYER_LOCK_BACKEND == "db":
+                try:
+                    async with _advisory_lock(tg_id, wait):
+                        self.acquired += 1
+                        yield
+                except PlayerBusy:
+                    self.rejected += 1
+                    raise
+            else:
+                self.acquired += 1
+                yield
+
+    def stats(self) -> dict:
+        """Метрики: замков сейчас, взято, отклонено"""
+        return {"active": len(self._locks), "acquired": self.acquired, "rejected": self.rejected}
+
+
+player_locks = PlayerLocks()
+
+
+class PlayerLockMiddleware(BaseMiddleware):
+    """
+    Сериализует обработчики одного игрока с флагом PLAYER_LOCK.
+    Повторный тап, пока идёт прошлый, отвечает PLAYER_BUSY_TEXT и не вызывает обработчик.
+    """
+
+    async def __call__(self, handler, event, data):
+        user = getattr(event, "from_user", None)
+        if user is None or not get_flag(data, "player_lock"):
+            return await handler(event, data)
+
+        try:
+            async with player_locks.hold(user.id):
+                return await handler(event, data)
+        except PlayerBusy:
+            logger.debug(f"[Gamification] Повторный тап игрока {user.id} отклонён")
+            try:
+                await event.answer(PLAYER_BUSY_TEXT)
+            except Exception as e:
+                logger.debug(f"[Gamification] Не удалось ответить на повторный тап: {e}")
@@ -0,0 +1,34 @@
+"""
+Скрипт перевода истории на помесячные партиции (fox_game_history, fox_casino_games).
+Запустить: python -m modules.gamification.migrate_partitions
+
+Нужен один раз для баз, созданных до партиций. Каждая таблица переводится
+в своей транзакции: старая таблица переименовывается, строки переливаются в партиции.
+Таблица заблокирована на всё время переливки — запускать с остановленным ботом
+или в окно обслуживания. Повторный запуск безопасен: переведённые таблицы пропускаются.
+"""
+import asyncio
+import sys
+import os
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from database.db import engine
+from modules.gamification.init_db import PARTITIONED_TABLES, init_gamification_db
+from modules.gamification.partitions import convert_to_partitioned
+
+
+async def main():
+    """Перевести таблицы, затем создать недостающее (партиции, индексы)"""
+    for table in PARTITIONED_TABLES:
+        async with engine.begin() as conn:
+            converted = await conn.run_sync(convert_to_partitioned, table)
+        print(f"{'✅' if converted else '⏭'} {table.name}: {'переведена' if converted else 'уже партиционирована'}")
+    await init_gamification_db()
+
+
+if __name__ == "__main__":
+    print("🦊 Перевод истории на помесячные партиции...")
+    asyncio.run(main())
+    print("✅ Готово!")
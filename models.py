@@ -3,7 +3,7 @@
 """
 from datetime import datetime, timedelta
 
-from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import BigInteger, Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 
 from database.models import Base
@@ -12,6 +12,18 @@ from database.models import Base
 class FoxPlayer(Base):
     """Игровой профиль пользователя в Логове Лисы"""
     __tablename__ = "fox_players"
+    __table_args__ = (
+        # Уведомления неактивным: last_login_date < cutoff
+        Index(
+            "ix_fox_players_last_login_date", "last_login_date",
+            postgresql_where=text("last_login_date IS NOT NULL"),
+        ),
+        # Пуш «попытка восстановилась»: у кого last_free_spin_date попал в окно
+        Index(
+            "ix_fox_players_free_spin_ready", "last_free_spin_date",
+            postgresql_where=text("free_spins = 0"),
+        ),
+    )
 
     tg_id = Column(BigInteger, ForeignKey("users.tg_id", ondelete="CASCADE"), primary_key=True)
     
@@ -56,6 +68,13 @@ class FoxPlayer(Base):
 class FoxPrize(Base):
     """Призы пользователя"""
     __tablename__ = "fox_prizes"
+    __table_args__ = (
+        # get_active_prizes: только неиспользованные, по сроку
+        Index(
+            "ix_fox_prizes_active", "tg_id", "expires_at",
+            postgresql_where=text("is_used = false"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     tg_id = Column(BigInteger, ForeignKey("fox_players.tg_id", ondelete="CASCADE"), nullable=False, index=True)
@@ -90,6 +109,12 @@ class FoxPrize(Base):
 class FoxGameHistory(Base):
     """История игр"""
     __tablename__ = "fox_game_history"
+    __table_args__ = (
+        # Окна по времени (лидерборды, пересчёт роллапа, чистка истории)
+        Index("ix_fox_game_history_created_at", "created_at"),
+        # Помесячные партиции (partitions.py): ключ партиционирования входит в первичный ключ
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     tg_id = Column(BigInteger, ForeignKey("fox_players.tg_id", ondelete="CASCADE"), nullable=False, index=True)
@@ -105,15 +130,37 @@ class FoxGameHistory(Base):
     # Был ли использован буст
     boost_used = Column(Boolean, default=False, nullable=False)
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
 
     # Связи
     player = relationship("FoxPlayer", back_populates="games")
 
 
+class FoxDailyWins(Base):
+    """
+    Выигрыши игрока за день (роллап fox_game_history для лидербордов).
+    Обновляется в add_game_history, топ за неделю/месяц — сумма по ≤30 дням.
+    """
+    __tablename__ = "fox_daily_wins"
+    __table_args__ = (
+        Index("ix_fox_daily_wins_day_tg_id", "day", "tg_id"),
+    )
+
+    tg_id = Column(BigInteger, ForeignKey("fox_players.tg_id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # День (UTC)
+    wins = Column(Integer, default=0, nullable=False)  # Выигрышей за день
+
+
 class FoxBoost(Base):
     """Активные бусты пользователя"""
     __tablename__ = "fox_boosts"
+    __table_args__ = (
+        # get_active_boosts: только с оставшимися использованиями
+        Index(
+            "ix_fox_boosts_active", "tg_id", "expires_at",
+            postgresql_where=text("uses_left > 0"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     tg_id = Column(BigInteger, ForeignKey("fox_players.tg_id", ondelete="CASCADE"), nullable=False, index=True)
@@ -131,6 +178,10 @@ class FoxBoost(Base):
 class FoxDeal(Base):
     """История сделок с лисой"""
     __tablename__ = "fox_deals"
+    __table_args__ = (
+        # get_last_deal / get_deal_stats: последние сделки игрока
+        Index("ix_fox_deals_tg_id_created_at", "tg_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     tg_id = Column(BigInteger, ForeignKey("fox_players.tg_id", ondelete="CASCADE"), nullable=False, index=True)
@@ -178,10 +229,20 @@ class FoxCasinoSession(Base):
 
 
 class FoxCasinoGame(Base):
-    """История игр в Лисьем казино (реальные ставки!)"""
+    """
+    История игр в Лисьем казино (реальные ставки!).
+    Append-only журнал ставок: пишется пачками из casino_ledger.py, строки не меняются.
+    """
     __tablename__ = "fox_casino_games"
+    __table_args__ = (
+        # Ключ события журнала: повтор пачки не дублирует (created_at — ключ партиций, в событии он свой)
+        UniqueConstraint("event_id", "created_at", name="uq_fox_casino_games_event_id"),
+        # Помесячные партиции (partitions.py)
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    event_id = Column(String(32), nullable=True)
     tg_id = Column(BigInteger, ForeignKey("users.tg_id", ondelete="CASCADE"), nullable=False, index=True)
     
     # Ставка в рублях
@@ -191,6 +252,7 @@ class FoxCasinoGame(Base):
     won = Column(Boolean, nullable=False)
     multiplier = Column(Float, nullable=False)  # 0, 2, 3
     payout = Column(Float, nullable=False)  # Выплата
+    balance_after = Column(Float, nullable=True)  # Баланс после расчёта ставки
     
     # Двухфазная игра
     phase = Column(Integer, default=1)  # 1 = первый бросок, 2 = рискнул
@@ -203,7 +265,7 @@ class FoxCasinoGame(Base):
     # ID сессии
     session_id = Column(Integer, ForeignKey("fox_casino_sessions.id"), nullable=True)
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     
     # Связь с сессией
     session = relationship("FoxCasinoSession", backref="games")
@@ -265,6 +327,10 @@ class FoxCasinoProfile(Base):
 class FoxQuest(Base):
     """Ежедневные задания"""
     __tablename__ = "fox_quests"
+    __table_args__ = (
+        # Один квест каждого типа в день; он же индекс для квестов на сегодня
+        Index("uq_fox_quests_tg_id_day_type", "tg_id", "day", "quest_type", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     tg_id = Column(BigInteger, ForeignKey("fox_players.tg_id", ondelete="CASCADE"), nullable=False, index=True)
@@ -283,4 +349,43 @@ class FoxQuest(Base):
     is_claimed = Column(Boolean, default=False, nullable=False)  # Забрана ли награда
     claimed_at = Column(DateTime, nullable=True)
     
+    day = Column(Date, default=lambda: datetime.utcnow().date(), nullable=False)  # День квеста (UTC)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class FoxNotifyCampaign(Base):
+    """Кампания рассылки: курсор и аренда, чтобы прогон можно было продолжить и не запустить дважды"""
+    __tablename__ = "fox_notify_campaigns"
+
+    campaign_id = Column(String(64), primary_key=True)  # "<сегмент>:<день>"
+    segment = Column(String(32), nullable=False)
+    
+    status = Column(String(16), default="running", nullable=False)  # "running" | "done"
+    cursor = Column(BigInteger, default=0, nullable=False)  # Последний обработанный tg_id
+    sent = Column(Integer, default=0, nullable=False)  # Доставлено (бонус выдан)
+    
+    locked_until = Column(DateTime, nullable=True)  # Аренда: до этого момента кампанию ведёт другой прогон
     created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class FoxNotifyDelivery(Base):
+    """Доставка кампании игроку: одна строка на (кампания, игрок)"""
+    __tablename__ = "fox_notify_deliveries"
+    __table_args__ = (
+        # Повторная отправка неудавшихся: status = 'failed' по кампании
+        Index(
+            "ix_fox_notify_deliveries_failed", "campaign_id", "tg_id",
+            postgresql_where=text("status = 'failed'"),
+        ),
+    )
+
+    campaign_id = Column(
+        String(64), ForeignKey("fox_notify_campaigns.campaign_id", ondelete="CASCADE"), primary_key=True,
+    )
+    # index — для проверки «уже напоминали» по игроку (get_inactive_players)
+    tg_id = Column(BigInteger, ForeignKey("fox_players.tg_id", ondelete="CASCADE"), primary_key=True, index=True)
+    
+    status = Column(String(16), default="pending", nullable=False)  # "pending" | "sent" | "failed" | "blocked"
+    attempt = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
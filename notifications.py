@@ -3,19 +3,51 @@
 - Ежедневная попытка восстановилась
 - Напоминание неактивным
 - Бонус за возвращение
+
+Рассылка идёт по всем подходящим игрокам:
+- страницы по tg_id (keyset: WHERE tg_id > последний), без OFFSET и без потолка
+- внутри страницы — параллельно (не больше NOTIFY_CONCURRENCY), в общем лимите Telegram
+  (telegram_bucket из animation.py), при flood-wait — пауза и повтор
+- бонус доставленным — одним UPDATE на страницу
+- прогресс отдаётся колбэком (админская команда /fox_notify)
+- пуш «попытка восстановилась» — планировщиком по окнам времени (SPIN_RESTORED_SCHEDULER)
+
+Каждый сегмент — кампания на день (fox_notify_campaigns) с журналом доставок
+(fox_notify_deliveries): повторный запуск продолжает с курсора, бонус выдаётся
+ровно один раз на доставку, так что рассылку можно ставить на таймер.
 """
-from datetime import datetime, timedelta
-from typing import TYPE_CHECKING
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Awaitable, Callable
 
-from sqlalchemy import select
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from sqlalchemy import BigInteger, any_, bindparam, exists, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .models import FoxPlayer
+from logger import logger
+
+from .models import FoxNotifyCampaign, FoxNotifyDelivery, FoxPlayer
 
 if TYPE_CHECKING:
     from aiogram import Bot
 
 
+NOTIFY_PAGE_SIZE = 500  # Игроков на страницу
+NOTIFY_CONCURRENCY = 20  # Одновременных отправок
+NOTIFY_RETRIES = 3  # Повторов после flood-wait
+NOTIFY_PROGRESS_INTERVAL = 5.0  # Секунд между отчётами о прогрессе
+NOTIFY_MAX_ATTEMPTS = 3  # Попыток доставки одному игроку в кампании (между прогонами)
+NOTIFY_LEASE = 300  # Секунд аренды кампании: столько другой прогон ждёт, если этот упал
+
+# Пуш «попытка восстановилась» по расписанию (выключен по умолчанию)
+SPIN_RESTORED_SCHEDULER = False
+SPIN_RESTORED_INTERVAL = 900  # Секунд: окно восстановлений на один прогон планировщика
+SPIN_RESTORED_MAX_CATCHUP = 96  # Окон, которые планировщик догоняет после простоя (старше — пропускаются)
+
+
 # Тексты уведомлений
 NOTIFY_DAILY_SPIN = """🦊 <b>Твоя ежедневная попытка восстановилась!</b>
 
@@ -45,16 +77,36 @@ async def get_inactive_players(
     session: AsyncSession, 
     days: int = 3,
     limit: int = 100,
+    max_days: int | None = None,
+    after_tg_id: int = 0,
+    not_notified: str | None = None,
 ) -> list[FoxPlayer]:
-    """Получить игроков, которые не заходили N дней"""
-    cutoff = datetime.utcnow() - timedelta(days=days)
+    """
+    Получить игроков, которые не заходили N дней (но меньше max_days, если задано).
+    Страница по tg_id: следующая начинается после after_tg_id.
+    not_notified — сегмент: пропустить тех, кому он уже доставлен после их последнего входа
+    (одно напоминание на период неактивности, сколько бы раз ни шла рассылка).
+    """
+    now = datetime.utcnow()
+    conditions = [
+        FoxPlayer.last_login_date < now - timedelta(days=days),
+        FoxPlayer.last_login_date.isnot(None),
+        FoxPlayer.tg_id > after_tg_id,
+    ]
+    if max_days is not None:
+        conditions.append(FoxPlayer.last_login_date >= now - timedelta(days=max_days))
+    if not_notified is not None:
+        conditions.append(~exists().where(
+            FoxNotifyDelivery.tg_id == FoxPlayer.tg_id,
+            FoxNotifyDelivery.campaign_id.startswith(f"{not_notified}:"),
+            FoxNotifyDelivery.status == "sent",
+            FoxNotifyDelivery.updated_at > FoxPlayer.last_login_date,
+        ))
     
     result = await session.execute(
         select(FoxPlayer)
-        .where(
-            FoxPlayer.last_login_date < cutoff,
-            FoxPlayer.last_login_date.isnot(None),
-        )
+        .where(*conditions)
+        .order_by(FoxPlayer.tg_id)
         .limit(limit)
     )
     
@@ -64,6 +116,7 @@ async def get_inactive_players(
 async def get_players_for_daily_notify(
     session: AsyncSession,
     limit: int = 100,
+    after_tg_id: int = 0,
 ) -> list[FoxPlayer]:
     """
     Получить игроков, которым нужно отправить уведомление о восстановлении попытки.
@@ -77,57 +130,481 @@ async def get_players_for_daily_notify(
         .where(
             FoxPlayer.last_login_date >= datetime.combine(yesterday, datetime.min.time()),
             FoxPlayer.last_login_date < datetime.combine(today, datetime.min.time()),
+            FoxPlayer.tg_id > after_tg_id,
+        )
+        .order_by(FoxPlayer.tg_id)
+        .limit(limit)
+    )
+    
+    return list(result.scalars().all())
+
+
+async def get_players_spin_restored(
+    session: AsyncSession,
+    ready_from: datetime,
+    ready_to: datetime,
+    limit: int = 100,
+    after_tg_id: int = 0,
+) -> list[FoxPlayer]:
+    """
+    Игроки, у которых бесплатная попытка восстановилась в [ready_from, ready_to)
+    и ещё не потрачена. Диапазон по last_free_spin_date — по индексу ix_fox_players_free_spin_ready.
+    """
+    from .db import FREE_SPIN_COOLDOWN
+    
+    result = await session.execute(
+        select(FoxPlayer)
+        .where(
+            FoxPlayer.free_spins == 0,
+            FoxPlayer.last_free_spin_date >= ready_from - FREE_SPIN_COOLDOWN,
+            FoxPlayer.last_free_spin_date < ready_to - FREE_SPIN_COOLDOWN,
+            FoxPlayer.tg_id > after_tg_id,
         )
+        .order_by(FoxPlayer.tg_id)
         .limit(limit)
     )
     
     return list(result.scalars().all())
 
 
+# ==================== РАССЫЛКА ====================
+
+@dataclass
+class NotifySegment:
+    """Кому, что отправить и какой бонус дать доставленным"""
+    name: str
+    text: str
+    fetch: Callable[[AsyncSession, int, int], Awaitable[list[FoxPlayer]]]  # (session, after_tg_id, limit)
+    coins: int = 0
+    spins: int = 0
+
+
+@dataclass
+class NotifyProgress:
+    """Прогресс рассылки"""
+    segment: str = ""
+    processed: int = 0
+    sent: dict[str, int] = field(default_factory=dict)  # Сегмент -> доставлено
+    blocked: int = 0  # Бот заблокирован игроком
+    failed: int = 0
+    flood_waits: int = 0
+    skipped: list[str] = field(default_factory=list)  # Кампании, уже завершённые или идущие в другом прогоне
+    started: float = field(default_factory=time.monotonic)
+    finished: bool = False
+
+    @property
+    def total_sent(self) -> int:
+        return sum(self.sent.values())
+
+    @property
+    def rate(self) -> float:
+        """Сообщений в секунду"""
+        elapsed = time.monotonic() - self.started
+        return self.total_sent / elapsed if elapsed > 0 else 0.0
+
+
+SEGMENT_DAILY = NotifySegment(
+    "daily",
+    NOTIFY_DAILY_SPIN,
+    lambda session, after, limit: get_players_for_daily_notify(session, limit, after_tg_id=after),
+)
+# Сегменты неактивных не пересекаются: 3-7 дней и 7+ дней
+SEGMENT_INACTIVE_3D = NotifySegment(
+    "3d",
+    NOTIFY_INACTIVE_3_DAYS.format(days=3),
+    lambda session, after, limit: get_inactive_players(
+        session, 3, limit, max_days=7, after_tg_id=after, not_notified="3d",
+    ),
+    coins=20,
+)
+SEGMENT_INACTIVE_7D = NotifySegment(
+    "7d",
+    NOTIFY_INACTIVE_7_DAYS,
+    lambda session, after, limit: get_inactive_players(session, 7, limit, after_tg_id=after, not_notified="7d"),
+    coins=50,
+    spins=1,
+)
+
+
+async def _deliver(bot: "Bot", tg_id: int, text: str, progress: NotifyProgress | None = None) -> str:
+    """
+    Отправить сообщение в общем лимите Telegram: "sent" | "blocked" | "failed".
+    При flood-wait ждём сколько попросили и повторяем (до NOTIFY_RETRIES раз).
+    """
+    from .animation import telegram_bucket
+    
+    for _ in range(NOTIFY_RETRIES + 1):
+        await telegram_bucket.take()
+        try:
+            await bot.send_message(tg_id, text)
+            return "sent"
+        except TelegramRetryAfter as e:
+            if progress is not None:
+                progress.flood_waits += 1
+            logger.warning(f"[Notify] Flood-wait {e.retry_after}с")
+            await asyncio.sleep(e.retry_after)
+        except TelegramForbiddenError:
+            if progress is not None:
+                progress.blocked += 1
+            return "blocked"
+        except Exception as e:
+            logger.debug(f"[Notify] Не доставлено {tg_id}: {e}")
+            break
+    
+    if progress is not None:
+        progress.failed += 1
+    return "failed"
+
+
 async def send_notification(bot: "Bot", tg_id: int, text: str) -> bool:
     """Отправить уведомление пользователю"""
-    try:
-        await bot.send_message(tg_id, text)
-        return True
-    except Exception:
-        return False
+    return await _deliver(bot, tg_id, text) == "sent"
 
 
-async def send_daily_notifications(bot: "Bot", session: AsyncSession):
-    """Отправить уведомления о восстановлении попытки"""
-    players = await get_players_for_daily_notify(session)
+def campaign_id_for(segment: NotifySegment, day: date | None = None) -> str:
+    """Кампания сегмента на день: повторный запуск в тот же день продолжает её, а не начинает заново"""
+    return f"{segment.name}:{(day or datetime.utcnow().date()).isoformat()}"
+
+
+async def claim_campaign(session: AsyncSession, campaign_id: str, segment: str) -> FoxNotifyCampaign | None:
+    """
+    Взять кампанию в работу (создать, если нет).
+    None — кампания уже завершена или её сейчас ведёт другой прогон (аренда не истекла).
+    """
+    now = datetime.utcnow()
+    await session.execute(
+        insert(FoxNotifyCampaign)
+        .values(campaign_id=campaign_id, segment=segment, status="running", cursor=0, sent=0)
+        .on_conflict_do_nothing(index_elements=[FoxNotifyCampaign.campaign_id])
+    )
+    result = await session.execute(
+        update(FoxNotifyCampaign)
+        .where(
+            FoxNotifyCampaign.campaign_id == campaign_id,
+            FoxNotifyCampaign.status != "done",
+            (FoxNotifyCampaign.locked_until.is_(None)) | (FoxNotifyCampaign.locked_until < now),
+        )
+        .values(locked_until=now + timedelta(seconds=NOTIFY_LEASE))
+        .returning(FoxNotifyCampaign)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    campaign = result.scalar_one_or_none()
+    await session.commit()
+    return campaign
+
+
+async def claim_deliveries(session: AsyncSession, campaign_id: str, tg_ids: list[int]) -> list[int]:
+    """
+    Отметить попытку доставки. Возвращает tg_id, которым нужно отправить:
+    новым и тем, у кого прошлая попытка не удалась (пока попыток меньше NOTIFY_MAX_ATTEMPTS).
+    Уже доставленные и заблокировавшие бота пропускаются.
+    """
+    if not tg_ids:
+        return []
+    stmt = insert(FoxNotifyDelivery).values([
+        {"campaign_id": campaign_id, "tg_id": tg_id, "status": "pending", "attempt": 1}
+        for tg_id in tg_ids
+    ])
+    result = await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[FoxNotifyDelivery.campaign_id, FoxNotifyDelivery.tg_id],
+            set_={
+                "status": "pending",
+                "attempt": FoxNotifyDelivery.attempt + 1,
+                "updated_at": datetime.utcnow(),
+            },
+            where=(
+                FoxNotifyDelivery.status.in_(("pending", "failed"))
+                & (FoxNotifyDelivery.attempt < NOTIFY_MAX_ATTEMPTS)
+            ),
+        )
+        .returning(FoxNotifyDelivery.tg_id)
+    )
+    claimed = sorted(result.scalars().all())
+    await session.commit()
+    return claimed
+
+
+async def record_deliveries(
+    session: AsyncSession,
+    campaign: FoxNotifyCampaign,
+    segment: NotifySegment,
+    results: dict[int, str],
+    cursor: int | None = None,
+) -> int:
+    """
+    Записать итоги страницы одной транзакцией: статусы доставок, бонус, курсор кампании.
+    Бонус получают только строки, которые этим UPDATE впервые стали 'sent', —
+    повторный прогон или повторная отправка бонус второй раз не дадут.
+    Возвращает число новых доставок.
+    """
+    from .db import grant_players_bonus
+    
+    def _ids(status: str) -> list[int]:
+        return [tg_id for tg_id, result in results.items() if result == status]
+    
+    def _in_campaign(tg_ids: list[int]):
+        return (
+            (FoxNotifyDelivery.campaign_id == campaign.campaign_id)
+            & (FoxNotifyDelivery.tg_id == any_(bindparam("tg_ids", tg_ids, type_=ARRAY(BigInteger))))
+        )
+    
+    newly_sent = []
+    if _ids("sent"):
+        result = await session.execute(
+            update(FoxNotifyDelivery)
+            .where(_in_campaign(_ids("sent")), FoxNotifyDelivery.status != "sent")
+            .values(status="sent", updated_at=datetime.utcnow())
+            .returning(FoxNotifyDelivery.tg_id)
+            .execution_options(synchronize_session=False)
+        )
+        newly_sent = list(result.scalars().all())
+        await grant_players_bonus(session, newly_sent, coins=segment.coins, spins=segment.spins, commit=False)
+    
+    for status in ("failed", "blocked"):
+        if _ids(status):
+            await session.execute(
+                update(FoxNotifyDelivery)
+                .where(_in_campaign(_ids(status)), FoxNotifyDelivery.status != "sent")
+                .values(status=status, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+    
+    values = {
+        "sent": FoxNotifyCampaign.sent + len(newly_sent),
+        "locked_until": datetime.utcnow() + timedelta(seconds=NOTIFY_LEASE),
+    }
+    if cursor is not None:
+        values["cursor"] = cursor
+    await session.execute(
+        update(FoxNotifyCampaign)
+        .where(FoxNotifyCampaign.campaign_id == campaign.campaign_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return len(newly_sent)
+
+
+async def _failed_deliveries(session: AsyncSession, campaign_id: str, after_tg_id: int, limit: int) -> list[int]:
+    """Неудавшиеся доставки, у которых ещё есть попытки"""
+    result = await session.execute(
+        select(FoxNotifyDelivery.tg_id)
+        .where(
+            FoxNotifyDelivery.campaign_id == campaign_id,
+            FoxNotifyDelivery.status == "failed",
+            FoxNotifyDelivery.attempt < NOTIFY_MAX_ATTEMPTS,
+            FoxNotifyDelivery.tg_id > after_tg_id,
+        )
+        .order_by(FoxNotifyDelivery.tg_id)
+        .limit(limit)
+    )
+    tg_ids = list(result.scalars().all())
+    await session.commit()
+    return tg_ids
+
+
+async def send_segment(
+    bot: "Bot",
+    session: AsyncSession,
+    segment: NotifySegment,
+    progress: NotifyProgress,
+    on_progress: Callable[[NotifyProgress], Awaitable[None]] | None = None,
+    campaign_id: str | None = None,
+) -> int:
+    """
+    Разослать сегмент как кампанию: постранично от сохранённого курсора,
+    потом — повтор неудавшихся. Возвращает число доставок за этот прогон.
+    Если кампания завершена или уже идёт в другом прогоне — ничего не делает.
+    """
+    campaign_id = campaign_id or campaign_id_for(segment)
+    progress.segment = segment.name
+    progress.sent.setdefault(segment.name, 0)
     
-    sent = 0
-    for player in players:
-        if await send_notification(bot, player.tg_id, NOTIFY_DAILY_SPIN):
-            sent += 1
+    campaign = await claim_campaign(session, campaign_id, segment.name)
+    if campaign is None:
+        logger.info(f"[Notify] Кампания {campaign_id} завершена или уже идёт — пропускаем")
+        progress.skipped.append(campaign_id)
+        return 0
+    
+    semaphore = asyncio.Semaphore(NOTIFY_CONCURRENCY)
+    reported = time.monotonic()
+    
+    async def _send(tg_id: int) -> str:
+        async with semaphore:
+            return await _deliver(bot, tg_id, segment.text, progress)
+    
+    async def _send_page(tg_ids: list[int], cursor: int | None) -> None:
+        nonlocal reported
+        claimed = await claim_deliveries(session, campaign_id, tg_ids)
+        statuses = await asyncio.gather(*(_send(tg_id) for tg_id in claimed))
+        sent = await record_deliveries(session, campaign, segment, dict(zip(claimed, statuses)), cursor)
+        
+        progress.processed += len(tg_ids)
+        progress.sent[segment.name] += sent
+        if on_progress is not None and time.monotonic() - reported >= NOTIFY_PROGRESS_INTERVAL:
+            reported = time.monotonic()
+            try:
+                await on_progress(progress)
+            except Exception as e:
+                logger.debug(f"[Notify] Прогресс не показан: {e}")
+    
+    # Основной проход — с курсора кампании
+    after_tg_id = campaign.cursor
+    while True:
+        players = await segment.fetch(session, after_tg_id, NOTIFY_PAGE_SIZE)
+        if not players:
+            break
+        tg_ids = [player.tg_id for player in players]
+        after_tg_id = tg_ids[-1]
+        # Страница прочитана — транзакция не висит, пока идёт отправка
+        await session.commit()
+        
+        await _send_page(tg_ids, after_tg_id)
+        if len(players) < NOTIFY_PAGE_SIZE:
+            break
+    
+    # Повтор неудавшихся (у каждой строки попыток не больше NOTIFY_MAX_ATTEMPTS)
+    after_tg_id = 0
+    while tg_ids := await _failed_deliveries(session, campaign_id, after_tg_id, NOTIFY_PAGE_SIZE):
+        after_tg_id = tg_ids[-1]
+        await _send_page(tg_ids, None)
+    
+    await session.execute(
+        update(FoxNotifyCampaign)
+        .where(FoxNotifyCampaign.campaign_id == campaign_id)
+        .values(status="done", locked_until=None, finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
     
-    return sent
+    logger.info(f"[Notify] Кампания {campaign_id}: доставлено {progress.sent[segment.name]}")
+    return progress.sent[segment.name]
 
 
-async def send_inactive_notifications(bot: "Bot", session: AsyncSession):
+async def send_segments(
+    bot: "Bot",
+    session: AsyncSession,
+    segments: list[NotifySegment],
+    on_progress: Callable[[NotifyProgress], Awaitable[None]] | None = None,
+) -> NotifyProgress:
+    """Разослать сегменты по очереди; в конце — финальный отчёт в on_progress"""
+    progress = NotifyProgress()
+    for segment in segments:
+        await send_segment(bot, session, segment, progress, on_progress)
+    progress.finished = True
+    if on_progress is not None:
+        await on_progress(progress)
+    return progress
+
+
+async def send_daily_notifications(bot: "Bot", session: AsyncSession, on_progress=None):
+    """Отправить уведомления о восстановлении попытки"""
+    progress = await send_segments(bot, session, [SEGMENT_DAILY], on_progress)
+    return progress.sent["daily"]
+
+
+async def send_inactive_notifications(bot: "Bot", session: AsyncSession, on_progress=None):
     """Отправить уведомления неактивным игрокам"""
-    from .db import update_player_coins, add_paid_spin
-    
-    # 3 дня неактивности
-    players_3d = await get_inactive_players(session, days=3, limit=50)
-    sent_3d = 0
-    for player in players_3d:
-        text = NOTIFY_INACTIVE_3_DAYS.format(days=3)
-        if await send_notification(bot, player.tg_id, text):
-            # Даём бонус
-            await update_player_coins(session, player.tg_id, 20)
-            sent_3d += 1
-    
-    # 7 дней неактивности
-    players_7d = await get_inactive_players(session, days=7, limit=50)
-    sent_7d = 0
-    for player in players_7d:
-        text = NOTIFY_INACTIVE_7_DAYS
-        if await send_notification(bot, player.tg_id, text):
-            # Даём бонус
-            await update_player_coins(session, player.tg_id, 50)
-            await add_paid_spin(session, player.tg_id, 1)
-            sent_7d += 1
-    
-    return {"3d": sent_3d, "7d": sent_7d}
+    progress = await send_segments(bot, session, [SEGMENT_INACTIVE_3D, SEGMENT_INACTIVE_7D], on_progress)
+    return {"3d": progress.sent["3d"], "7d": progress.sent["7d"]}
+
+
+# ==================== ПЛАНИРОВЩИК ====================
+
+_spin_restored_task: asyncio.Task | None = None
+_EPOCH = datetime(1970, 1, 1)
+
+
+def spin_restored_segment(window_end: datetime) -> NotifySegment:
+    """Сегмент: попытка восстановилась за SPIN_RESTORED_INTERVAL до window_end"""
+    window_start = window_end - timedelta(seconds=SPIN_RESTORED_INTERVAL)
+    return NotifySegment(
+        "spin",
+        NOTIFY_DAILY_SPIN,
+        lambda session, after, limit: get_players_spin_restored(
+            session, window_start, window_end, limit, after_tg_id=after,
+        ),
+    )
+
+
+async def send_spin_restored(bot: "Bot", window_end: datetime) -> int:
+    """Разослать пуш за одно окно (кампания на окно — повторный прогон ничего не дублирует)"""
+    from database.db import async_session_maker
+    
+    async with async_session_maker() as session:
+        return await send_segment(
+            bot,
+            session,
+            spin_restored_segment(window_end),
+            NotifyProgress(),
+            campaign_id=f"spin:{window_end:%Y-%m-%dT%H:%M}",
+        )
+
+
+def _spin_window_end(moment: datetime) -> datetime:
+    """Конец последнего закрытого окна на момент moment (окна выровнены от начала эпохи, UTC)"""
+    elapsed = int((moment - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=elapsed // SPIN_RESTORED_INTERVAL * SPIN_RESTORED_INTERVAL)
+
+
+async def get_last_spin_window() -> datetime | None:
+    """Конец последнего окна, разосланного до конца (по кампаниям "spin:...")"""
+    from database.db import async_session_maker
+    
+    async with async_session_maker() as session:
+        campaign_id = await session.scalar(
+            select(FoxNotifyCampaign.campaign_id)
+            .where(FoxNotifyCampaign.campaign_id.like("spin:%"), FoxNotifyCampaign.status == "done")
+            .order_by(FoxNotifyCampaign.campaign_id.desc())
+            .limit(1)
+        )
+    if campaign_id is None:
+        return None
+    return datetime.strptime(campaign_id.removeprefix("spin:"), "%Y-%m-%dT%H:%M")
+
+
+async def _spin_restored_loop(bot: "Bot"):
+    """
+    Раз в SPIN_RESTORED_INTERVAL — пуш тем, у кого попытка восстановилась за прошедшее окно.
+    Окна, пропущенные за время простоя, догоняются по порядку (не больше SPIN_RESTORED_MAX_CATCHUP).
+    """
+    interval = timedelta(seconds=SPIN_RESTORED_INTERVAL)
+    last_done: datetime | None = None
+    while True:
+        window_end = _spin_window_end(datetime.utcnow())
+        try:
+            if last_done is None:
+                last_done = await get_last_spin_window() or window_end - interval
+            
+            oldest = window_end - interval * (SPIN_RESTORED_MAX_CATCHUP - 1)
+            if last_done + interval < oldest:
+                logger.warning(f"[Notify] Пуш о попытке: пропущены окна до {oldest:%Y-%m-%d %H:%M}")
+                last_done = oldest - interval
+            
+            # Окно считается пройденным только после успешной рассылки — при ошибке повторим его
+            while last_done < window_end:
+                await send_spin_restored(bot, last_done + interval)
+                last_done += interval
+        except Exception as e:
+            logger.warning(f"[Notify] Ошибка пуша о попытке: {e}")
+        
+        next_run = window_end + interval
+        await asyncio.sleep(max(1.0, (next_run - datetime.utcnow()).total_seconds()))
+
+
+def start_spin_restored_scheduler(bot: "Bot"):
+    """Запустить планировщик пуша (если включён SPIN_RESTORED_SCHEDULER)"""
+    global _spin_restored_task
+    if not SPIN_RESTORED_SCHEDULER:
+        return
+    if _spin_restored_task is None or _spin_restored_task.done():
+        _spin_restored_task = asyncio.create_task(_spin_restored_loop(bot))
+
+
+def stop_spin_restored_scheduler():
+    """Остановить планировщик пуша"""
+    global _spin_restored_task
+    if _spin_restored_task is not None:
+        _spin_restored_task.cancel()
+        _spin_restored_task = None
@@ -0,0 +1,281 @@
+"""
+Помесячные партиции истории
+- fox_game_history и fox_casino_games партиционированы по created_at (RANGE, месяц на партицию)
+- init_db только создаёт партиции; старую обычную таблицу переводит в партиционированную
+  отдельный скрипт migrate_partitions.py (один раз, в окно обслуживания)
+- Партиции создаются на PARTITION_MONTHS_AHEAD месяцев вперёд; DEFAULT-партиция — страховка,
+  чтобы вставка не упала, если обслуживание не успело. Строки, попавшие в DEFAULT, при обслуживании
+  переезжают в партицию своего месяца (и дальше подчиняются хранению, как все)
+- Хранение: партиции старше PARTITION_RETENTION месяцев удаляются ("drop") или отцепляются
+  в схему PARTITION_ARCHIVE_SCHEMA ("detach"). Перед удалением истории игр дневной роллап
+  выигрышей (fox_daily_wins) пересчитывается за этот месяц — лидерборды ничего не теряют
+- Обслуживание — фоновая задача раз в PARTITION_MAINTENANCE_INTERVAL
+"""
+import asyncio
+import re
+from datetime import date, datetime
+
+from sqlalchemy import Table, inspect, text
+
+from logger import logger
+
+
+PARTITION_MONTHS_AHEAD = 2  # Сколько будущих месяцев держать готовыми
+PARTITION_MAINTENANCE_INTERVAL = 24 * 60 * 60  # Секунд между прогонами обслуживания
+PARTITION_ARCHIVE_SCHEMA = "fox_archive"  # Куда отцепляются архивные партиции
+
+# Таблица -> (хранить месяцев, что делать со старыми: "drop" | "detach")
+PARTITION_RETENTION = {
+    "fox_game_history": (12, "drop"),  # Лидерборды живут на fox_daily_wins
+    "fox_casino_games": (24, "detach"),  # Ставки на реальные деньги — в архив, не удаляем
+}
+
+# Ключ advisory-lock: обслуживание партиций в одном воркере за раз
+PARTITION_LOCK_KEY = 0x466F785061727473
+
+_PARTITION_RE = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def month_start(moment: date | datetime) -> date:
+    """Первое число месяца"""
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    """Первое число месяца через count месяцев"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table_name: str, month: date) -> str:
+    return f"{table_name}_y{month:%Y}m{month:%m}"
+
+
+def partition_ddl(table_name: str, month: date) -> str:
+    """CREATE TABLE для партиции месяца"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table_name, month)} PARTITION OF {table_name} "
+        f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+    )
+
+
+def _default_name(table_name: str) -> str:
+    return f"{table_name}_default"
+
+
+def _create_partition(sync_conn, table_name: str, month: date) -> None:
+    """
+    Создать партицию месяца. Если в DEFAULT уже есть строки этого месяца,
+    CREATE ... PARTITION OF упал бы — тогда партиция собирается отдельно,
+    строки переносятся в неё из DEFAULT и она подключается через ATTACH.
+    """
+    name = partition_name(table_name, month)
+    if _relkind(sync_conn, name) is not None:
+        return
+
+    default = _default_name(table_name)
+    bounds = {"start": month, "end": add_months(month, 1)}
+    in_default = _relkind(sync_conn, default) is not None and sync_conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= :start AND created_at < :end)"),
+        bounds,
+    ).scalar()
+    if not in_default:
+        sync_conn.execute(text(partition_ddl(table_name, month)))
+        return
+
+    sync_conn.execute(text(f"CREATE TABLE {name} (LIKE {table_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = sync_conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {default} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        bounds,
+    ).rowcount
+    sync_conn.execute(text(
+        f"ALTER TABLE {table_name} ATTACH PARTITION {name} FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+    ))
+    logger.info(f"[Gamification] {name}: перенесено {moved} строк из DEFAULT")
+
+
+def ensure_partitions(sync_conn, table_name: str, since: date | None = None) -> list[date]:
+    """
+    Создать партиции с месяца since (по умолчанию — текущего)
+    до PARTITION_MONTHS_AHEAD месяцев вперёд, DEFAULT-партицию
+    и партиции для месяцев, строки которых лежат в DEFAULT.
+    Месяц, который не удалось создать, пропускается (остальные создаются).
+    Возвращает пропущенные месяцы.
+    """
+    current = month_start(datetime.utcnow())
+    month = month_start(since) if since else current
+    last = add_months(current, PARTITION_MONTHS_AHEAD)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+
+    default = _default_name(table_name)
+    sync_conn.execute(text(f"CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table_name} DEFAULT"))
+    # Строки, попавшие в DEFAULT (обслуживание не успело или дата вне окна), — по своим месяцам
+    stray = sync_conn.execute(
+        text(f"SELECT DISTINCT date_trunc('month', created_at)::date FROM {default}")
+    ).scalars().all()
+    months += [month for month in stray if month not in months]
+
+    skipped = []
+    for month in sorted(months):
+        try:
+            with sync_conn.begin_nested():
+                _create_partition(sync_conn, table_name, month)
+        except Exception as e:
+            skipped.append(month)
+            logger.warning(f"[Gamification] Партиция {partition_name(table_name, month)} не создана: {e}")
+    return skipped
+
+
+def _relkind(sync_conn, name: str) -> str | None:
+    """'r' — обычная таблица, 'p' — партиционированная, None — нет такой"""
+    return sync_conn.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+
+
+def needs_conversion(sync_conn, table_name: str) -> bool:
+    """Таблица создана до партиций и ещё не переведена (migrate_partitions.py)"""
+    return _relkind(sync_conn, table_name) == "r"
+
+
+def convert_to_partitioned(sync_conn, table: Table) -> bool:
+    """
+    Перевести обычную таблицу в партиционированную (для таблиц, созданных до партиций).
+    Старая таблица переименовывается, строки переливаются в партиции, id продолжается с того же места.
+    Запускается скриптом migrate_partitions.py в его транзакции — при ошибке всё откатывается.
+    Держит эксклюзивную блокировку таблицы на всё время переливки.
+    Возвращает True, если таблица переведена.
+    """
+    name = table.name
+    if not needs_conversion(sync_conn, name):
+        return False
+
+    legacy = f"{name}_unpartitioned"
+    sync_conn.execute(text(f"ALTER TABLE {name} RENAME TO {legacy}"))
+    # Индексы и последовательность старой таблицы освобождают имена для новой
+    indexes = sync_conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table"),
+        {"table": legacy},
+    ).scalars().all()
+    for index in indexes:
+        sync_conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index[:50]}_unpart"'))
+    sequence = sync_conn.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": legacy}).scalar()
+    if sequence:
+        sync_conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {legacy}_id_seq"))
+
+    table.create(sync_conn)
+    first = sync_conn.execute(text(f"SELECT min(created_at) FROM {legacy}")).scalar()
+    ensure_partitions(sync_conn, name, first)
+
+    legacy_columns = {column["name"] for column in inspect(sync_conn).get_columns(legacy)}
+    columns = [column.name for column in table.columns if column.name in legacy_columns]
+    source = ", ".join("COALESCE(created_at, now())" if column == "created_at" else column for column in columns)
+    moved = sync_conn.execute(
+        text(f"INSERT INTO {name} ({', '.join(columns)}) SELECT {source} FROM {legacy}")
+    ).rowcount
+    sync_conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), COALESCE(max(id), 0) + 1, false) FROM {name}"
+    ))
+    sync_conn.execute(text(f"DROP TABLE {legacy}"))
+
+    logger.info(f"[Gamification] {name}: переведена на помесячные партиции ({moved} строк)")
+    return True
+
+
+def list_partitions(sync_conn, table_name: str) -> list[tuple[str, date]]:
+    """Помесячные партиции таблицы: [(имя, месяц), ...] от старых к новым (DEFAULT не входит)"""
+    names = sync_conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": table_name},
+    ).scalars().all()
+
+    partitions = []
+    for partition in names:
+        match = _PARTITION_RE.search(partition)
+        if match:
+            partitions.append((partition, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def expired_partitions(sync_conn, table_name: str, months: int) -> list[tuple[str, date]]:
+    """Партиции, целиком старше months месяцев"""
+    cutoff = add_months(month_start(datetime.utcnow()), -months)
+    return [(name, month) for name, month in list_partitions(sync_conn, table_name) if month < cutoff]
+
+
+async def run_partition_maintenance() -> dict:
+    """
+    Создать будущие партиции и применить PARTITION_RETENTION.
+    Возвращает {таблица: [обработанные партиции]}.
+    """
+    from database.db import async_session_maker, engine
+    from .leaderboard import backfill_daily_wins
+
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+        expired = {}
+        for table_name, (months, _) in PARTITION_RETENTION.items():
+            if await conn.run_sync(needs_conversion, table_name):
+                logger.warning(f"[Gamification] {table_name} не партиционирована — запусти migrate_partitions.py")
+                continue
+            await conn.run_sync(ensure_partitions, table_name)
+            expired[table_name] = await conn.run_sync(expired_partitions, table_name, months)
+
+    # Роллап выигрышей за удаляемые месяцы — до удаления
+    if expired.get("fox_game_history") and PARTITION_RETENTION["fox_game_history"][1] == "drop":
+        async with async_session_maker() as session:
+            for _, month in expired["fox_game_history"]:
+                await backfill_daily_wins(session, start=month, end=add_months(month, 1))
+
+    processed = {}
+    async with engine.begin() as conn:
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+        for table_name, partitions in expired.items():
+            action = PARTITION_RETENTION[table_name][1]
+            for partition, _ in partitions:
+                if action == "detach":
+                    await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {PARTITION_ARCHIVE_SCHEMA}"))
+                    await conn.execute(text(f"ALTER TABLE {table_name} DETACH PARTITION {partition}"))
+                    await conn.execute(text(f"ALTER TABLE {partition} SET SCHEMA {PARTITION_ARCHIVE_SCHEMA}"))
+                else:
+                    await conn.execute(text(f"DROP TABLE IF EXISTS {partition}"))
+                processed.setdefault(table_name, []).append(partition)
+                logger.info(f"[Gamification] Партиция {partition}: {action}")
+    return processed
+
+
+async def _maintenance_loop():
+    """Фоновое обслуживание партиций"""
+    while True:
+        try:
+            await run_partition_maintenance()
+        except Exception as e:
+            logger.warning(f"[Gamification] Ошибка обслуживания партиций: {e}")
+        await asyncio.sleep(PARTITION_MAINTENANCE_INTERVAL)
+
+
+_maintenance_task: asyncio.Task | None = None
+
+
+def start_partition_maintenance():
+    """Запустить фоновое обслуживание партиций"""
+    global _maintenance_task
+    if _maintenance_task is None or _maintenance_task.done():
+        _maintenance_task = asyncio.create_task(_maintenance_loop())
+
+
+def stop_partition_maintenance():
+    """Остановить фоновое обслуживание партиций"""
+    global _maintenance_task
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+        _maintenance_task = None
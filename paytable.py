@@ -0,0 +1,126 @@
+"""
+Скомпилированная таблица выплат слотов
+- Символы — маленькие int (FOX..EMPTY), эмодзи только для отображения
+- Кумулятивные веса считаются один раз при импорте
+- Приз за (тройку/пару символа, буст) берётся из таблицы, готовые Prize кэшируются
+- roll_many(n) — пачка спинов для симуляций
+"""
+import random
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import accumulate
+
+
+@dataclass(frozen=True)
+class Prize:
+    """Структура приза (неизменяемая: lookup_prize отдаёт общие экземпляры из кэша)"""
+    prize_type: str  # "vpn_days", "coins", "balance", "empty", "boost"
+    value: int
+    description: str
+    rarity: str  # "common", "uncommon", "rare", "epic", "legendary"
+    emoji: str
+
+
+# ==================== СИМВОЛЫ ====================
+
+FOX, DIAMOND, CLOVER, STAR, MONEY, COIN, GIFT, EMPTY = range(8)
+
+SYMBOLS = ("🦊", "💎", "🔮", "⭐", "💰", "🪙", "🎁", "❌")
+SYMBOL_IDS = {symbol: symbol_id for symbol_id, symbol in enumerate(SYMBOLS)}
+
+# Веса символов (чем меньше вес, тем реже выпадает)
+WEIGHTS = (
+    5,   # 🦊 Лиса - редкий (джекпот если 3)
+    8,   # 💎 Алмаз - редкий
+    10,  # 🔮 Клевер - необычный
+    12,  # ⭐ Звезда - необычный
+    15,  # 💰 Деньги - обычный
+    18,  # 🪙 Монета - обычный
+    12,  # 🎁 Подарок - необычный
+    20,  # ❌ Пусто - частый
+)
+CUM_WEIGHTS = tuple(accumulate(WEIGHTS))
+TOTAL_WEIGHT = CUM_WEIGHTS[-1]
+
+_SYMBOL_RANGE = range(len(SYMBOLS))
+
+
+# ==================== ТАБЛИЦА ВЫПЛАТ ====================
+# (тип, значение, растёт от буста, описание, редкость, эмодзи); {v} — итоговое значение
+
+TRIPLE = 3
+DOUBLE = 2
+
+PAYTABLE = {
+    TRIPLE: (
+        ("vpn_days", 60, False, "+{v} дней VPN!", "legendary", "🦊"),  # ТРИ ЛИСЫ - ЛЕГЕНДАРНЫЙ ДЖЕКПОТ!
+        ("vpn_days", 30, True, "+{v} дней VPN!", "epic", "💎"),
+        ("boost", 30, False, "Буст удачи +{v}%!", "epic", "🔮"),  # Три клевера - буст удачи
+        ("vpn_days", 14, True, "+{v} дней VPN!", "rare", "⭐"),
+        ("balance", 50, False, "+25₽ на баланс!", "legendary", "💰"),  # Рубли на баланс
+        ("coins", 100, True, "+{v} Лискоинов!", "rare", "🪙"),
+        ("vpn_days", 7, True, "+{v} дней VPN!", "rare", "🎁"),
+        ("coins", 15, False, "+{v} Лискоинов (утешительный)", "common", "❌"),
+    ),
+    DOUBLE: (
+        ("coins", 35, True, "+{v} Лискоинов", "rare", "🦊"),
+        ("coins", 40, True, "+{v} Лискоинов", "uncommon", "💎"),
+        ("boost", 10, False, "Буст удачи +{v}%", "uncommon", "🔮"),
+        ("coins", 25, True, "+{v} Лискоинов", "uncommon", "⭐"),
+        ("coins", 50, True, "+{v} Лискоинов", "uncommon", "💰"),
+        ("coins", 20, False, "+{v} Лискоинов", "common", "🪙"),
+        ("coins", 20, True, "+{v} Лискоинов", "common", "🎁"),
+        ("coins", 5, False, "+{v} Лискоинов", "common", "❌"),  # Утешительный приз
+    ),
+}
+
+# Все символы разные: 35% - ничего, 65% - лискоины
+NOTHING_CHANCE = 0.35
+NOTHING_PRIZE = Prize("empty", 0, "Ничего не выпало", "common", "❌")
+SMALL_PRIZES = tuple(Prize("coins", coins, f"+{coins} Лискоинов", "common", "🦊") for coins in (5, 8, 10, 12, 15))
+
+
+@lru_cache(maxsize=1024)
+def lookup_prize(kind: int, symbol: int, boost_percent: int = 0) -> Prize:
+    """Приз за тройку (TRIPLE) или пару (DOUBLE) символа с учётом буста"""
+    prize_type, value, boosted, description, rarity, emoji = PAYTABLE[kind][symbol]
+    if boosted:
+        value = int(value * (1 + boost_percent / 100))
+    return Prize(prize_type, value, description.format(v=value), rarity, emoji)
+
+
+def prize_for_roll(roll, boost_percent: int = 0) -> Prize:
+    """
+    Приз за три символа.
+    3 одинаковых = джекпот
+    2 одинаковых = средний приз
+    Все разные = маленький приз или ничего
+    """
+    s1, s2, s3 = roll
+    if s1 == s2 == s3:
+        return lookup_prize(TRIPLE, s1, boost_percent)
+    if s1 == s2 or s1 == s3:
+        return lookup_prize(DOUBLE, s1, boost_percent)
+    if s2 == s3:
+        return lookup_prize(DOUBLE, s2, boost_percent)
+    if random.random() < NOTHING_CHANCE:
+        return NOTHING_PRIZE
+    return random.choice(SMALL_PRIZES)
+
+
+# ==================== КРУТКА ====================
+
+def roll() -> tuple[int, int, int]:
+    """Крутим 3 барабана"""
+    return tuple(random.choices(_SYMBOL_RANGE, cum_weights=CUM_WEIGHTS, k=3))
+
+
+def roll_many(n: int) -> list[tuple[int, int, int]]:
+    """n спинов за один вызов генератора (для симуляций)"""
+    flat = random.choices(_SYMBOL_RANGE, cum_weights=CUM_WEIGHTS, k=3 * n)
+    return list(zip(flat[0::3], flat[1::3], flat[2::3]))
+
+
+def to_emoji(roll) -> list[str]:
+    """Символы для отображения"""
+    return [SYMBOLS[symbol] for symbol in roll]
@@ -5,7 +5,8 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 from enum import Enum
 
-from sqlalchemy import select, update, func
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from logger import logger
@@ -105,81 +106,118 @@ async def get_player_quests(session: AsyncSession, tg_id: int) -> list[FoxQuest]
         select(FoxQuest)
         .where(
             FoxQuest.tg_id == tg_id,
-            func.date(FoxQuest.created_at) == today,
+            FoxQuest.day == today,
         )
     )
     return list(result.scalars().all())
 
 
-async def init_daily_quests(session: AsyncSession, tg_id: int) -> list[FoxQuest]:
-    """Инициализировать ежедневные квесты для игрока"""
+# Ежедневные квесты, которые выдаются каждому игроку
+DAILY_QUEST_TYPES = [
+    QuestType.DAILY_LOGIN,
+    QuestType.PLAY_GAME,
+    QuestType.PLAY_3_GAMES,
+    QuestType.WIN_GAME,
+]
+
+
+async def init_daily_quests(session: AsyncSession, tg_id: int, commit: bool = True) -> list[FoxQuest]:
+    """
+    Инициализировать ежедневные квесты для игрока.
+    Один INSERT ... ON CONFLICT DO NOTHING по ключу (tg_id, day, quest_type) —
+    повторный вызов за день ничего не делает.
+    Возвращает только что созданные квесты (пусто, если уже были).
+    """
     today = datetime.utcnow().date()
+    now = datetime.utcnow()
     
-    # Проверяем, есть ли уже квесты на сегодня
-    existing = await get_player_quests(session, tg_id)
-    if existing:
-        return existing
-    
-    # Создаём ежедневные квесты
-    quests = []
-    daily_quest_types = [
-        QuestType.DAILY_LOGIN,
-        QuestType.PLAY_GAME,
-        QuestType.PLAY_3_GAMES,
-        QuestType.WIN_GAME,
-    ]
-    
-    for quest_type in daily_quest_types:
-        quest = FoxQuest(
-            tg_id=tg_id,
-            quest_type=quest_type.value,
-            progress=0,
-            target=3 if quest_type == QuestType.PLAY_3_GAMES else 1,
-            is_completed=False,
-            is_claimed=False,
+    result = await session.scalars(
+        insert(FoxQuest)
+        .values([
+            {
+                "tg_id": tg_id,
+                "quest_type": quest_type.value,
+                "progress": 0,
+                "target": 3 if quest_type == QuestType.PLAY_3_GAMES else 1,
+                "is_completed": False,
+                "is_claimed": False,
+                "day": today,
+                "created_at": now,
+            }
+            for quest_type in DAILY_QUEST_TYPES
+        ])
+        .on_conflict_do_nothing(
+            index_elements=[FoxQuest.tg_id, FoxQuest.day, FoxQuest.quest_type]
         )
-        session.add(quest)
-        quests.append(quest)
+        .returning(FoxQuest)
+    )
+    quests = list(result.all())
     
-    await session.commit()
-    logger.info(f"[Quests] Созданы ежедневные квесты для {tg_id}")
+    if commit:
+        await session.commit()
+    if quests:
+        logger.info(f"[Quests] Созданы ежедневные квесты для {tg_id}")
     
     return quests
 
 
-async def update_quest_progress(
-    session: AsyncSession, 
-    tg_id: int, 
-    quest_type: QuestType, 
-    increment: int = 1
-) -> FoxQuest | None:
-    """Обновить прогресс квеста. Возвращает квест если он был завершён."""
-    today = datetime.utcnow().date()
+async def update_quests_progress(
+    session: AsyncSession,
+    tg_id: int,
+    increments: dict[QuestType, int],
+    commit: bool = True,
+) -> list[FoxQuest]:
+    """
+    Обновить прогресс нескольких квестов одним UPDATE ... RETURNING.
+    increments: {QuestType: на сколько увеличить}.
+    Возвращает квесты, которые завершились этим обновлением.
+    """
+    increments = {quest_type.value: inc for quest_type, inc in increments.items() if inc}
+    if not increments:
+        return []
     
-    result = await session.execute(
-        select(FoxQuest)
+    now = datetime.utcnow()
+    new_progress = FoxQuest.progress + case(increments, value=FoxQuest.quest_type, else_=0)
+    done = new_progress >= FoxQuest.target
+    
+    result = await session.scalars(
+        update(FoxQuest)
         .where(
             FoxQuest.tg_id == tg_id,
-            FoxQuest.quest_type == quest_type.value,
-            func.date(FoxQuest.created_at) == today,
+            FoxQuest.day == now.date(),
+            FoxQuest.quest_type.in_(list(increments)),
             FoxQuest.is_completed == False,
         )
+        .values(
+            progress=new_progress,
+            is_completed=done,
+            completed_at=case((done, now), else_=None),
+        )
+        .returning(FoxQuest)
+        # Квесты могли уже лежать в сессии (init_daily_quests) — обновляем их значениями из RETURNING
+        .execution_options(synchronize_session=False, populate_existing=True)
     )
-    quest = result.scalar_one_or_none()
+    completed = [quest for quest in result.all() if quest.is_completed]
     
-    if not quest:
-        return None
-    
-    quest.progress += increment
-    
-    if quest.progress >= quest.target:
-        quest.is_completed = True
-        quest.completed_at = datetime.utcnow()
-        logger.info(f"[Quests] Квест {quest_type.value} выполнен игроком {tg_id}")
+    if commit:
+        await session.commit()
     
-    await session.commit()
+    for quest in completed:
+        logger.info(f"[Quests] Квест {quest.quest_type} выполнен игроком {tg_id}")
     
-    return quest if quest.is_completed else None
+    return completed
+
+
+async def update_quest_progress(
+    session: AsyncSession, 
+    tg_id: int, 
+    quest_type: QuestType, 
+    increment: int = 1,
+    commit: bool = True,
+) -> FoxQuest | None:
+    """Обновить прогресс квеста. Возвращает квест если он был завершён."""
+    completed = await update_quests_progress(session, tg_id, {quest_type: increment}, commit=commit)
+    return completed[0] if completed else None
 
 
 async def claim_quest_reward(session: AsyncSession, tg_id: int, quest_id: int) -> int | None:
@@ -221,21 +259,18 @@ async def claim_quest_reward(session: AsyncSession, tg_id: int, quest_id: int) -
 async def check_login_streak_quests(session: AsyncSession, tg_id: int) -> list[str]:
     """Проверить и выполнить квесты на серию входов. Возвращает список выполненных."""
     player = await get_or_create_player(session, tg_id)
-    completed = []
+    increments = {}
     
-    # Проверяем серию 3 дня
+    # Серия 3 дня
     if player.login_streak >= 3:
-        quest = await update_quest_progress(session, tg_id, QuestType.LOGIN_STREAK_3)
-        if quest:
-            completed.append("LOGIN_STREAK_3")
+        increments[QuestType.LOGIN_STREAK_3] = 1
     
-    # Проверяем серию 7 дней
+    # Серия 7 дней
     if player.login_streak >= 7:
-        quest = await update_quest_progress(session, tg_id, QuestType.LOGIN_STREAK_7)
-        if quest:
-            completed.append("LOGIN_STREAK_7")
+        increments[QuestType.LOGIN_STREAK_7] = 1
     
-    return completed
+    quests = await update_quests_progress(session, tg_id, increments)
+    return [QuestType(quest.quest_type).name for quest in quests]
 
 
 def format_quest_status(quest: FoxQuest) -> str:
@@ -0,0 +1,208 @@
+"""
+Рейтинги в памяти процесса — отсортированное множество на skip list (как ZSET в Redis)
+- Обновление очков, позиция игрока и топ-K за O(log n)
+- Доски: монеты, серия входов, игры, выигрыши за неделю
+- Наполняются из БД в leaderboard.get_board(), дальше обновляются из db.py
+"""
+import random
+
+
+# Доски
+BOARD_COINS = "coins"
+BOARD_STREAK = "streak"
+BOARD_GAMES = "games"
+BOARD_WINS_WEEK = "wins_week"
+
+_MAX_LEVEL = 32
+_P = 0.25
+
+
+class _Node:
+    __slots__ = ("key", "member", "score", "forward", "span")
+
+    def __init__(self, key, member, score, level: int):
+        self.key = key
+        self.member = member
+        self.score = score
+        self.forward = [None] * level  # Следующий узел на каждом уровне
+        self.span = [0] * level  # Сколько узлов перепрыгивает ссылка
+
+
+class SortedSet:
+    """
+    Отсортированное множество: участник -> очки.
+    Порядок — по убыванию очков, при равенстве по возрастанию участника.
+    Позиции (rank) считаются с 1.
+    """
+
+    def __init__(self):
+        self._head = _Node(None, None, None, _MAX_LEVEL)
+        self._level = 1
+        self._length = 0
+        self._scores: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, member: int) -> bool:
+        return member in self._scores
+
+    @staticmethod
+    def _key(member: int, score: int) -> tuple:
+        return (-score, member)
+
+    @staticmethod
+    def _random_level() -> int:
+        level = 1
+        while level < _MAX_LEVEL and random.random() < _P:
+            level += 1
+        return level
+
+    def score(self, member: int) -> int | None:
+        """Очки участника"""
+        return self._scores.get(member)
+
+    def add(self, member: int, score: int) -> None:
+        """Добавить участника или обновить его очки"""
+        old_score = self._scores.get(member)
+        if old_score == score:
+            return
+        if old_score is not None:
+            self._delete(self._key(member, old_score))
+
+        key = self._key(member, score)
+        update = [None] * _MAX_LEVEL
+        rank = [0] * _MAX_LEVEL
+
+        x = self._head
+        for i in range(self._level - 1, -1, -1):
+            rank[i] = 0 if i == self._level - 1 else rank[i + 1]
+            while x.forward[i] is not None and x.forward[i].key < key:
+                rank[i] += x.span[i]
+                x = x.forward[i]
+            update[i] = x
+
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                rank[i] = 0
+                update[i] = self._head
+                update[i].span[i] = self._length
+            self._level = level
+
+        node = _Node(key, member, score, level)
+        for i in range(level):
+            node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = node
+            node.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = (rank[0] - rank[i]) + 1
+
+        for i in range(level, self._level):
+            update[i].span[i] += 1
+
+        self._length += 1
+        self._scores[member] = score
+
+    def increment(self, member: int, amount: int) -> int:
+        """Прибавить очки участнику. Возвращает новые очки."""
+        score = self._scores.get(member, 0) + amount
+        self.add(member, score)
+        return score
+
+    def remove(self, member: int) -> bool:
+        """Убрать участника"""
+        score = self._scores.pop(member, None)
+        if score is None:
+            return False
+        self._delete(self._key(member, score))
+        return True
+
+    def _delete(self, key: tuple) -> None:
+        update = [None] * _MAX_LEVEL
+        x = self._head
+        for i in range(self._level - 1, -1, -1):
+            while x.forward[i] is not None and x.forward[i].key < key:
+                x = x.forward[i]
+            update[i] = x
+
+        x = x.forward[0]
+        if x is None or x.key != key:
+            return
+
+        for i in range(self._level):
+            if update[i].forward[i] is x:
+                update[i].span[i] += x.span[i] - 1
+                update[i].forward[i] = x.forward[i]
+            else:
+                update[i].span[i] -= 1
+
+        while self._level > 1 and self._head.forward[self._level - 1] is None:
+            self._level -= 1
+        self._length -= 1
+
+    def rank(self, member: int) -> int | None:
+        """Позиция участника (с 1) или None"""
+        score = self._scores.get(member)
+        if score is None:
+            return None
+
+        key = self._key(member, score)
+        rank = 0
+        x = self._head
+        for i in range(self._level - 1, -1, -1):
+            while x.forward[i] is not None and x.forward[i].key <= key:
+                rank += x.span[i]
+                x = x.forward[i]
+            if x.key == key:
+                return rank
+        return None
+
+    def top(self, limit: int) -> list[tuple[int, int]]:
+        """Первые limit участников: [(участник, очки), ...]"""
+        result = []
+        x = self._head.forward[0]
+        while x is not None and len(result) < limit:
+            result.append((x.member, x.score))
+            x = x.forward[0]
+        return result
+
+
+# ==================== Реестр досок ====================
+
+_boards: dict[str, SortedSet] = {}
+
+
+def get_loaded_board(name: str) -> SortedSet | None:
+    """Доска, если она уже загружена в память"""
+    return _boards.get(name)
+
+
+def set_board(name: str, board: SortedSet) -> None:
+    """Заменить доску (после загрузки из БД)"""
+    _boards[name] = board
+
+
+def drop_board(name: str | None = None) -> None:
+    """Выгрузить доску (или все) — при следующем запросе перечитается из БД"""
+    if name is None:
+        _boards.clear()
+    else:
+        _boards.pop(name, None)
+
+
+def set_board_score(name: str, tg_id: int, score: int) -> None:
+    """Записать очки игрока в доску (если она загружена). Нулевые очки — вне рейтинга."""
+    board = _boards.get(name)
+    if board is None:
+        return
+    if score > 0:
+        board.add(tg_id, score)
+    else:
+        board.remove(tg_id)
+
+
+def increment_board_score(name: str, tg_id: int, amount: int = 1) -> None:
+    """Прибавить очки игроку в доске (если она загружена)"""
+    board = _boards.get(name)
+    if board is not None:
+        board.increment(tg_id, amount)
@@ -43,15 +43,15 @@ async def set_referrer(session: AsyncSession, tg_id: int, referrer_id: int) -> b
     return True
 
 
-async def give_referral_bonus(session: AsyncSession, tg_id: int) -> dict | None:
+async def give_referral_bonus(session: AsyncSession, tg_id: int, commit: bool = True) -> dict | None:
     """
     Выдать реферальный бонус при первой игре.
     Возвращает {"referrer_id": ..., "referrer_bonus": ..., "referred_bonus": ...}
     или None если бонус уже выдан или нет реферера.
     """
-    from .db import get_or_create_player, update_player_coins
+    from .db import get_or_create_player, sync_cached_player, update_player_coins
     
-    player = await get_or_create_player(session, tg_id)
+    player = await get_or_create_player(session, tg_id, commit=commit)
     
     # Бонус уже выдан или нет реферера
     if player.referral_bonus_given or player.invited_by is None:
@@ -60,21 +60,26 @@ async def give_referral_bonus(session: AsyncSession, tg_id: int) -> dict | None:
     referrer_id = player.invited_by
     
     # Выдаём бонус пригласившему
-    await update_player_coins(session, referrer_id, REFERRER_BONUS)
+    await update_player_coins(session, referrer_id, REFERRER_BONUS, commit=False)
     
     # Выдаём бонус приглашённому
-    await update_player_coins(session, tg_id, REFERRED_BONUS)
+    await update_player_coins(session, tg_id, REFERRED_BONUS, commit=False)
     
     # Увеличиваем счётчик рефералов у пригласившего
-    await session.execute(
+    result = await session.execute(
         update(FoxPlayer)
         .where(FoxPlayer.tg_id == referrer_id)
         .values(total_referrals=FoxPlayer.total_referrals + 1)
+        .returning(FoxPlayer.total_referrals)
     )
+    total_referrals = result.scalar_one_or_none()
+    if total_referrals is not None:
+        sync_cached_player(session, referrer_id, total_referrals=total_referrals)
     
     # Помечаем что бонус выдан
     player.referral_bonus_given = True
-    await session.commit()
+    if commit:
+        await session.commit()
     
     return {
         "referrer_id": referrer_id,
@@ -10,12 +10,19 @@ from handlers.utils import edit_or_send_message
 from hooks.hooks import register_hook
 from logger import logger
 
-from .db import get_active_prizes, get_or_create_player, check_and_reset_daily_spin
-from .game import SPIN_COST_COINS, format_prize_message, play_game
+from .db import available_free_spins, get_active_prizes, get_or_create_player
+from .game import BATCH_SIZES, SPIN_COST_COINS, format_batch_message, format_prize_message, play_game, play_games_batch
+from .animation import Frame, schedule_frames
 from .keyboards import build_fox_den_menu, build_try_luck_menu
+from .locks import PLAYER_LOCK, PlayerLockMiddleware
+from .state_store import (
+    STATE_BLACKJACK, STATE_CARDS, STATE_CASINO_BET, STATE_CASINO_GAME, STATE_COOLDOWN,
+    STATE_HILO, STATE_REDBLACK, STATE_VPN_PURCHASE, get_state_store,
+)
 from .texts import (
     BTN_BACK,
     FOX_DEN_BUTTON,
+    GAME_NOT_COUNTED_TEXT,
 )
 
 # Путь к картинке Логова Лисы
@@ -24,18 +31,31 @@ FOX_DEN_IMAGE = str(Path(__file__).parent.parent.parent / "img" / "fox_den.jpg")
 
 
 router = Router(name="gamification")
+# Обработчики с flags=PLAYER_LOCK одного игрока выполняются по очереди (двойной тап отклоняется)
+router.callback_query.middleware(PlayerLockMiddleware())
 
 # Флаг инициализации БД
 _db_initialized = False
 
 
-async def ensure_db():
-    """Ленивая инициализация таблиц БД"""
+async def ensure_db(bot=None):
+    """Ленивая инициализация таблиц БД (и фоновых задач; планировщику пушей нужен bot)"""
     global _db_initialized
     if not _db_initialized:
+        from .casino_ledger import start_casino_ledger
         from .init_db import init_gamification_db
+        from .jackpot import start_jackpot_flusher
+        from .partitions import start_partition_maintenance
+        from .state_store import start_state_sweeper
         await init_gamification_db()
+        start_jackpot_flusher()
+        start_casino_ledger()
+        start_partition_maintenance()
+        start_state_sweeper()
         _db_initialized = True
+    if bot is not None:
+        from .notifications import start_spin_restored_scheduler
+        start_spin_restored_scheduler(bot)
 
 
 def build_back_to_den_kb() -> InlineKeyboardMarkup:
@@ -80,6 +100,13 @@ def build_after_game_kb(game_type: str = "slots") -> InlineKeyboardMarkup:
     btn_text, callback = game_buttons.get(game_type, ("🎰 Ещё раз!", "fox_play_slots"))
     builder.row(InlineKeyboardButton(text=btn_text, callback_data=callback))
     
+    # Сразу несколько спинов одним сообщением
+    batch_game = game_type if game_type in game_buttons else "slots"
+    builder.row(*(
+        InlineKeyboardButton(text=f"⚡ ×{n}", callback_data=f"fox_batch_{batch_game}_{n}")
+        for n in BATCH_SIZES
+    ))
+    
     builder.row(InlineKeyboardButton(text="🎮 Выбрать игру", callback_data="fox_try_luck"))
     builder.row(InlineKeyboardButton(text="🎁 Мои призы", callback_data="fox_my_prizes"))
     builder.row(InlineKeyboardButton(text=BTN_BACK, callback_data="fox_try_luck"))  # Назад в мини-игры
@@ -101,7 +128,7 @@ async def add_fox_den_button(**kwargs):
 @router.callback_query(F.data == "fox_den")
 async def handle_fox_den(callback: CallbackQuery, session: AsyncSession, admin: bool = False):
     """Главное меню Логова Лисы"""
-    await ensure_db()
+    await ensure_db(callback.bot)
     
     # Проверка режима доработки
     user_id = callback.from_user.id
@@ -131,8 +158,6 @@ async def handle_fox_den(callback: CallbackQuery, session: AsyncSession, admin:
     from database.users import get_balance
     from .casino import get_current_jackpot
     
-    player = await get_or_create_player(session, callback.from_user.id)
-    await check_and_reset_daily_spin(session, callback.from_user.id)
     player = await get_or_create_player(session, callback.from_user.id)
     
     # Реальный баланс пользователя
@@ -173,15 +198,15 @@ async def handle_try_luck(callback: CallbackQuery, session: AsyncSession):
     
     from .db import get_next_free_spin_time
     
-    await check_and_reset_daily_spin(session, callback.from_user.id)
     player = await get_or_create_player(session, callback.from_user.id)
+    free_spins = available_free_spins(player)
     
     test_mode_text = "\n🔧 <b>ТЕСТОВЫЙ РЕЖИМ</b>\n" if TEST_MODE else ""
     
     # Формируем текст попыток
     spins_parts = []
-    if player.free_spins > 0:
-        spins_parts.append(f"🎫 {player.free_spins}")
+    if free_spins > 0:
+        spins_parts.append(f"🎫 {free_spins}")
     if player.paid_spins > 0:
         spins_parts.append(f"🛒 {player.paid_spins}")
     
@@ -218,7 +243,7 @@ async def handle_try_luck(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@router.callback_query(F.data == "fox_daily_bonus")
+@router.callback_query(F.data == "fox_daily_bonus", flags=PLAYER_LOCK)
 async def handle_daily_bonus(callback: CallbackQuery, session: AsyncSession):
     """Ежедневные бонусы — Задания + Календарь на одном экране"""
     await ensure_db()
@@ -233,7 +258,7 @@ async def handle_daily_bonus(callback: CallbackQuery, session: AsyncSession):
     player = await get_or_create_player(session, callback.from_user.id)
     
     # === КВЕСТЫ ===
-    await init_daily_quests(session, callback.from_user.id)
+    await init_daily_quests(session, callback.from_user.id, commit=False)
     await update_quest_progress(session, callback.from_user.id, QuestType.DAILY_LOGIN)
     quests = await get_player_quests(session, callback.from_user.id)
     
@@ -325,7 +350,7 @@ async def handle_daily_bonus(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@router.callback_query(F.data == "fox_calendar_claim_from_bonus")
+@router.callback_query(F.data == "fox_calendar_claim_from_bonus", flags=PLAYER_LOCK)
 async def handle_calendar_claim_from_bonus(callback: CallbackQuery, session: AsyncSession):
     """Забрать награду календаря из объединённого меню"""
     await ensure_db()
@@ -377,7 +402,7 @@ async def handle_calendar_claim_from_bonus(callback: CallbackQuery, session: Asy
     await handle_daily_bonus(callback, session)
 
 
-@router.callback_query(F.data == "fox_claim_quests_from_bonus")
+@router.callback_query(F.data == "fox_claim_quests_from_bonus", flags=PLAYER_LOCK)
 async def handle_claim_quests_from_bonus(callback: CallbackQuery, session: AsyncSession):
     """Забрать награды за квесты из объединённого меню"""
     await ensure_db()
@@ -440,7 +465,6 @@ async def run_game(callback: CallbackQuery, session: AsyncSession, game_type: st
         session, 
         callback.from_user.id, 
         use_coins=False,
-        message=msg,
         game_type=game_type,
         test_mode=TEST_MODE,
     )
@@ -502,16 +526,17 @@ async def run_game(callback: CallbackQuery, session: AsyncSession, game_type: st
 🎉🎉🎉"""
         text = jackpot_text + "\n\n" + text
     
-    await msg.edit_text(text, reply_markup=build_after_game_kb(game_type))
+    # Спин уже закоммичен — анимация и итог играют без обработчика
+    schedule_frames(msg, result["frames"] + [Frame(text, reply_markup=build_after_game_kb(game_type))])
 
 
-@router.callback_query(F.data == "fox_play_slots")
+@router.callback_query(F.data == "fox_play_slots", flags=PLAYER_LOCK)
 async def handle_play_slots(callback: CallbackQuery, session: AsyncSession):
     """Игра в слоты"""
     await run_game(callback, session, "slots")
 
 
-@router.callback_query(F.data.startswith("fox_play_coins_"))
+@router.callback_query(F.data.startswith("fox_play_coins_"), flags=PLAYER_LOCK)
 async def handle_play_for_coins(callback: CallbackQuery, session: AsyncSession):
     """Играть за лискоины (без попыток)"""
     await ensure_db()
@@ -541,7 +566,6 @@ async def handle_play_for_coins(callback: CallbackQuery, session: AsyncSession):
         session, 
         tg_id, 
         use_coins=True,  # ← Списываем лискоины
-        message=msg,
         game_type=game_type,
         test_mode=False,
     )
@@ -561,7 +585,7 @@ async def handle_play_for_coins(callback: CallbackQuery, session: AsyncSession):
         result["new_balance"],
     )
     
-    await msg.edit_text(text, reply_markup=build_after_game_kb(game_type))
+    schedule_frames(msg, result["frames"] + [Frame(text, reply_markup=build_after_game_kb(game_type))])
 
 
 @router.callback_query(F.data == "fox_no_coins_play")
@@ -671,7 +695,7 @@ async def handle_deal_decline(callback: CallbackQuery, session: AsyncSession):
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data.startswith("fox_deal_stake_"))
+@router.callback_query(F.data.startswith("fox_deal_stake_"), flags=PLAYER_LOCK)
 async def handle_deal_confirm(callback: CallbackQuery, session: AsyncSession):
     """Подтверждение ставки и сделка"""
     await ensure_db()
@@ -704,10 +728,9 @@ async def handle_deal_confirm(callback: CallbackQuery, session: AsyncSession):
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data.startswith("fox_deal_confirm_"))
+@router.callback_query(F.data.startswith("fox_deal_confirm_"), flags=PLAYER_LOCK)
 async def handle_deal_execute(callback: CallbackQuery, session: AsyncSession):
     """Выполнение сделки"""
-    import asyncio
     from .deal import execute_deal
     
     await ensure_db()
@@ -729,21 +752,9 @@ async def handle_deal_execute(callback: CallbackQuery, session: AsyncSession):
         "🤔 <i>Лиса думает...</i>"
     )
     
-    await asyncio.sleep(1.5)
-    
-    await msg.edit_text(
-        "🦊 <b>СДЕЛКА С ЛИСОЙ</b>\n\n"
-        f"Ставка: <b>{stake}</b> 🦊\n\n"
-        "🦊 <i>Лиса смотрит тебе в глаза...</i>"
-    )
-    
-    await asyncio.sleep(1.0)
-    
-    # Выполняем сделку
+    # Выполняем сделку (анимация — потом, без обработчика)
     result = await execute_deal(session, callback.from_user.id, "coins", stake)
     
-    await asyncio.sleep(0.5)
-    
     # Показываем результат
     player = await get_or_create_player(session, callback.from_user.id)
     
@@ -777,15 +788,53 @@ async def handle_deal_execute(callback: CallbackQuery, session: AsyncSession):
     builder.row(InlineKeyboardButton(text="🎮 К играм", callback_data="fox_try_luck"))
     builder.row(InlineKeyboardButton(text=BTN_BACK, callback_data="fox_try_luck"))
     
-    await msg.edit_text(text, reply_markup=builder.as_markup())
+    schedule_frames(msg, [
+        Frame(
+            "🦊 <b>СДЕЛКА С ЛИСОЙ</b>\n\n"
+            f"Ставка: <b>{stake}</b> 🦊\n\n"
+            "🦊 <i>Лиса смотрит тебе в глаза...</i>",
+            1.5,
+        ),
+        Frame(text, reply_markup=builder.as_markup()),
+    ], delay=1.5)
 
 
-@router.callback_query(F.data == "fox_play_wheel")
+@router.callback_query(F.data == "fox_play_wheel", flags=PLAYER_LOCK)
 async def handle_play_wheel(callback: CallbackQuery, session: AsyncSession):
     """Игра с колесом"""
     await run_game(callback, session, "wheel")
 
 
+@router.callback_query(F.data.startswith("fox_batch_"), flags=PLAYER_LOCK)
+async def handle_play_batch(callback: CallbackQuery, session: AsyncSession):
+    """Сыграть ×5 / ×10 — одна транзакция, одно итоговое сообщение"""
+    await ensure_db()
+    
+    game_type, _, n = callback.data.removeprefix("fox_batch_").rpartition("_")
+    if game_type not in ("slots", "wheel") or not n.isdigit() or int(n) not in BATCH_SIZES:
+        await callback.answer()
+        return
+    n = int(n)
+    tg_id = callback.from_user.id
+    logger.info(f"[Gamification] Пачка {game_type} ×{n} от {tg_id}")
+    
+    result = await play_games_batch(session, tg_id, n, game_type=game_type, test_mode=TEST_MODE)
+    
+    if not result["success"]:
+        await callback.answer(
+            f"❌ Нужно {n} попыток, у тебя {result['spins_left']}.",
+            show_alert=True
+        )
+        return
+    await callback.answer()
+    
+    text = format_batch_message(game_type, result["spins"], result["coins_won"], result["new_balance"])
+    if result.get("jackpot_win"):
+        text = f"🎰🎰🎰 <b>ДЖЕКПОТ!!!</b> 🎰🎰🎰\n\n💰 <b>+{result['jackpot_win']}</b> 🦊\n\n" + text
+    
+    schedule_frames(callback.message, [Frame(text, reply_markup=build_after_game_kb(game_type))])
+
+
 @router.callback_query(F.data == "fox_no_coins")
 async def handle_no_coins(callback: CallbackQuery):
     """Недостаточно монет"""
@@ -809,9 +858,9 @@ async def handle_quests(callback: CallbackQuery, session: AsyncSession):
     player = await get_or_create_player(session, callback.from_user.id)
     
     # Инициализируем ежедневные квесты (если ещё нет)
-    await init_daily_quests(session, callback.from_user.id)
+    await init_daily_quests(session, callback.from_user.id, commit=False)
     
-    # Отмечаем ежедневный вход
+    # Отмечаем ежедневный вход (коммит — один на оба шага)
     await update_quest_progress(session, callback.from_user.id, QuestType.DAILY_LOGIN)
     
     # Получаем квесты
@@ -867,7 +916,7 @@ async def handle_quests(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@router.callback_query(F.data == "fox_claim_quests")
+@router.callback_query(F.data == "fox_claim_quests", flags=PLAYER_LOCK)
 async def handle_claim_quests(callback: CallbackQuery, session: AsyncSession):
     """Забрать награды за выполненные квесты"""
     await ensure_db()
@@ -1050,7 +1099,7 @@ async def handle_apply_vpn(callback: CallbackQuery, session: AsyncSession):
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data.startswith("fox_apply_vpn_to_"))
+@router.callback_query(F.data.startswith("fox_apply_vpn_to_"), flags=PLAYER_LOCK)
 async def handle_apply_vpn_to_key(callback: CallbackQuery, session: AsyncSession):
     """Применить VPN дни к конкретной подписке"""
     await ensure_db()
@@ -1110,7 +1159,7 @@ async def handle_apply_vpn_to_key(callback: CallbackQuery, session: AsyncSession
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data == "fox_apply_balance")
+@router.callback_query(F.data == "fox_apply_balance", flags=PLAYER_LOCK)
 async def handle_apply_balance(callback: CallbackQuery, session: AsyncSession):
     """Применить баланс на счёт"""
     await ensure_db()
@@ -1289,7 +1338,7 @@ async def handle_no_coins(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data.startswith("fox_buy_boost_"))
+@router.callback_query(F.data.startswith("fox_buy_boost_"), flags=PLAYER_LOCK)
 async def handle_buy_boost(callback: CallbackQuery, session: AsyncSession):
     """Покупка буста удачи"""
     await ensure_db()
@@ -1319,7 +1368,7 @@ async def handle_buy_boost(callback: CallbackQuery, session: AsyncSession):
     await handle_upgrades(callback, session)
 
 
-@router.callback_query(F.data == "fox_buy_spin")
+@router.callback_query(F.data == "fox_buy_spin", flags=PLAYER_LOCK)
 async def handle_buy_spin(callback: CallbackQuery, session: AsyncSession):
     """Покупка дополнительной попытки"""
     await ensure_db()
@@ -1359,11 +1408,10 @@ async def handle_buy_spin(callback: CallbackQuery, session: AsyncSession):
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-# Временное хранилище для покупок VPN дней
-_pending_vpn_purchase: dict[int, dict] = {}  # {tg_id: {"days": int, "cost": int}}
+# Выбранная покупка VPN дней хранится в STATE_VPN_PURCHASE: {"days": int, "cost": int}
 
 
-@router.callback_query(F.data.in_(["fox_buy_vpn_3", "fox_buy_vpn_7", "fox_buy_vpn_14"]))
+@router.callback_query(F.data.in_(["fox_buy_vpn_3", "fox_buy_vpn_7", "fox_buy_vpn_14"]), flags=PLAYER_LOCK)
 async def handle_buy_vpn_days(callback: CallbackQuery, session: AsyncSession):
     """Покупка дней VPN — показываем выбор подписки"""
     await ensure_db()
@@ -1408,7 +1456,7 @@ async def handle_buy_vpn_days(callback: CallbackQuery, session: AsyncSession):
         return
     
     # Сохраняем информацию о покупке
-    _pending_vpn_purchase[tg_id] = {"days": days, "cost": cost}
+    await get_state_store().set(STATE_VPN_PURCHASE, tg_id, {"days": days, "cost": cost})
     
     # Показываем выбор подписки
     text = f"""🛒 <b>Покупка +{days} дней VPN</b>
@@ -1440,7 +1488,7 @@ async def handle_buy_vpn_days(callback: CallbackQuery, session: AsyncSession):
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data.startswith("fox_buy_vpn_apply_"))
+@router.callback_query(F.data.startswith("fox_buy_vpn_apply_"), flags=PLAYER_LOCK)
 async def handle_buy_vpn_apply(callback: CallbackQuery, session: AsyncSession):
     """Применить купленные дни VPN к выбранной подписке"""
     await ensure_db()
@@ -1448,12 +1496,12 @@ async def handle_buy_vpn_apply(callback: CallbackQuery, session: AsyncSession):
     tg_id = callback.from_user.id
     client_id = callback.data.replace("fox_buy_vpn_apply_", "")
     
-    # Проверяем есть ли ожидающая покупка
-    if tg_id not in _pending_vpn_purchase:
+    # Забираем ожидающую покупку (pop атомарный — двойной клик не применит её дважды)
+    purchase = await get_state_store().pop(STATE_VPN_PURCHASE, tg_id)
+    if purchase is None:
         await callback.answer("❌ Покупка не найдена. Попробуй снова.", show_alert=True)
         return
     
-    purchase = _pending_vpn_purchase.pop(tg_id)
     days = purchase["days"]
     cost = purchase["cost"]
     
@@ -1514,8 +1562,7 @@ async def handle_buy_vpn_apply(callback: CallbackQuery, session: AsyncSession):
 
 # ==================== ЛИСЬЕ КАЗИНО (реальные ставки!) ====================
 
-# Временное хранилище для двухфазных игр (bet для риска)
-_casino_pending_bets: dict[int, tuple[float, float]] = {}  # tg_id -> (bet, current_value)
+# Ставка между фазами костей (для риска) хранится в STATE_CASINO_BET: [bet, current_value]
 
 
 @router.callback_query(F.data == "fox_casino")
@@ -1653,76 +1700,103 @@ async def handle_casino_enter(callback: CallbackQuery, session: AsyncSession):
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-# Временное хранилище выбранной игры
-_casino_selected_game: dict[int, str] = {}
+# Выбранная игра хранится в STATE_CASINO_GAME
 
 # ==================== НОВАЯ СИСТЕМА КУЛДАУНОВ ====================
-# Формат: {tg_id: {game_type: {"cooldown_until": datetime, "lose_streak": int}}}
-_game_state: dict[int, dict[str, dict]] = {}
+# Состояние по игре: {"cooldown_until": ISO-время | None, "lose_streak": int}
+# хранится в STATE_COOLDOWN под ключом "tg_id:game_type"
+
 
+def _new_game_state() -> dict:
+    return {"cooldown_until": None, "lose_streak": 0}
 
-def get_game_state(tg_id: int, game_type: str) -> dict:
+
+async def get_game_state(tg_id: int, game_type: str) -> dict:
     """Получить состояние игры для игрока"""
-    if tg_id not in _game_state:
-        _game_state[tg_id] = {}
-    if game_type not in _game_state[tg_id]:
-        _game_state[tg_id][game_type] = {"cooldown_until": None, "lose_streak": 0}
-    return _game_state[tg_id][game_type]
+    return await get_state_store().get(STATE_COOLDOWN, f"{tg_id}:{game_type}", _new_game_state())
+
+
+async def update_game_state(tg_id: int, game_type: str, mutate) -> dict:
+    """
+    Изменить состояние игры через compare-and-set: mutate(state) меняет словарь на месте.
+    При параллельном изменении (другой клик/воркер) перечитываем и повторяем.
+    """
+    store = get_state_store()
+    key = f"{tg_id}:{game_type}"
+    
+    for _ in range(5):
+        item = await store.get_versioned(STATE_COOLDOWN, key)
+        state, version = item if item is not None else (_new_game_state(), None)
+        mutate(state)
+        if await store.compare_and_set(STATE_COOLDOWN, key, state, version):
+            return state
+    
+    # Не удалось за несколько попыток — пишем как есть
+    await store.set(STATE_COOLDOWN, key, state)
+    return state
 
 
-def check_game_cooldown(tg_id: int, game_type: str) -> tuple[bool, int]:
+async def check_game_cooldown(tg_id: int, game_type: str) -> tuple[bool, int]:
     """Проверить кулдаун для конкретной игры. Возвращает (can_play, seconds_left)"""
     from .casino import CASINO_TEST_MODE
     
     if CASINO_TEST_MODE:
         return True, 0
     
-    state = get_game_state(tg_id, game_type)
+    state = await get_game_state(tg_id, game_type)
     cooldown_until = state.get("cooldown_until")
     
-    if cooldown_until and cooldown_until > datetime.utcnow():
-        seconds_left = int((cooldown_until - datetime.utcnow()).total_seconds())
-        return False, seconds_left
+    if cooldown_until:
+        cooldown_until = datetime.fromisoformat(cooldown_until)
+        if cooldown_until > datetime.utcnow():
+            seconds_left = int((cooldown_until - datetime.utcnow()).total_seconds())
+            return False, seconds_left
     
     return True, 0
 
 
-def get_lose_streak(tg_id: int, game_type: str) -> int:
+async def get_lose_streak(tg_id: int, game_type: str) -> int:
     """Получить текущую серию проигрышей"""
-    return get_game_state(tg_id, game_type).get("lose_streak", 0)
+    return (await get_game_state(tg_id, game_type)).get("lose_streak", 0)
 
 
-def should_show_last_chance(tg_id: int, game_type: str) -> bool:
+async def should_show_last_chance(tg_id: int, game_type: str) -> bool:
     """Проверить, нужно ли показать 'Последний шанс' (перед 3-м или 5-м проигрышем)"""
     from .casino import (
         COOLDOWN_THRESHOLD_SMALL, COOLDOWN_THRESHOLD_BIG
     )
-    streak = get_lose_streak(tg_id, game_type)
+    streak = await get_lose_streak(tg_id, game_type)
     # Показываем перед 3-м и перед 5-м проигрышем
     return streak == COOLDOWN_THRESHOLD_SMALL - 1 or streak == COOLDOWN_THRESHOLD_BIG - 1
 
 
-def set_game_cooldown(tg_id: int, game_type: str, seconds: int):
-    """Установить кулдаун для конкретной игры"""
-    state = get_game_state(tg_id, game_type)
-    state["cooldown_until"] = datetime.utcnow() + timedelta(seconds=seconds)
+async def set_game_cooldown(tg_id: int, game_type: str, seconds: int, reset_streak: bool = False):
+    """Установить кулдаун для конкретной игры (reset_streak — заодно сбросить серию)"""
+    cooldown_until = (datetime.utcnow() + timedelta(seconds=seconds)).isoformat()
+    
+    def mutate(state: dict):
+        state["cooldown_until"] = cooldown_until
+        if reset_streak:
+            state["lose_streak"] = 0
+    
+    await update_game_state(tg_id, game_type, mutate)
 
 
-def clear_game_cooldown(tg_id: int, game_type: str):
+async def clear_game_cooldown(tg_id: int, game_type: str):
     """Сбросить кулдаун и серию проигрышей (при выигрыше)"""
-    state = get_game_state(tg_id, game_type)
-    state["cooldown_until"] = None
-    state["lose_streak"] = 0
+    await get_state_store().set(STATE_COOLDOWN, f"{tg_id}:{game_type}", _new_game_state())
 
 
-def increment_lose_streak(tg_id: int, game_type: str) -> int:
+async def increment_lose_streak(tg_id: int, game_type: str) -> int:
     """Увеличить серию проигрышей и вернуть новое значение"""
-    state = get_game_state(tg_id, game_type)
-    state["lose_streak"] = state.get("lose_streak", 0) + 1
+    def mutate(state: dict):
+        state["lose_streak"] = state.get("lose_streak", 0) + 1
+    
+    state = await update_game_state(tg_id, game_type, mutate)
     return state["lose_streak"]
 
 
-def apply_cooldown_if_needed(tg_id: int, game_type: str) -> tuple[bool, int]:
+async def apply_cooldown_if_needed(tg_id: int, game_type: str) -> tuple[bool, int]:
     """
     Применить кулдаун если нужно. Возвращает (cooldown_applied, seconds).
     - 1-2 проигрыша → без ограничений
@@ -1735,20 +1809,19 @@ def apply_cooldown_if_needed(tg_id: int, game_type: str) -> tuple[bool, int]:
         COOLDOWN_THRESHOLD_BIG, COOLDOWN_BIG_MIN, COOLDOWN_BIG_MAX
     )
     
-    streak = get_lose_streak(tg_id, game_type)
+    streak = await get_lose_streak(tg_id, game_type)
     
     if streak >= COOLDOWN_THRESHOLD_BIG:
         # 5+ проигрышей → большой кулдаун (10-30 мин)
         seconds = random.randint(COOLDOWN_BIG_MIN, COOLDOWN_BIG_MAX)
-        set_game_cooldown(tg_id, game_type, seconds)
         # Сбрасываем серию после кулдауна
-        get_game_state(tg_id, game_type)["lose_streak"] = 0
+        await set_game_cooldown(tg_id, game_type, seconds, reset_streak=True)
         return True, seconds
     
     elif streak >= COOLDOWN_THRESHOLD_SMALL:
         # 3-4 проигрыша → маленький кулдаун (30-60 сек)
         seconds = random.randint(COOLDOWN_SMALL_MIN, COOLDOWN_SMALL_MAX)
-        set_game_cooldown(tg_id, game_type, seconds)
+        await set_game_cooldown(tg_id, game_type, seconds)
         return True, seconds
     
     return False, 0
@@ -1761,30 +1834,51 @@ async def record_game_with_cooldown(
     won: bool, 
     multiplier: float, 
     payout: int,
-    game_type: str = None
-) -> tuple[bool, int]:
+    game_type: str = None,
+    reserved: bool = False,
+) -> tuple[bool, int] | None:
     """
     Записать игру и управлять кулдауном.
-    Возвращает (cooldown_applied, seconds) для отображения в UI.
+    Возвращает (cooldown_applied, seconds) для отображения в UI;
+    None — баланса не хватило, игра не засчитана (серия и кулдаун не трогаются).
+    reserved=True — ставка списана при раздаче.
     """
     from .casino import record_casino_game
     
-    await record_casino_game(session, tg_id, bet, won, multiplier, payout)
+    if await record_casino_game(session, tg_id, bet, won, multiplier, payout, reserved=reserved) is None:
+        return None
     
     if game_type is None:
-        game_type = _casino_selected_game.get(tg_id, "dice")
+        game_type = await get_state_store().get(STATE_CASINO_GAME, tg_id, "dice")
     
     if won:
-        clear_game_cooldown(tg_id, game_type)
+        await clear_game_cooldown(tg_id, game_type)
         return False, 0
     else:
         # Увеличиваем серию проигрышей
-        increment_lose_streak(tg_id, game_type)
+        await increment_lose_streak(tg_id, game_type)
         # Применяем кулдаун если нужно
-        return apply_cooldown_if_needed(tg_id, game_type)
+        return await apply_cooldown_if_needed(tg_id, game_type)
+
+
+async def show_no_balance(message, text: str = GAME_NOT_COUNTED_TEXT):
+    """Не хватило баланса на ставку — сообщение и возврат в казино"""
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text=BTN_BACK, callback_data="fox_casino"))
+    await edit_or_send_message(message, f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n{text}", builder.as_markup())
+
+
+async def reserve_or_refuse(callback: CallbackQuery, session: AsyncSession, bet: int) -> bool:
+    """Списать ставку карточной игры при раздаче; не хватает — сообщение, False"""
+    from .casino import reserve_bet
+    
+    if await reserve_bet(session, callback.from_user.id, bet) is None:
+        await show_no_balance(callback.message, f"❌ Недостаточно средств для ставки <b>{bet} ₽</b>")
+        return False
+    return True
 
 
-@router.callback_query(F.data.startswith("fox_casino_game_"))
+@router.callback_query(F.data.startswith("fox_casino_game_"), flags=PLAYER_LOCK)
 async def handle_casino_game_select(callback: CallbackQuery, session: AsyncSession):
     """Выбор игры — показываем ставки"""
     await ensure_db()
@@ -1798,10 +1892,10 @@ async def handle_casino_game_select(callback: CallbackQuery, session: AsyncSessi
     from .casino import FIXED_BETS, get_or_create_casino_profile, get_current_jackpot, COOLDOWN_PHRASES
     import random
     
-    _casino_selected_game[tg_id] = game_type
+    await get_state_store().set(STATE_CASINO_GAME, tg_id, game_type)
     
     # Проверяем кулдаун для этой конкретной игры
-    can_play, seconds_left = check_game_cooldown(tg_id, game_type)
+    can_play, seconds_left = await check_game_cooldown(tg_id, game_type)
     
     game_names = {
         "dice": "🎲 Кости",
@@ -1841,10 +1935,10 @@ async def handle_casino_game_select(callback: CallbackQuery, session: AsyncSessi
     jackpot = await get_current_jackpot(session)
     
     # Проверяем серию проигрышей для "Последнего шанса"
-    lose_streak = get_lose_streak(tg_id, game_type)
+    lose_streak = await get_lose_streak(tg_id, game_type)
     last_chance_warning = ""
     
-    if should_show_last_chance(tg_id, game_type):
+    if await should_show_last_chance(tg_id, game_type):
         last_chance_warning = f"""
 ⚠️ <b>ПОСЛЕДНИЙ ШАНС!</b>
 У тебя <b>{lose_streak}</b> проигрыша подряд.
@@ -1877,7 +1971,7 @@ async def handle_casino_game_select(callback: CallbackQuery, session: AsyncSessi
         text += "\n<i>Недостаточно средств для игры</i>"
     
     # Если "Последний шанс" — добавляем кнопку остановиться
-    if should_show_last_chance(tg_id, game_type):
+    if await should_show_last_chance(tg_id, game_type):
         builder.row(InlineKeyboardButton(text="🛑 Остановиться", callback_data="fox_casino_exit"))
     
     builder.row(InlineKeyboardButton(text="⬅️ К играм", callback_data="fox_casino_enter"))
@@ -1886,7 +1980,7 @@ async def handle_casino_game_select(callback: CallbackQuery, session: AsyncSessi
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data.startswith("fox_casino_bet_"))
+@router.callback_query(F.data.startswith("fox_casino_bet_"), flags=PLAYER_LOCK)
 async def handle_casino_bet_select(callback: CallbackQuery, session: AsyncSession):
     """Выбор ставки — маршрутизация к выбранной игре"""
     import asyncio
@@ -1898,14 +1992,14 @@ async def handle_casino_bet_select(callback: CallbackQuery, session: AsyncSessio
     tg_id = callback.from_user.id
     
     # Определяем выбранную игру
-    game_type = _casino_selected_game.get(tg_id, "dice")
+    game_type = await get_state_store().get(STATE_CASINO_GAME, tg_id, "dice")
     logger.info(f"[Casino] ИГРА {game_type}! Ставка {bet}₽ от {tg_id}")
     await callback.answer()
     
     from .casino import can_play_bet
     
-    # Финальная проверка
-    can_play, error = await can_play_bet(session, tg_id, bet)
+    # Финальная проверка (все игры списывают ставку атомарно с проверкой баланса — без лишнего SELECT)
+    can_play, error = await can_play_bet(session, tg_id, bet, check_balance=False)
     if not can_play:
         await callback.answer(f"❌ {error}", show_alert=True)
         return
@@ -1925,7 +2019,6 @@ async def handle_casino_bet_select(callback: CallbackQuery, session: AsyncSessio
 
 async def play_dice_game(callback: CallbackQuery, session: AsyncSession, bet: int):
     """🎲 Игра в кости — оригинальная игра казино"""
-    import asyncio
     import random
     
     tg_id = callback.from_user.id
@@ -1941,65 +2034,29 @@ async def play_dice_game(callback: CallbackQuery, session: AsyncSession, bet: in
     except Exception:
         pass
     
-    # === ДРАМАТИЧНАЯ АНИМАЦИЯ ===
     msg = await callback.message.answer(
         f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
         f"🎲 <b>Кости</b>\n"
         f"💰 Ставка: <b>{bet} ₽</b>\n\n"
         f"<i>Лиса берёт кость...</i>"
     )
-    await asyncio.sleep(1.5)
-    
-    await msg.edit_text(
-        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-        f"🎲 <b>Кости</b>\n"
-        f"💰 Ставка: <b>{bet} ₽</b>\n\n"
-        f"<i>Лиса бросает!</i>\n\n"
-        f"⚀ ⚁ ⚂ ⚃ ⚄ ⚅"
-    )
-    await asyncio.sleep(1.2)
-    
-    dice_faces = ["⚀", "⚁", "⚂", "⚃", "⚄", "⚅"]
-    for i in range(5):
-        random.shuffle(dice_faces)
-        try:
-            dots = "." * ((i % 3) + 1)
-            await msg.edit_text(
-                f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-                f"🎲 <b>Кости</b>\n"
-                f"💰 Ставка: <b>{bet} ₽</b>\n\n"
-                f"Кость катится{dots}\n\n"
-                f"   [ {dice_faces[0]} ]"
-            )
-        except Exception:
-            pass
-        await asyncio.sleep(0.5)
-    
-    await msg.edit_text(
-        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-        f"🎲 <b>Кости</b>\n"
-        f"💰 Ставка: <b>{bet} ₽</b>\n\n"
-        f"<i>Кость останавливается...</i>\n\n"
-        f"   [ ❓ ]"
-    )
-    await asyncio.sleep(1.5)
-    
-    await msg.edit_text(
-        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-        f"🎲 <b>Кости</b>\n"
-        f"💰 Ставка: <b>{bet} ₽</b>\n\n"
-        f"🦊 <i>...</i>"
-    )
-    await asyncio.sleep(1.0)
     
     # === ИГРА! ===
     result, result_type = await play_casino_phase1(session, tg_id, bet)
     
     builder = InlineKeyboardBuilder()
     
+    if result_type == "no_balance":
+        builder.row(InlineKeyboardButton(text=BTN_BACK, callback_data="fox_casino"))
+        await msg.edit_text(
+            f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n❌ Недостаточно средств для ставки <b>{bet} ₽</b>",
+            reply_markup=builder.as_markup(),
+        )
+        return
+    
     if result_type == "phase1":
         # Промежуточный результат — можно рискнуть
-        _casino_pending_bets[tg_id] = (bet, result.current_value)
+        await get_state_store().set(STATE_CASINO_BET, tg_id, [bet, result.current_value])
         
         text = PHASE1_WIN_X15.format(
             bet=bet,
@@ -2018,8 +2075,8 @@ async def play_dice_game(callback: CallbackQuery, session: AsyncSession, bet: in
         
         # Обрабатываем кулдаун через новую систему
         if result.outcome in ("lose", "near_miss"):
-            increment_lose_streak(tg_id, "dice")
-            cooldown_applied, cooldown_seconds = apply_cooldown_if_needed(tg_id, "dice")
+            await increment_lose_streak(tg_id, "dice")
+            cooldown_applied, cooldown_seconds = await apply_cooldown_if_needed(tg_id, "dice")
             
             if cooldown_applied:
                 minutes = cooldown_seconds // 60
@@ -2028,7 +2085,7 @@ async def play_dice_game(callback: CallbackQuery, session: AsyncSession, bet: in
                 else:
                     text += f"\n\n⏳ <b>Кулдаун: {cooldown_seconds} сек</b>"
         else:
-            clear_game_cooldown(tg_id, "dice")
+            await clear_game_cooldown(tg_id, "dice")
         
         # Показать серию
         profile = await get_or_create_casino_profile(session, tg_id)
@@ -2039,44 +2096,75 @@ async def play_dice_game(callback: CallbackQuery, session: AsyncSession, bet: in
         builder.row(InlineKeyboardButton(text="🎲 Ещё раз", callback_data="fox_casino_again"))
         builder.row(InlineKeyboardButton(text="🚪 Выйти", callback_data="fox_casino_exit"))
     
-    await msg.edit_text(text, reply_markup=builder.as_markup())
+    # === ДРАМАТИЧНАЯ АНИМАЦИЯ === (исход уже записан)
+    frames = [
+        Frame(
+            f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+            f"🎲 <b>Кости</b>\n"
+            f"💰 Ставка: <b>{bet} ₽</b>\n\n"
+            f"<i>Лиса бросает!</i>\n\n"
+            f"⚀ ⚁ ⚂ ⚃ ⚄ ⚅",
+            1.2,
+        ),
+    ]
+    
+    dice_faces = ["⚀", "⚁", "⚂", "⚃", "⚄", "⚅"]
+    for i in range(5):
+        random.shuffle(dice_faces)
+        dots = "." * ((i % 3) + 1)
+        frames.append(Frame(
+            f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+            f"🎲 <b>Кости</b>\n"
+            f"💰 Ставка: <b>{bet} ₽</b>\n\n"
+            f"Кость катится{dots}\n\n"
+            f"   [ {dice_faces[0]} ]",
+            0.5,
+        ))
+    
+    frames.append(Frame(
+        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+        f"🎲 <b>Кости</b>\n"
+        f"💰 Ставка: <b>{bet} ₽</b>\n\n"
+        f"<i>Кость останавливается...</i>\n\n"
+        f"   [ ❓ ]",
+        1.5,
+    ))
+    frames.append(Frame(
+        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+        f"🎲 <b>Кости</b>\n"
+        f"💰 Ставка: <b>{bet} ₽</b>\n\n"
+        f"🦊 <i>...</i>",
+        1.0,
+    ))
+    frames.append(Frame(text, reply_markup=builder.as_markup()))
+    
+    schedule_frames(msg, frames, delay=1.5)
 
 
 # ==================== БЛЭКДЖЭК ====================
-_blackjack_hands: dict[int, dict] = {}  # {tg_id: {"player": [...], "dealer": [...], "bet": int}}
+# Раздача хранится в STATE_BLACKJACK: BlackjackHand.to_state()
 
 async def play_blackjack_game(callback: CallbackQuery, session: AsyncSession, bet: int):
     """🃏 Блэкджэк — игрок против Лисы"""
-    import asyncio
-    import random
-    
     tg_id = callback.from_user.id
     
     from .casino import record_casino_game, get_or_create_casino_profile, get_streak_text
+    from .cards import BlackjackHand, CARD_LABELS, format_hand
     from database.users import update_balance
     
+    if not await reserve_or_refuse(callback, session, bet):
+        return
+    
     try:
         await callback.message.delete()
     except Exception:
         pass
     
-    # Создаём колоду
-    suits = ["♠️", "♥️", "♦️", "♣️"]
-    values = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-    deck = [(v, s) for v in values for s in suits]
-    random.shuffle(deck)
-    
-    # Раздаём карты
-    player_hand = [deck.pop(), deck.pop()]
-    dealer_hand = [deck.pop(), deck.pop()]
+    # Создаём колоду и раздаём карты (ставка уже списана)
+    hand = BlackjackHand.deal(bet, reserved=True)
     
     # Сохраняем состояние
-    _blackjack_hands[tg_id] = {
-        "player": player_hand,
-        "dealer": dealer_hand,
-        "deck": deck,
-        "bet": bet
-    }
+    await get_state_store().set(STATE_BLACKJACK, tg_id, hand.to_state())
     
     # Анимация раздачи
     msg = await callback.message.answer(
@@ -2085,27 +2173,18 @@ async def play_blackjack_game(callback: CallbackQuery, session: AsyncSession, be
         f"💰 Ставка: <b>{bet} ₽</b>\n\n"
         f"<i>Лиса тасует колоду...</i>"
     )
-    await asyncio.sleep(1.5)
-    
-    await msg.edit_text(
-        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-        f"🃏 <b>Блэкджэк</b>\n"
-        f"💰 Ставка: <b>{bet} ₽</b>\n\n"
-        f"<i>Лиса раздаёт карты...</i>"
-    )
-    await asyncio.sleep(1.2)
     
     # Показываем карты
-    player_total = blackjack_calculate(player_hand)
+    player_total = hand.player_points
     
     text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
 🃏 <b>Блэкджэк</b>
 💰 Ставка: <b>{bet} ₽</b>
 
-🦊 Лиса: [ {dealer_hand[0][0]}{dealer_hand[0][1]} ] [ 🂠 ]
+🦊 Лиса: [ {CARD_LABELS[hand.dealer[0]]} ] [ 🂠 ]
 
-👤 Ты: {blackjack_format_hand(player_hand)}
+👤 Ты: {format_hand(hand.player)}
 📊 Очки: <b>{player_total}</b>
 """
     
@@ -2114,20 +2193,25 @@ async def play_blackjack_game(callback: CallbackQuery, session: AsyncSession, be
     # Проверяем натуральный блэкджэк
     if player_total == 21:
         # Блэкджэк! Сразу показываем результат
-        dealer_total = blackjack_calculate(dealer_hand)
+        dealer_total = hand.dealer_points
         
         if dealer_total == 21:
             # Ничья
             text += "\n🤝 <b>Ничья! У Лисы тоже блэкджэк!</b>"
-            text += f"\n\n🦊 Лиса: {blackjack_format_hand(dealer_hand)} ({dealer_total})"
+            text += f"\n\n🦊 Лиса: {format_hand(hand.dealer)} ({dealer_total})"
             # Ставка возвращается
+            from .casino import release_bet
+            await release_bet(session, tg_id, bet)
         else:
             # Игрок выиграл с блэкджэком (×2.2)
             payout = int(bet * 2.2)
-            await record_game_with_cooldown(session, tg_id, bet, True, 2.2, payout)
+            if await record_game_with_cooldown(session, tg_id, bet, True, 2.2, payout, reserved=True) is None:
+                await get_state_store().delete(STATE_BLACKJACK, tg_id)
+                await show_no_balance(msg)
+                return
             
             text += f"\n🎉 <b>БЛЭКДЖЭК! Ты получаешь {payout} ₽!</b>"
-            text += f"\n\n🦊 Лиса: {blackjack_format_hand(dealer_hand)} ({dealer_total})"
+            text += f"\n\n🦊 Лиса: {format_hand(hand.dealer)} ({dealer_total})"
             text += "\n\n<i>Лиса недовольна...</i>"
         
         profile = await get_or_create_casino_profile(session, tg_id)
@@ -2138,45 +2222,26 @@ async def play_blackjack_game(callback: CallbackQuery, session: AsyncSession, be
         builder.row(InlineKeyboardButton(text="🎲 Ещё раз", callback_data="fox_casino_again"))
         builder.row(InlineKeyboardButton(text="🚪 Выйти", callback_data="fox_casino_exit"))
         
-        if tg_id in _blackjack_hands:
-            del _blackjack_hands[tg_id]
+        await get_state_store().delete(STATE_BLACKJACK, tg_id)
     else:
         builder.row(
             InlineKeyboardButton(text="🃏 Ещё карту", callback_data="fox_bj_hit"),
             InlineKeyboardButton(text="✋ Хватит", callback_data="fox_bj_stand"),
         )
     
-    await msg.edit_text(text, reply_markup=builder.as_markup())
+    schedule_frames(msg, [
+        Frame(
+            f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+            f"🃏 <b>Блэкджэк</b>\n"
+            f"💰 Ставка: <b>{bet} ₽</b>\n\n"
+            f"<i>Лиса раздаёт карты...</i>",
+            1.2,
+        ),
+        Frame(text, reply_markup=builder.as_markup()),
+    ], delay=1.5)
 
 
-def blackjack_calculate(hand: list) -> int:
-    """Подсчёт очков в блэкджэке"""
-    total = 0
-    aces = 0
-    
-    for card, _ in hand:
-        if card in ["J", "Q", "K"]:
-            total += 10
-        elif card == "A":
-            total += 11
-            aces += 1
-        else:
-            total += int(card)
-    
-    # Пересчитываем тузы если перебор
-    while total > 21 and aces > 0:
-        total -= 10
-        aces -= 1
-    
-    return total
-
-
-def blackjack_format_hand(hand: list) -> str:
-    """Форматирование руки"""
-    return " ".join([f"[ {v}{s} ]" for v, s in hand])
-
-
-@router.callback_query(F.data == "fox_bj_hit")
+@router.callback_query(F.data == "fox_bj_hit", flags=PLAYER_LOCK)
 async def handle_blackjack_hit(callback: CallbackQuery, session: AsyncSession):
     """Взять ещё карту"""
     import asyncio
@@ -2186,37 +2251,48 @@ async def handle_blackjack_hit(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
     
     from .casino import record_casino_game, get_or_create_casino_profile, get_streak_text
+    from .cards import BlackjackHand, CARD_LABELS, format_hand
     from database.users import update_balance
     
-    if tg_id not in _blackjack_hands:
+    store = get_state_store()
+    item = await store.get_versioned(STATE_BLACKJACK, tg_id)
+    if item is None:
         await callback.answer("❌ Игра не найдена", show_alert=True)
         return
     
-    game = _blackjack_hands[tg_id]
-    bet = game["bet"]
+    state, version = item
+    hand = BlackjackHand.from_state(state)
+    bet = hand.bet
     
     # Берём карту
-    new_card = game["deck"].pop()
-    game["player"].append(new_card)
+    hand.hit()
+    
+    # Сохраняем, только если раздачу никто не изменил (двойной клик / другой воркер)
+    if not await store.compare_and_set(STATE_BLACKJACK, tg_id, hand.to_state(), version):
+        return
     
-    player_total = blackjack_calculate(game["player"])
+    player_total = hand.player_points
     
     text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
 🃏 <b>Блэкджэк</b>
 💰 Ставка: <b>{bet} ₽</b>
 
-🦊 Лиса: [ {game["dealer"][0][0]}{game["dealer"][0][1]} ] [ 🂠 ]
+🦊 Лиса: [ {CARD_LABELS[hand.dealer[0]]} ] [ 🂠 ]
 
-👤 Ты: {blackjack_format_hand(game["player"])}
+👤 Ты: {format_hand(hand.player)}
 📊 Очки: <b>{player_total}</b>
 """
     
     builder = InlineKeyboardBuilder()
     
     if player_total > 21:
-        # Перебор!
-        await record_game_with_cooldown(session, tg_id, bet, False, 0, 0)
+        # Перебор! Забираем раздачу — если её уже закрыл «Хватит», второй раз не считаем
+        if await store.pop(STATE_BLACKJACK, tg_id) is None:
+            return
+        if await record_game_with_cooldown(session, tg_id, bet, False, 0, 0, reserved=hand.reserved) is None:
+            await show_no_balance(callback.message)
+            return
         
         near_miss = ""
         if player_total == 22:
@@ -2232,8 +2308,6 @@ async def handle_blackjack_hit(callback: CallbackQuery, session: AsyncSession):
         
         builder.row(InlineKeyboardButton(text="🎲 Ещё раз", callback_data="fox_casino_again"))
         builder.row(InlineKeyboardButton(text="🚪 Выйти", callback_data="fox_casino_exit"))
-        
-        del _blackjack_hands[tg_id]
     elif player_total == 21:
         # 21! Автоматически стоп
         text += "\n\n✨ <b>21! Ждём Лису...</b>"
@@ -2247,51 +2321,44 @@ async def handle_blackjack_hit(callback: CallbackQuery, session: AsyncSession):
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data == "fox_bj_stand")
+@router.callback_query(F.data == "fox_bj_stand", flags=PLAYER_LOCK)
 async def handle_blackjack_stand(callback: CallbackQuery, session: AsyncSession):
     """Остановиться — ход Лисы"""
-    import asyncio
-    
     await ensure_db()
     tg_id = callback.from_user.id
     await callback.answer()
     
     from .casino import record_casino_game, get_or_create_casino_profile, get_streak_text
+    from .cards import BlackjackHand, DEALER_STANDS_ON, format_hand
     from database.users import update_balance
     
-    if tg_id not in _blackjack_hands:
+    # Забираем раздачу атомарно — повторный «Хватит» её уже не найдёт
+    state = await get_state_store().pop(STATE_BLACKJACK, tg_id)
+    if state is None:
         await callback.answer("❌ Игра не найдена", show_alert=True)
         return
     
-    game = _blackjack_hands[tg_id]
-    bet = game["bet"]
-    player_total = blackjack_calculate(game["player"])
-    
-    # Анимация хода Лисы
-    await callback.message.edit_text(
-        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-        f"🃏 <b>Блэкджэк</b>\n"
-        f"💰 Ставка: <b>{bet} ₽</b>\n\n"
-        f"🦊 <i>Лиса открывает карты...</i>"
-    )
-    await asyncio.sleep(1.5)
+    hand = BlackjackHand.from_state(state)
+    bet = hand.bet
+    player_total = hand.player_points
     
     # Лиса берёт карты до 17+
-    while blackjack_calculate(game["dealer"]) < 17:
-        game["dealer"].append(game["deck"].pop())
-        await asyncio.sleep(0.8)
+    dealer_draws = 0
+    while hand.dealer_points < DEALER_STANDS_ON:
+        hand.dealer_hit()
+        dealer_draws += 1
     
-    dealer_total = blackjack_calculate(game["dealer"])
+    dealer_total = hand.dealer_points
     
     text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
 🃏 <b>Блэкджэк</b>
 💰 Ставка: <b>{bet} ₽</b>
 
-🦊 Лиса: {blackjack_format_hand(game["dealer"])}
+🦊 Лиса: {format_hand(hand.dealer)}
 📊 Очки: <b>{dealer_total}</b>
 
-👤 Ты: {blackjack_format_hand(game["player"])}
+👤 Ты: {format_hand(hand.player)}
 📊 Очки: <b>{player_total}</b>
 
 """
@@ -2301,26 +2368,34 @@ async def handle_blackjack_stand(callback: CallbackQuery, session: AsyncSession)
     # Определяем победителя
     if dealer_total > 21:
         # Лиса перебрала (×1.9)
-        payout = int(bet * 1.9)
-        await record_game_with_cooldown(session, tg_id, bet, True, 1.9, payout)
+        won, multiplier, payout = True, 1.9, int(bet * 1.9)
+    elif dealer_total > player_total:
+        won, multiplier, payout = False, 0, 0
+    elif dealer_total < player_total:
+        won, multiplier, payout = True, 1.9, int(bet * 1.9)
+    else:
+        # Ничья — ставка возвращается (payout = bet)
+        won, multiplier, payout = True, 1.0, bet
+    
+    if await record_game_with_cooldown(session, tg_id, bet, won, multiplier, payout, reserved=hand.reserved) is None:
+        await show_no_balance(callback.message)
+        return
+    
+    if dealer_total > 21:
         text += f"💥 <b>Лиса перебрала! Ты получаешь {payout} ₽!</b>"
         text += "\n\n<i>Лиса раздражённо бросает карты.</i>"
     elif dealer_total > player_total:
         # Лиса выиграла
-        await record_game_with_cooldown(session, tg_id, bet, False, 0, 0)
         diff = dealer_total - player_total
         near_miss = f"\n\n<i>Всего {diff} очков разницы...</i>" if diff <= 2 else ""
         text += f"❌ <b>Лиса выиграла. Ты потерял {bet} ₽</b>{near_miss}"
         text += "\n\n🦊 <i>Лиса забирает своё.</i>"
     elif dealer_total < player_total:
         # Игрок выиграл (×1.9)
-        payout = int(bet * 1.9)
-        await record_game_with_cooldown(session, tg_id, bet, True, 1.9, payout)
         text += f"✅ <b>Ты выиграл {payout} ₽!</b>"
         text += "\n\n<i>Лиса молча пододвигает фишки.</i>"
     else:
-        # Ничья — возвращаем ставку (bet списывается и bet возвращается = 0)
-        await record_game_with_cooldown(session, tg_id, bet, True, 1.0, bet)
+        # Ничья — ставка возвращена
         text += "🤝 <b>Ничья! Ставка возвращена.</b>"
         text += "\n\n<i>Лиса молча смотрит.</i>"
     
@@ -2332,21 +2407,33 @@ async def handle_blackjack_stand(callback: CallbackQuery, session: AsyncSession)
     builder.row(InlineKeyboardButton(text="🎲 Ещё раз", callback_data="fox_casino_again"))
     builder.row(InlineKeyboardButton(text="🚪 Выйти", callback_data="fox_casino_exit"))
     
-    del _blackjack_hands[tg_id]
-    
-    await edit_or_send_message(callback.message, text, builder.as_markup())
+    # Анимация хода Лисы (исход уже записан)
+    schedule_frames(callback.message, [
+        Frame(
+            f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+            f"🃏 <b>Блэкджэк</b>\n"
+            f"💰 Ставка: <b>{bet} ₽</b>\n\n"
+            f"🦊 <i>Лиса открывает карты...</i>",
+            1.5 + 0.8 * dealer_draws,
+        ),
+        Frame(text, reply_markup=builder.as_markup()),
+    ])
 
 
 # ==================== ВЫШЕ/НИЖЕ ====================
-_hilo_games: dict[int, dict] = {}  # {tg_id: {"number": int, "bet": int, "multiplier": float, "round": int}}
+# Игра хранится в STATE_HILO: HiloGame.to_state()
 
 async def play_hilo_game(callback: CallbackQuery, session: AsyncSession, bet: int):
     """🎯 Выше/Ниже — угадай число"""
-    import asyncio
     import random
     
+    from .cards import HiloGame
+    
     tg_id = callback.from_user.id
     
+    if not await reserve_or_refuse(callback, session, bet):
+        return
+    
     try:
         await callback.message.delete()
     except Exception:
@@ -2355,13 +2442,7 @@ async def play_hilo_game(callback: CallbackQuery, session: AsyncSession, bet: in
     # Загадываем число
     number = random.randint(1, 10)
     
-    _hilo_games[tg_id] = {
-        "number": number,
-        "bet": bet,
-        "multiplier": 1.0,
-        "round": 1,
-        "current_win": bet
-    }
+    await get_state_store().set(STATE_HILO, tg_id, HiloGame(bet, number, reserved=True).to_state())
     
     msg = await callback.message.answer(
         f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
@@ -2369,7 +2450,6 @@ async def play_hilo_game(callback: CallbackQuery, session: AsyncSession, bet: in
         f"💰 Ставка: <b>{bet} ₽</b>\n\n"
         f"<i>Лиса загадывает число...</i>"
     )
-    await asyncio.sleep(1.5)
     
     # Показываем подсказку
     hint = "1️⃣2️⃣3️⃣4️⃣5️⃣6️⃣7️⃣8️⃣9️⃣🔟"
@@ -2393,10 +2473,10 @@ async def play_hilo_game(callback: CallbackQuery, session: AsyncSession, bet: in
     )
     builder.row(InlineKeyboardButton(text="5️⃣ Ровно 5", callback_data="fox_hilo_five"))
     
-    await msg.edit_text(text, reply_markup=builder.as_markup())
+    schedule_frames(msg, [Frame(text, reply_markup=builder.as_markup())], delay=1.5)
 
 
-@router.callback_query(F.data.in_({"fox_hilo_high", "fox_hilo_low", "fox_hilo_five"}))
+@router.callback_query(F.data.in_({"fox_hilo_high", "fox_hilo_low", "fox_hilo_five"}), flags=PLAYER_LOCK)
 async def handle_hilo_guess(callback: CallbackQuery, session: AsyncSession):
     """Обработка догадки в Выше/Ниже"""
     import asyncio
@@ -2407,16 +2487,20 @@ async def handle_hilo_guess(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
     
     from .casino import record_casino_game, get_or_create_casino_profile, get_streak_text
+    from .cards import HiloGame
     from database.users import update_balance
     
-    if tg_id not in _hilo_games:
+    store = get_state_store()
+    item = await store.get_versioned(STATE_HILO, tg_id)
+    if item is None:
         await callback.answer("❌ Игра не найдена", show_alert=True)
         return
     
-    game = _hilo_games[tg_id]
+    state, version = item
+    game = HiloGame.from_state(state)
     guess = callback.data.replace("fox_hilo_", "")
-    number = game["number"]
-    bet = game["bet"]
+    number = game.number
+    bet = game.bet
     
     # Проверяем догадку
     correct = False
@@ -2426,15 +2510,18 @@ async def handle_hilo_guess(callback: CallbackQuery, session: AsyncSession):
         correct = True
     elif guess == "five" and number == 5:
         correct = True
-        game["multiplier"] *= 3  # Угадать 5 = x3
+        game.multiplier *= 3  # Угадать 5 = x3
     
     if correct and guess != "five":
-        game["multiplier"] *= 1.5
+        game.multiplier *= 1.5
     
     if correct:
-        game["round"] += 1
-        game["current_win"] = int(bet * game["multiplier"])
-        game["number"] = random.randint(1, 10)  # Новое число
+        game.round += 1
+        game.number = random.randint(1, 10)  # Новое число
+        
+        # Раунд засчитывается один раз — параллельный клик не пройдёт по версии
+        if not await store.compare_and_set(STATE_HILO, tg_id, game.to_state(), version):
+            return
         
         text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
@@ -2443,9 +2530,9 @@ async def handle_hilo_guess(callback: CallbackQuery, session: AsyncSession):
 
 ✅ <b>Верно! Число было {number}</b>
 
-🔥 Раунд: <b>{game["round"]}</b>
-💰 Текущий выигрыш: <b>{game["current_win"]} ₽</b>
-📈 Множитель: <b>×{game["multiplier"]:.1f}</b>
+🔥 Раунд: <b>{game.round}</b>
+💰 Текущий выигрыш: <b>{game.current_win} ₽</b>
+📈 Множитель: <b>×{game.multiplier:.1f}</b>
 
 ❓ <b>Следующее число выше или ниже 5?</b>
 
@@ -2458,11 +2545,15 @@ async def handle_hilo_guess(callback: CallbackQuery, session: AsyncSession):
             InlineKeyboardButton(text="⬇️ Ниже 5", callback_data="fox_hilo_low"),
         )
         builder.row(InlineKeyboardButton(text="5️⃣ Ровно 5", callback_data="fox_hilo_five"))
-        builder.row(InlineKeyboardButton(text=f"💰 Забрать {game['current_win']} ₽", callback_data="fox_hilo_take"))
+        builder.row(InlineKeyboardButton(text=f"💰 Забрать {game.current_win} ₽", callback_data="fox_hilo_take"))
         
     else:
-        # Проигрыш
-        await record_game_with_cooldown(session, tg_id, bet, False, 0, 0)
+        # Проигрыш — забираем игру (если её уже забрал «Забрать», не считаем)
+        if await store.pop(STATE_HILO, tg_id) is None:
+            return
+        if await record_game_with_cooldown(session, tg_id, bet, False, 0, 0, reserved=game.reserved) is None:
+            await show_no_balance(callback.message)
+            return
         
         near_miss = ""
         if (guess == "high" and number == 5) or (guess == "low" and number == 5):
@@ -2490,13 +2581,11 @@ async def handle_hilo_guess(callback: CallbackQuery, session: AsyncSession):
         builder = InlineKeyboardBuilder()
         builder.row(InlineKeyboardButton(text="🎲 Ещё раз", callback_data="fox_casino_again"))
         builder.row(InlineKeyboardButton(text="🚪 Выйти", callback_data="fox_casino_exit"))
-        
-        del _hilo_games[tg_id]
     
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data == "fox_hilo_take")
+@router.callback_query(F.data == "fox_hilo_take", flags=PLAYER_LOCK)
 async def handle_hilo_take(callback: CallbackQuery, session: AsyncSession):
     """Забрать выигрыш в Выше/Ниже"""
     await ensure_db()
@@ -2504,17 +2593,22 @@ async def handle_hilo_take(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
     
     from .casino import record_casino_game, get_or_create_casino_profile, get_streak_text
+    from .cards import HiloGame
     from database.users import update_balance
     
-    if tg_id not in _hilo_games:
+    # Забираем игру атомарно — выигрыш выплачивается один раз
+    state = await get_state_store().pop(STATE_HILO, tg_id)
+    if state is None:
         await callback.answer("❌ Игра не найдена", show_alert=True)
         return
     
-    game = _hilo_games[tg_id]
-    payout = game["current_win"]
-    bet = game["bet"]
+    game = HiloGame.from_state(state)
+    payout = game.current_win
+    bet = game.bet
     
-    await record_game_with_cooldown(session, tg_id, bet, True, game["multiplier"], payout)
+    if await record_game_with_cooldown(session, tg_id, bet, True, game.multiplier, payout, reserved=game.reserved) is None:
+        await show_no_balance(callback.message)
+        return
     
     text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
@@ -2522,8 +2616,8 @@ async def handle_hilo_take(callback: CallbackQuery, session: AsyncSession):
 
 ✅ <b>Ты забрал {payout} ₽!</b>
 
-📊 Раундов пройдено: <b>{game["round"] - 1}</b>
-📈 Итоговый множитель: <b>×{game["multiplier"]:.1f}</b>
+📊 Раундов пройдено: <b>{game.round - 1}</b>
+📈 Итоговый множитель: <b>×{game.multiplier:.1f}</b>
 
 🦊 <i>Разумное решение... или трусость?</i>
 """
@@ -2537,15 +2631,12 @@ async def handle_hilo_take(callback: CallbackQuery, session: AsyncSession):
     builder.row(InlineKeyboardButton(text="🎲 Ещё раз", callback_data="fox_casino_again"))
     builder.row(InlineKeyboardButton(text="🚪 Выйти", callback_data="fox_casino_exit"))
     
-    del _hilo_games[tg_id]
-    
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
 # ==================== ТРИ КАРТЫ ====================
 async def play_cards_game(callback: CallbackQuery, session: AsyncSession, bet: int):
     """💎 Три карты — найди туза"""
-    import asyncio
     import random
     
     tg_id = callback.from_user.id
@@ -2553,6 +2644,9 @@ async def play_cards_game(callback: CallbackQuery, session: AsyncSession, bet: i
     from .casino import record_casino_game, get_or_create_casino_profile, get_streak_text
     from database.users import update_balance
     
+    if not await reserve_or_refuse(callback, session, bet):
+        return
+    
     try:
         await callback.message.delete()
     except Exception:
@@ -2564,13 +2658,12 @@ async def play_cards_game(callback: CallbackQuery, session: AsyncSession, bet: i
         f"💰 Ставка: <b>{bet} ₽</b>\n\n"
         f"<i>Лиса раскладывает три карты...</i>"
     )
-    await asyncio.sleep(1.5)
     
     # Позиция туза (0, 1, или 2)
     ace_pos = random.randint(0, 2)
     
     # Сохраняем состояние для этого tg_id
-    _cards_games[tg_id] = {"ace_pos": ace_pos, "bet": bet}
+    await get_state_store().set(STATE_CARDS, tg_id, {"ace_pos": ace_pos, "bet": bet, "reserved": True})
     
     text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
@@ -2592,18 +2685,12 @@ async def play_cards_game(callback: CallbackQuery, session: AsyncSession, bet: i
         InlineKeyboardButton(text="3️⃣", callback_data="fox_cards_2"),
     )
     
-    await msg.edit_text(text, reply_markup=builder.as_markup())
+    schedule_frames(msg, [Frame(text, reply_markup=builder.as_markup())], delay=1.5)
 
 
-_cards_games: dict[int, dict] = {}
-
-
-@router.callback_query(F.data.startswith("fox_cards_"))
+@router.callback_query(F.data.startswith("fox_cards_"), flags=PLAYER_LOCK)
 async def handle_cards_pick(callback: CallbackQuery, session: AsyncSession):
     """Выбор карты"""
-    import asyncio
-    import random
-    
     await ensure_db()
     tg_id = callback.from_user.id
     await callback.answer()
@@ -2611,24 +2698,16 @@ async def handle_cards_pick(callback: CallbackQuery, session: AsyncSession):
     from .casino import record_casino_game, get_or_create_casino_profile, get_streak_text
     from database.users import update_balance
     
-    if tg_id not in _cards_games:
+    # Забираем игру атомарно — повторный выбор карты её уже не найдёт
+    game = await get_state_store().pop(STATE_CARDS, tg_id)
+    if game is None:
         await callback.answer("❌ Игра не найдена", show_alert=True)
         return
     
-    game = _cards_games[tg_id]
     picked = int(callback.data.replace("fox_cards_", ""))
     ace_pos = game["ace_pos"]
     bet = game["bet"]
-    
-    # Анимация
-    await callback.message.edit_text(
-        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-        f"💎 <b>Три карты</b>\n"
-        f"💰 Ставка: <b>{bet} ₽</b>\n\n"
-        f"<i>Ты выбрал карту {picked + 1}...</i>\n\n"
-        f"🦊 <i>Лиса переворачивает...</i>"
-    )
-    await asyncio.sleep(2.0)
+    reserved = game.get("reserved", False)
     
     # Показываем результат
     cards = ["❌", "❌", "❌"]
@@ -2637,11 +2716,14 @@ async def handle_cards_pick(callback: CallbackQuery, session: AsyncSession):
     
     builder = InlineKeyboardBuilder()
     
-    if picked == ace_pos:
+    won = picked == ace_pos
+    payout = bet * 2 if won else 0
+    if await record_game_with_cooldown(session, tg_id, bet, won, 2.0 if won else 0, payout, reserved=reserved) is None:
+        await show_no_balance(callback.message)
+        return
+    
+    if won:
         # Выигрыш!
-        payout = bet * 2
-        await record_game_with_cooldown(session, tg_id, bet, True, 2.0, payout)
-        
         text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
 💎 <b>Три карты</b>
@@ -2656,8 +2738,6 @@ async def handle_cards_pick(callback: CallbackQuery, session: AsyncSession):
 """
     else:
         # Проигрыш
-        await record_game_with_cooldown(session, tg_id, bet, False, 0, 0)
-        
         # Near miss - показываем что туз был рядом
         near_miss = ""
         if abs(picked - ace_pos) == 1:
@@ -2684,28 +2764,37 @@ async def handle_cards_pick(callback: CallbackQuery, session: AsyncSession):
     builder.row(InlineKeyboardButton(text="🎲 Ещё раз", callback_data="fox_casino_again"))
     builder.row(InlineKeyboardButton(text="🚪 Выйти", callback_data="fox_casino_exit"))
     
-    del _cards_games[tg_id]
-    
-    await edit_or_send_message(callback.message, text, builder.as_markup())
+    # Анимация (исход уже записан)
+    schedule_frames(callback.message, [
+        Frame(
+            f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+            f"💎 <b>Три карты</b>\n"
+            f"💰 Ставка: <b>{bet} ₽</b>\n\n"
+            f"<i>Ты выбрал карту {picked + 1}...</i>\n\n"
+            f"🦊 <i>Лиса переворачивает...</i>",
+            2.0,
+        ),
+        Frame(text, reply_markup=builder.as_markup()),
+    ])
 
 
 # ==================== КРАСНОЕ/ЧЁРНОЕ ====================
-_redblack_games: dict[int, dict] = {}
+# Игра хранится в STATE_REDBLACK: {"bet": int, "streak": int, "reserved": bool}
 
 async def play_redblack_game(callback: CallbackQuery, session: AsyncSession, bet: int):
     """🔴 Красное/Чёрное"""
-    import asyncio
-    import random
-    
     tg_id = callback.from_user.id
     
+    if not await reserve_or_refuse(callback, session, bet):
+        return
+    
     try:
         await callback.message.delete()
     except Exception:
         pass
     
-    # Сохраняем ставку
-    _redblack_games[tg_id] = {"bet": bet, "streak": 0}
+    # Сохраняем ставку (уже списана)
+    await get_state_store().set(STATE_REDBLACK, tg_id, {"bet": bet, "streak": 0, "reserved": True})
     
     msg = await callback.message.answer(
         f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
@@ -2713,7 +2802,6 @@ async def play_redblack_game(callback: CallbackQuery, session: AsyncSession, bet
         f"💰 Ставка: <b>{bet} ₽</b>\n\n"
         f"<i>Лиса крутит рулетку...</i>"
     )
-    await asyncio.sleep(1.2)
     
     text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
@@ -2732,13 +2820,12 @@ async def play_redblack_game(callback: CallbackQuery, session: AsyncSession, bet
         InlineKeyboardButton(text="⚫ Чёрное", callback_data="fox_rb_black"),
     )
     
-    await msg.edit_text(text, reply_markup=builder.as_markup())
+    schedule_frames(msg, [Frame(text, reply_markup=builder.as_markup())], delay=1.2)
 
 
-@router.callback_query(F.data.startswith("fox_rb_"))
+@router.callback_query(F.data.startswith("fox_rb_"), flags=PLAYER_LOCK)
 async def handle_redblack_pick(callback: CallbackQuery, session: AsyncSession):
     """Выбор цвета"""
-    import asyncio
     import random
     
     await ensure_db()
@@ -2748,13 +2835,15 @@ async def handle_redblack_pick(callback: CallbackQuery, session: AsyncSession):
     from .casino import record_casino_game, get_or_create_casino_profile, get_streak_text
     from database.users import update_balance
     
-    if tg_id not in _redblack_games:
+    # Забираем игру атомарно — повторный выбор цвета её уже не найдёт
+    game = await get_state_store().pop(STATE_REDBLACK, tg_id)
+    if game is None:
         await callback.answer("❌ Игра не найдена", show_alert=True)
         return
     
-    game = _redblack_games[tg_id]
     choice = callback.data.replace("fox_rb_", "")
     bet = game["bet"]
+    reserved = game.get("reserved", False)
     
     # Крутим рулетку (шанс не 50/50, а 48/52 в пользу казино)
     # Также учитываем "серии" — после 3 одинаковых цветов шанс смены выше
@@ -2768,43 +2857,20 @@ async def handle_redblack_pick(callback: CallbackQuery, session: AsyncSession):
     else:
         result = "zero"  # Зеро — всегда проигрыш
     
-    # Анимация
-    await callback.message.edit_text(
-        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-        f"🔴 <b>Красное/Чёрное</b>\n"
-        f"💰 Ставка: <b>{bet} ₽</b>\n\n"
-        f"🎰 <i>Рулетка крутится...</i>"
-    )
-    await asyncio.sleep(1.5)
-    
-    # Эмодзи для анимации
-    colors = ["🔴", "⚫", "🔴", "⚫", "🟢", "🔴", "⚫"]
-    random.shuffle(colors)
-    
-    for i in range(4):
-        try:
-            await callback.message.edit_text(
-                f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-                f"🔴 <b>Красное/Чёрное</b>\n"
-                f"💰 Ставка: <b>{bet} ₽</b>\n\n"
-                f"🎰 [ {colors[i % len(colors)]} ]"
-            )
-        except Exception:
-            pass
-        await asyncio.sleep(0.4)
-    
-    await asyncio.sleep(0.8)
-    
     # Результат
     result_emoji = "🔴" if result == "red" else ("⚫" if result == "black" else "🟢")
     result_name = "Красное" if result == "red" else ("Чёрное" if result == "black" else "Зеро")
     
     builder = InlineKeyboardBuilder()
     
+    won = result != "zero" and choice == result
+    payout = int(bet * 1.9) if won else 0
+    if await record_game_with_cooldown(session, tg_id, bet, won, 1.9 if won else 0, payout, reserved=reserved) is None:
+        await show_no_balance(callback.message)
+        return
+    
     if result == "zero":
         # Зеро — всегда проигрыш
-        await record_game_with_cooldown(session, tg_id, bet, False, 0, 0)
-        
         text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
 🔴 <b>Красное/Чёрное</b>
@@ -2817,11 +2883,8 @@ async def handle_redblack_pick(callback: CallbackQuery, session: AsyncSession):
 
 🦊 <i>Лиса улыбается: "Везёт не всем."</i>
 """
-    elif (choice == "red" and result == "red") or (choice == "black" and result == "black"):
+    elif won:
         # Выигрыш! (×1.9)
-        payout = int(bet * 1.9)
-        await record_game_with_cooldown(session, tg_id, bet, True, 1.9, payout)
-        
         text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
 🔴 <b>Красное/Чёрное</b>
@@ -2836,8 +2899,6 @@ async def handle_redblack_pick(callback: CallbackQuery, session: AsyncSession):
 """
     else:
         # Проигрыш
-        await record_game_with_cooldown(session, tg_id, bet, False, 0, 0)
-        
         text = f"""🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞
 
 🔴 <b>Красное/Чёрное</b>
@@ -2859,12 +2920,35 @@ async def handle_redblack_pick(callback: CallbackQuery, session: AsyncSession):
     builder.row(InlineKeyboardButton(text="🎲 Ещё раз", callback_data="fox_casino_again"))
     builder.row(InlineKeyboardButton(text="🚪 Выйти", callback_data="fox_casino_exit"))
     
-    del _redblack_games[tg_id]
+    # Анимация (исход уже записан)
+    frames = [
+        Frame(
+            f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+            f"🔴 <b>Красное/Чёрное</b>\n"
+            f"💰 Ставка: <b>{bet} ₽</b>\n\n"
+            f"🎰 <i>Рулетка крутится...</i>",
+            1.5,
+        ),
+    ]
     
-    await edit_or_send_message(callback.message, text, builder.as_markup())
+    # Эмодзи для анимации
+    colors = ["🔴", "⚫", "🔴", "⚫", "🟢", "🔴", "⚫"]
+    random.shuffle(colors)
+    
+    for i in range(4):
+        frames.append(Frame(
+            f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+            f"🔴 <b>Красное/Чёрное</b>\n"
+            f"💰 Ставка: <b>{bet} ₽</b>\n\n"
+            f"🎰 [ {colors[i % len(colors)]} ]",
+            0.4 if i < 3 else 1.2,
+        ))
+    
+    frames.append(Frame(text, reply_markup=builder.as_markup()))
+    schedule_frames(callback.message, frames)
 
 
-@router.callback_query(F.data == "fox_casino_take")
+@router.callback_query(F.data == "fox_casino_take", flags=PLAYER_LOCK)
 async def handle_casino_take(callback: CallbackQuery, session: AsyncSession):
     """Забрать ×1.5"""
     await ensure_db()
@@ -2874,16 +2958,17 @@ async def handle_casino_take(callback: CallbackQuery, session: AsyncSession):
     
     from .casino import play_casino_phase2_take, format_result_message, get_or_create_casino_profile, get_streak_text
     
-    if tg_id not in _casino_pending_bets:
+    pending = await get_state_store().pop(STATE_CASINO_BET, tg_id)
+    if pending is None:
         await callback.answer("❌ Ставка не найдена", show_alert=True)
         return
     
-    bet, current_value = _casino_pending_bets.pop(tg_id)
+    bet, current_value = pending
     
     result = await play_casino_phase2_take(session, tg_id, bet, current_value)
     
     # Устанавливаем кулдаун для игры "dice" (take = выигрыш)
-    clear_game_cooldown(tg_id, "dice")
+    await clear_game_cooldown(tg_id, "dice")
     
     text = format_result_message(result)
     
@@ -2900,10 +2985,9 @@ async def handle_casino_take(callback: CallbackQuery, session: AsyncSession):
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data == "fox_casino_risk")
+@router.callback_query(F.data == "fox_casino_risk", flags=PLAYER_LOCK)
 async def handle_casino_risk(callback: CallbackQuery, session: AsyncSession):
     """Рискнуть — вторая фаза"""
-    import asyncio
     import random
     
     await ensure_db()
@@ -2913,11 +2997,12 @@ async def handle_casino_risk(callback: CallbackQuery, session: AsyncSession):
     
     from .casino import play_casino_phase2_risk, format_result_message, get_or_create_casino_profile, get_streak_text
     
-    if tg_id not in _casino_pending_bets:
+    pending = await get_state_store().pop(STATE_CASINO_BET, tg_id)
+    if pending is None:
         await callback.answer("❌ Ставка не найдена", show_alert=True)
         return
     
-    bet, current_value = _casino_pending_bets.pop(tg_id)
+    bet, current_value = pending
     
     # Удаляем сообщение
     try:
@@ -2932,29 +3017,6 @@ async def handle_casino_risk(callback: CallbackQuery, session: AsyncSession):
         f"💰 На кону: <b>{int(current_value)} ₽</b>\n\n"
         f"🎲 <i>Лиса бросает снова...</i>"
     )
-    await asyncio.sleep(2.0)
-    
-    dice_faces = ["⚀", "⚁", "⚂", "⚃", "⚄", "⚅"]
-    for i in range(4):
-        random.shuffle(dice_faces)
-        try:
-            await msg.edit_text(
-                f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-                f"🔥 <b>РИСК!</b>\n\n"
-                f"💰 На кону: <b>{int(current_value)} ₽</b>\n\n"
-                f"🎲 [ {dice_faces[0]} ] {'.' * (i + 1)}"
-            )
-        except Exception:
-            pass
-        await asyncio.sleep(0.6)
-    
-    await msg.edit_text(
-        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
-        f"🔥 <b>РИСК!</b>\n\n"
-        f"💰 На кону: <b>{int(current_value)} ₽</b>\n\n"
-        f"🦊 <i>...</i>"
-    )
-    await asyncio.sleep(1.5)
     
     # Результат
     result = await play_casino_phase2_risk(session, tg_id, bet)
@@ -2963,8 +3025,8 @@ async def handle_casino_risk(callback: CallbackQuery, session: AsyncSession):
     text = format_result_message(result)
     
     if result.outcome == "lose":
-        increment_lose_streak(tg_id, "dice")
-        cooldown_applied, cooldown_seconds = apply_cooldown_if_needed(tg_id, "dice")
+        await increment_lose_streak(tg_id, "dice")
+        cooldown_applied, cooldown_seconds = await apply_cooldown_if_needed(tg_id, "dice")
         
         if cooldown_applied:
             minutes = cooldown_seconds // 60
@@ -2973,7 +3035,7 @@ async def handle_casino_risk(callback: CallbackQuery, session: AsyncSession):
             else:
                 text += f"\n\n⏳ <b>Кулдаун: {cooldown_seconds} сек</b>"
     else:
-        clear_game_cooldown(tg_id, "dice")
+        await clear_game_cooldown(tg_id, "dice")
     
     # Показать серию
     profile = await get_or_create_casino_profile(session, tg_id)
@@ -2985,10 +3047,32 @@ async def handle_casino_risk(callback: CallbackQuery, session: AsyncSession):
     builder.row(InlineKeyboardButton(text="🎲 Ещё раз", callback_data="fox_casino_again"))
     builder.row(InlineKeyboardButton(text="🚪 Выйти", callback_data="fox_casino_exit"))
     
-    await msg.edit_text(text, reply_markup=builder.as_markup())
+    # Анимация риска (исход уже записан)
+    frames = []
+    dice_faces = ["⚀", "⚁", "⚂", "⚃", "⚄", "⚅"]
+    for i in range(4):
+        random.shuffle(dice_faces)
+        frames.append(Frame(
+            f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+            f"🔥 <b>РИСК!</b>\n\n"
+            f"💰 На кону: <b>{int(current_value)} ₽</b>\n\n"
+            f"🎲 [ {dice_faces[0]} ] {'.' * (i + 1)}",
+            0.6,
+        ))
+    
+    frames.append(Frame(
+        f"🦊 <b>ЛИСЬЕ КАЗИНО</b> 🔞\n\n"
+        f"🔥 <b>РИСК!</b>\n\n"
+        f"💰 На кону: <b>{int(current_value)} ₽</b>\n\n"
+        f"🦊 <i>...</i>",
+        1.5,
+    ))
+    frames.append(Frame(text, reply_markup=builder.as_markup()))
+    
+    schedule_frames(msg, frames, delay=2.0)
 
 
-@router.callback_query(F.data == "fox_casino_again")
+@router.callback_query(F.data == "fox_casino_again", flags=PLAYER_LOCK)
 async def handle_casino_again(callback: CallbackQuery, session: AsyncSession):
     """Ещё раз — показываем ставки в том же сообщении"""
     await ensure_db()
@@ -3064,7 +3148,7 @@ async def handle_casino_again(callback: CallbackQuery, session: AsyncSession):
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data == "fox_casino_exit")
+@router.callback_query(F.data == "fox_casino_exit", flags=PLAYER_LOCK)
 async def handle_casino_exit(callback: CallbackQuery, session: AsyncSession):
     """Выход из казино — показ статистики сессии"""
     await ensure_db()
@@ -3148,7 +3232,7 @@ async def handle_casino_self_block(callback: CallbackQuery, session: AsyncSessio
     await edit_or_send_message(callback.message, text, builder.as_markup())
 
 
-@router.callback_query(F.data == "fox_casino_self_block_confirm")
+@router.callback_query(F.data == "fox_casino_self_block_confirm", flags=PLAYER_LOCK)
 async def handle_casino_self_block_confirm(callback: CallbackQuery, session: AsyncSession):
     """Подтверждённая самоблокировка"""
     await ensure_db()
@@ -3195,7 +3279,7 @@ async def handle_calendar(callback: CallbackQuery, session: AsyncSession):
     await callback.answer()
 
 
-@router.callback_query(F.data == "fox_calendar_claim")
+@router.callback_query(F.data == "fox_calendar_claim", flags=PLAYER_LOCK)
 async def handle_calendar_claim(callback: CallbackQuery, session: AsyncSession):
     """Забрать награду из календаря"""
     await ensure_db()
@@ -3279,10 +3363,12 @@ async def handle_leaderboard(callback: CallbackQuery, session: AsyncSession):
     await ensure_db()
     logger.info(f"[Gamification] fox_leaderboard от {callback.from_user.id}")
     
-    from .leaderboard import get_top_winners_week, format_leaderboard
+    from .leaderboard import get_top_winners_week, get_player_rank, format_leaderboard, format_player_rank
+    from .ranking import BOARD_WINS_WEEK
     
     top = await get_top_winners_week(session, limit=10)
     text = format_leaderboard(top, "wins", "🏆", "📊 <b>Топ-10 за неделю</b>")
+    text += format_player_rank(await get_player_rank(session, BOARD_WINS_WEEK, callback.from_user.id), "🏆")
     
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -3303,10 +3389,12 @@ async def handle_leaderboard(callback: CallbackQuery, session: AsyncSession):
 async def handle_lb_week(callback: CallbackQuery, session: AsyncSession):
     """Топ за неделю"""
     await ensure_db()
-    from .leaderboard import get_top_winners_week, format_leaderboard
+    from .leaderboard import get_top_winners_week, get_player_rank, format_leaderboard, format_player_rank
+    from .ranking import BOARD_WINS_WEEK
     
     top = await get_top_winners_week(session, limit=10)
     text = format_leaderboard(top, "wins", "🏆", "📊 <b>Топ-10 выигрышей за неделю</b>")
+    text += format_player_rank(await get_player_rank(session, BOARD_WINS_WEEK, callback.from_user.id), "🏆")
     
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -3351,10 +3439,12 @@ async def handle_lb_month(callback: CallbackQuery, session: AsyncSession):
 async def handle_lb_streak(callback: CallbackQuery, session: AsyncSession):
     """Топ по серии входов"""
     await ensure_db()
-    from .leaderboard import get_top_streak, format_leaderboard
+    from .leaderboard import get_top_streak, get_player_rank, format_leaderboard, format_player_rank
+    from .ranking import BOARD_STREAK
     
     top = await get_top_streak(session, limit=10)
     text = format_leaderboard(top, "streak", "дней 🔥", "📊 <b>Топ-10 по серии входов</b>")
+    text += format_player_rank(await get_player_rank(session, BOARD_STREAK, callback.from_user.id), "дней 🔥")
     
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -3375,10 +3465,12 @@ async def handle_lb_streak(callback: CallbackQuery, session: AsyncSession):
 async def handle_lb_coins(callback: CallbackQuery, session: AsyncSession):
     """Топ по Лискоинам"""
     await ensure_db()
-    from .leaderboard import get_top_coins, format_leaderboard
+    from .leaderboard import get_top_coins, get_player_rank, format_leaderboard, format_player_rank
+    from .ranking import BOARD_COINS
     
     top = await get_top_coins(session, limit=10)
     text = format_leaderboard(top, "coins", "🦊", "📊 <b>Топ-10 по Лискоинам</b>")
+    text += format_player_rank(await get_player_rank(session, BOARD_COINS, callback.from_user.id), "🦊")
     
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -3397,6 +3489,57 @@ async def handle_lb_coins(callback: CallbackQuery, session: AsyncSession):
 
 # ==================== АДМИНСКИЕ КОМАНДЫ ====================
 
+# Идущая рассылка (одна на бота)
+_notify_task = None
+
+
+def format_notify_progress(title: str, progress) -> str:
+    """Текст прогресса рассылки"""
+    header = f"✅ <b>{title}: готово!</b>" if progress.finished else f"📤 <b>{title}...</b>"
+    lines = [header, ""]
+    names = {"daily": "📬 Попытка восстановилась", "3d": "📬 3 дня неактивности", "7d": "📬 7 дней неактивности"}
+    for segment, sent in progress.sent.items():
+        lines.append(f"{names.get(segment, segment)}: {sent} чел.")
+    lines.append("")
+    lines.append(f"👥 Обработано: {progress.processed}")
+    if progress.blocked or progress.failed:
+        lines.append(f"🚫 Заблокировали бота: {progress.blocked}, ошибок: {progress.failed}")
+    if progress.flood_waits:
+        lines.append(f"⏳ Flood-wait: {progress.flood_waits}")
+    if progress.skipped:
+        lines.append(f"⏭ Уже разослано или идёт: {', '.join(progress.skipped)}")
+    lines.append(f"⚡ {progress.rate:.1f} сообщ./с")
+    return "\n".join(lines)
+
+
+async def _run_notify(message: Message, title: str, send) -> None:
+    """Рассылка в фоне со своей сессией; прогресс — правками одного сообщения"""
+    from database.db import async_session_maker
+    
+    status = await message.answer(f"📤 <b>{title}...</b>")
+    
+    async def report(progress):
+        await status.edit_text(format_notify_progress(title, progress))
+    
+    try:
+        async with async_session_maker() as session:
+            await send(message.bot, session, on_progress=report)
+    except Exception as e:
+        logger.error(f"[Gamification] Ошибка рассылки: {e}")
+        await status.edit_text(f"❌ <b>{title}: ошибка</b>\n\n{e}")
+
+
+def _start_notify(message: Message, title: str, send) -> bool:
+    """Запустить рассылку, если другая не идёт"""
+    import asyncio
+    global _notify_task
+    
+    if _notify_task is not None and not _notify_task.done():
+        return False
+    _notify_task = asyncio.create_task(_run_notify(message, title, send))
+    return True
+
+
 @router.message(Command("fox_notify"))
 async def cmd_fox_notify(message: Message, session: AsyncSession):
     """Отправить уведомления неактивным игрокам (админ)"""
@@ -3407,17 +3550,10 @@ async def cmd_fox_notify(message: Message, session: AsyncSession):
     await ensure_db()
     logger.info(f"[Gamification] Запуск уведомлений админом {message.from_user.id}")
     
-    await message.answer("📤 Отправляю уведомления...")
-    
     from .notifications import send_inactive_notifications
     
-    result = await send_inactive_notifications(message.bot, session)
-    
-    await message.answer(
-        f"✅ <b>Уведомления отправлены!</b>\n\n"
-        f"📬 3 дня неактивности: {result['3d']} чел.\n"
-        f"📬 7 дней неактивности: {result['7d']} чел."
-    )
+    if not _start_notify(message, "Уведомления неактивным", send_inactive_notifications):
+        await message.answer("⏳ Рассылка уже идёт, дождись окончания.")
 
 
 @router.message(Command("fox_daily_notify"))
@@ -3430,13 +3566,10 @@ async def cmd_fox_daily_notify(message: Message, session: AsyncSession):
     await ensure_db()
     logger.info(f"[Gamification] Запуск daily уведомлений админом {message.from_user.id}")
     
-    await message.answer("📤 Отправляю ежедневные уведомления...")
-    
     from .notifications import send_daily_notifications
     
-    sent = await send_daily_notifications(message.bot, session)
-    
-    await message.answer(f"✅ <b>Отправлено:</b> {sent} уведомлений")
+    if not _start_notify(message, "Ежедневные уведомления", send_daily_notifications):
+        await message.answer("⏳ Рассылка уже идёт, дождись окончания.")
 
 
 # ==================== РЕФЕРАЛЫ ====================
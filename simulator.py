@@ -0,0 +1,354 @@
+"""
+Монте-Карло симулятор RTP: слоты, кости казино, сделка с лисой.
+Запустить: python -m modules.gamification.simulator [игра ...] [--rounds N] [--check]
+
+Вероятности и выплаты берутся из самих игр (paytable.py, casino.py, deal.py),
+поэтому после правки весов/шансов достаточно перезапустить симулятор.
+Раунды сэмплируются пачками через NumPy — 10^7 раундов за секунды.
+
+По каждой игре: RTP (доля ставки, вернувшаяся игроку), маржа, дисперсия
+выплаты, распределение исходов и частота джекпота.
+--check — выход с кодом 1, если RTP игры вышел из коридора RTP_BANDS
+(проверка для CI после правки таблиц).
+"""
+import argparse
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Добавляем корень проекта в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from modules.gamification.casino import (
+    BASE_CHANCE_JACKPOT,
+    GOLDEN_HOUR_BONUS,
+    JACKPOT_CONTRIBUTION,
+    JACKPOT_MIN_POOL,
+    MIN_BET,
+    NIGHT_MODE_X3_BONUS,
+    PHASE2_CHANCE_LOSE,
+    PHASE2_CHANCE_WIN_X2,
+    PHASE2_CHANCE_WIN_X3,
+    phase1_thresholds,
+)
+from modules.gamification.deal import MULTIPLIER_X3_CHANCE, calculate_dynamic_chance
+from modules.gamification.game import SPIN_COST_COINS
+from modules.gamification.jackpot import JACKPOT_START_POOL
+from modules.gamification import jackpot as slots_jackpot
+from modules.gamification.paytable import (
+    DOUBLE, NOTHING_CHANCE, NOTHING_PRIZE, SMALL_PRIZES, SYMBOLS, TOTAL_WEIGHT, TRIPLE, WEIGHTS, lookup_prize,
+)
+
+
+DEFAULT_ROUNDS = 10_000_000
+CHUNK_ROUNDS = 2_000_000  # Раундов за одну пачку (ограничивает память)
+DEAL_SERIES = 50  # Сделок подряд у одного игрока (шанс сделки зависит от серий)
+DEAL_STATS_WINDOW = 10  # Серии считаются по последним 10 сделкам (limit в get_deal_stats)
+
+# Коридоры RTP для --check при параметрах по умолчанию: (мин, макс), доля ставки
+RTP_BANDS = {
+    "slots": (0.53, 0.66),  # Только Лискоины (~41% + джекпот ~18%); дни VPN, рубли и бусты — отдельно
+    "casino": (0.75, 0.86),  # Всегда забирает ×1.5 (~64% + джекпот ~16% при ставке MIN_BET)
+    "casino_risk": (0.63, 0.74),  # Всегда рискует после ×1.5 (~52% + джекпот)
+    "deal": (0.92, 1.00),  # ~97%: откаты после серий побед почти уравнивают x2/x3
+}
+
+
+@dataclass
+class SimResult:
+    """Итоги симуляции одной игры (выплаты — в долях ставки)"""
+    game: str
+    labels: list[str]
+    payouts: np.ndarray  # Выплата по каждому исходу
+    counts: np.ndarray = None
+    rounds: int = 0
+    jackpot_hits: int = 0
+    jackpot_sum: float = 0.0  # Выплаты джекпота, не входящие в payouts
+    jackpot_sq_sum: float = 0.0
+    extras: dict[str, float] = field(default_factory=dict)  # Призы не в валюте ставки: тип -> сумма
+    elapsed: float = 0.0
+
+    def __post_init__(self):
+        if self.counts is None:
+            self.counts = np.zeros(len(self.labels), dtype=np.int64)
+
+    def tally(self, outcomes: np.ndarray) -> None:
+        """Учесть пачку исходов (индексы в labels)"""
+        self.counts += np.bincount(outcomes, minlength=len(self.labels))
+        self.rounds += len(outcomes)
+
+    @property
+    def rtp(self) -> float:
+        return (float(self.counts @ self.payouts) + self.jackpot_sum) / self.rounds
+
+    @property
+    def house_edge(self) -> float:
+        return 1.0 - self.rtp
+
+    @property
+    def variance(self) -> float:
+        """Дисперсия выплаты за раунд (в квадратах ставки)"""
+        second = (float(self.counts @ self.payouts ** 2) + self.jackpot_sq_sum) / self.rounds
+        return second - self.rtp ** 2
+
+    @property
+    def rtp_error(self) -> float:
+        """Стандартная ошибка оценки RTP"""
+        return (self.variance / self.rounds) ** 0.5
+
+
+def _chunks(rounds: int):
+    while rounds > 0:
+        size = min(rounds, CHUNK_ROUNDS)
+        yield size
+        rounds -= size
+
+
+# ==================== СЛОТЫ ====================
+
+def simulate_slots(
+    rng: np.random.Generator,
+    rounds: int,
+    boost_percent: int = 0,
+    jackpot_pool: int = JACKPOT_START_POOL,
+) -> SimResult:
+    """
+    Испытать удачу за SPIN_COST_COINS. RTP — только по Лискоинам,
+    остальные призы (дни VPN, рубли, бусты) — средним на спин в extras.
+    Джекпот разыгрывается на каждом спине (jackpot.try_win_jackpot); вклад спина
+    попадает в банк после коммита, то есть уже после розыгрыша.
+    """
+    symbols = len(SYMBOLS)
+    prizes = (
+        [lookup_prize(TRIPLE, symbol, boost_percent) for symbol in range(symbols)]
+        + [lookup_prize(DOUBLE, symbol, boost_percent) for symbol in range(symbols)]
+        + [NOTHING_PRIZE, *SMALL_PRIZES]
+    )
+    labels = (
+        [f"3×{symbol}" for symbol in SYMBOLS]
+        + [f"2×{symbol}" for symbol in SYMBOLS]
+        + ["ничего"]
+        + [f"разные, {prize.description}" for prize in SMALL_PRIZES]
+    )
+    payouts = np.array([prize.value if prize.prize_type == "coins" else 0 for prize in prizes]) / SPIN_COST_COINS
+    result = SimResult("slots", labels, payouts)
+
+    # Символ по номеру веса: WEIGHTS[i] ячеек подряд с символом i
+    reel_table = np.repeat(np.arange(symbols, dtype=np.uint8), WEIGHTS)
+    nothing = 2 * symbols
+    pool = jackpot_pool
+    for size in _chunks(rounds):
+        s1, s2, s3 = reel_table[rng.integers(0, TOTAL_WEIGHT, size=(3, size), dtype=np.uint16)]
+        s1, s2, s3 = s1.astype(np.intp), s2.astype(np.intp), s3.astype(np.intp)
+
+        # Все разные: ничего или случайный маленький приз
+        outcomes = np.where(
+            rng.random(size) < NOTHING_CHANCE, nothing, nothing + 1 + rng.integers(0, len(SMALL_PRIZES), size),
+        )
+        outcomes = np.where(s2 == s3, symbols + s2, outcomes)
+        outcomes = np.where((s1 == s2) | (s1 == s3), symbols + s1, outcomes)
+        outcomes = np.where((s1 == s2) & (s2 == s3), s1, outcomes)
+        result.tally(outcomes)
+
+        # Джекпот: редкие кандидаты, банк считаем по порядку
+        candidates = np.flatnonzero(rng.random(size) < slots_jackpot.JACKPOT_WIN_CHANCE)
+        last = 0
+        for position in candidates:
+            pool += slots_jackpot.JACKPOT_CONTRIBUTION * (position - last)
+            last = position
+            if pool >= slots_jackpot.JACKPOT_MIN_POOL:
+                result.jackpot_hits += 1
+                result.jackpot_sum += pool / SPIN_COST_COINS
+                result.jackpot_sq_sum += (pool / SPIN_COST_COINS) ** 2
+                pool = JACKPOT_START_POOL
+        pool += slots_jackpot.JACKPOT_CONTRIBUTION * (size - last)
+
+    for prize, count in zip(prizes, result.counts):
+        if prize.prize_type not in ("coins", "empty"):
+            result.extras[prize.prize_type] = result.extras.get(prize.prize_type, 0) + prize.value * int(count)
+    return result
+
+
+# ==================== КАЗИНО ====================
+
+def simulate_casino(
+    rng: np.random.Generator,
+    rounds: int,
+    bet: int = MIN_BET,
+    risk_share: float = 0.0,
+    golden_hour: bool = False,
+    night: bool = False,
+    jackpot_pool: int = JACKPOT_START_POOL,
+) -> SimResult:
+    """
+    Кости казино: первая фаза, после ×1.5 — забрать или рискнуть (доля risk_share).
+    Джекпот разыгрывается на проигрыше; банк копится вкладами с каждой ставки
+    и после выигрыша сбрасывается до JACKPOT_START_POOL.
+    """
+    threshold_lose, threshold_x15, threshold_x2, threshold_x3 = phase1_thresholds(
+        GOLDEN_HOUR_BONUS if golden_hour else 0.0,
+        NIGHT_MODE_X3_BONUS if night else 0.0,
+    )
+    # Выплаты как в play_casino_phase1 / phase2_take / phase2_risk
+    labels = ["проигрыш", "×1.5 забрал", "×2", "×3", "×5", "риск: проигрыш", "риск: ×2", "риск: ×3", "риск: ×5"]
+    payouts = np.array([0, int(bet * 1.5), bet * 2, bet * 3, bet * 5, 0, bet * 2, bet * 3, bet * 5]) / bet
+    game = "casino" if not risk_share else "casino_risk" if risk_share == 1 else f"casino_risk{risk_share:g}"
+    result = SimResult(game, labels, payouts)
+
+    contribution = max(1, int(bet * JACKPOT_CONTRIBUTION))
+    pool = jackpot_pool
+    phase1_edges = np.array([threshold_lose, threshold_x15, threshold_x2, threshold_x3])
+    phase2_edges = np.array([
+        PHASE2_CHANCE_LOSE,
+        PHASE2_CHANCE_LOSE + PHASE2_CHANCE_WIN_X2,
+        PHASE2_CHANCE_LOSE + PHASE2_CHANCE_WIN_X2 + PHASE2_CHANCE_WIN_X3,
+    ])
+
+    for size in _chunks(rounds):
+        # 0 проигрыш, 1 ×1.5, 2 ×2, 3 ×3, 4 ×5
+        outcomes = np.searchsorted(phase1_edges, rng.uniform(0, 100, size), side="right")
+
+        # Риск: randint(1, 100) против накопленных порогов второй фазы
+        risk = (outcomes == 1) & (rng.random(size) < risk_share)
+        phase2 = np.searchsorted(phase2_edges, rng.integers(1, 101, size), side="left")
+        outcomes = np.where(risk, 5 + phase2, outcomes)
+
+        # Джекпот: редкие кандидаты, банк считаем по порядку
+        candidates = np.flatnonzero((outcomes == 0) & (rng.uniform(0, 100, size) < BASE_CHANCE_JACKPOT))
+        last = 0
+        for position in candidates:
+            pool += contribution * (position + 1 - last)
+            last = position + 1
+            if pool >= JACKPOT_MIN_POOL:
+                result.jackpot_hits += 1
+                result.jackpot_sum += pool / bet
+                result.jackpot_sq_sum += (pool / bet) ** 2
+                pool = JACKPOT_START_POOL
+        pool += contribution * (size - last)
+
+        result.tally(outcomes)
+
+    return result
+
+
+# ==================== СДЕЛКА С ЛИСОЙ ====================
+
+def simulate_deal(rng: np.random.Generator, rounds: int, days_since: int = 0) -> SimResult:
+    """
+    Сделки подряд (по DEAL_SERIES на игрока): шанс зависит от серий побед/поражений,
+    как в calculate_dynamic_chance. days_since — дней между сделками.
+    """
+    window = DEAL_STATS_WINDOW + 1
+    # Шанс по (серия побед, серия поражений); первая сделка — отдельно
+    chances = np.array([
+        [
+            calculate_dynamic_chance({"win_streak": wins, "loss_streak": losses, "days_since_last": days_since})
+            for losses in range(window)
+        ]
+        for wins in range(window)
+    ])
+    first_chance = calculate_dynamic_chance({"win_streak": 0, "loss_streak": 0, "days_since_last": None})
+
+    result = SimResult("deal", ["проигрыш", "×2", "×3"], np.array([0.0, 2.0, 3.0]))
+    for size in _chunks(rounds):
+        players = -(-size // DEAL_SERIES)
+        wins = np.zeros(players, dtype=np.int64)
+        losses = np.zeros(players, dtype=np.int64)
+        outcomes = []
+
+        for deal in range(DEAL_SERIES):
+            chance = first_chance if deal == 0 else chances[wins, losses]
+            won = rng.integers(1, 101, players) <= chance
+            outcomes.append(np.where(won, 1 + (rng.random(players) < MULTIPLIER_X3_CHANCE), 0))
+            wins = np.where(won, np.minimum(wins + 1, DEAL_STATS_WINDOW), 0)
+            losses = np.where(won, 0, np.minimum(losses + 1, DEAL_STATS_WINDOW))
+
+        result.tally(np.concatenate(outcomes)[:size])
+
+    return result
+
+
+# ==================== ЗАПУСК ====================
+
+GAMES = {
+    "slots": lambda rng, rounds, args: simulate_slots(rng, rounds, args.boost, args.jackpot_pool),
+    "casino": lambda rng, rounds, args: simulate_casino(
+        rng, rounds, args.bet, 0.0, args.golden_hour, args.night, args.jackpot_pool,
+    ),
+    "casino_risk": lambda rng, rounds, args: simulate_casino(
+        rng, rounds, args.bet, 1.0, args.golden_hour, args.night, args.jackpot_pool,
+    ),
+    "deal": lambda rng, rounds, args: simulate_deal(rng, rounds, args.days_since),
+}
+
+
+def print_result(result: SimResult) -> None:
+    print(f"\n🎲 {result.game}: {result.rounds:,} раундов за {result.elapsed:.1f}с")
+    print(
+        f"   RTP {result.rtp:.4%} ± {result.rtp_error:.4%} | маржа {result.house_edge:.4%} | "
+        f"дисперсия {result.variance:.3f} ставки²"
+    )
+    if result.jackpot_hits:
+        print(
+            f"   🏆 джекпот: {result.jackpot_hits:,} раз, 1 из {result.rounds / result.jackpot_hits:,.0f} "
+            f"({result.jackpot_hits / result.rounds:.4%})"
+        )
+        if result.jackpot_sum:
+            print(f"      в RTP: {result.jackpot_sum / result.rounds:.4%}, средний банк ×{result.jackpot_sum / result.jackpot_hits:.1f} ставки")
+    for prize_type, total in result.extras.items():
+        print(f"   + {prize_type}: {total / result.rounds:.4f} за раунд")
+
+    print(f"   {'исход':<28} {'частота':>9} {'выплата':>9}")
+    for label, count, payout in zip(result.labels, result.counts, result.payouts):
+        print(f"   {label:<28} {count / result.rounds:>9.4%} {f'×{payout:.2f}':>9}")
+
+
+def check_band(result: SimResult) -> bool:
+    """RTP внутри коридора RTP_BANDS (игры без коридора проходят)"""
+    band = RTP_BANDS.get(result.game)
+    if band is None:
+        return True
+    low, high = band
+    ok = low <= result.rtp <= high
+    print(f"{'✅' if ok else '❌'} {result.game}: RTP {result.rtp:.2%}, коридор {low:.0%}–{high:.0%}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Монте-Карло симулятор RTP игр")
+    parser.add_argument("games", nargs="*", help=f"Игры: {', '.join(GAMES)} (по умолчанию все)")
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS, help="Раундов на игру")
+    parser.add_argument("--seed", type=int, default=None, help="Seed генератора")
+    parser.add_argument("--check", action="store_true", help="Выйти с кодом 1, если RTP вне коридора")
+    parser.add_argument("--boost", type=int, default=0, help="Слоты: активный буст удачи, %%")
+    parser.add_argument("--bet", type=int, default=MIN_BET, help="Казино: ставка")
+    parser.add_argument("--golden-hour", action="store_true", help="Казино: золотой час")
+    parser.add_argument("--night", action="store_true", help="Казино: ночной режим")
+    parser.add_argument("--jackpot-pool", type=int, default=JACKPOT_START_POOL, help="Слоты и казино: банк джекпота на старте")
+    parser.add_argument("--days-since", type=int, default=0, help="Сделка: дней между сделками")
+    args = parser.parse_args(argv)
+
+    unknown = [game for game in args.games if game not in GAMES]
+    if unknown:
+        parser.error(f"неизвестные игры: {', '.join(unknown)}")
+
+    rng = np.random.default_rng(args.seed)
+    all_ok = True
+    for game in args.games or GAMES:
+        started = time.perf_counter()
+        result = GAMES[game](rng, args.rounds, args)
+        result.elapsed = time.perf_counter() - started
+        print_result(result)
+        if args.check:
+            all_ok = check_band(result) and all_ok
+
+    if not all_ok:
+        print("❌ RTP вышел из коридора!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,567 @@
+"""
+Хранилище состояния игр: ставки в процессе, раздачи, кулдауны, выбор игры
+- GameStateStore — общий интерфейс: get / set / pop / delete / compare_and_set
+- MemoryGameStateStore — в памяти процесса (один воркер, теряется при рестарте)
+- DatabaseGameStateStore — таблица fox_game_state (общая для всех воркеров)
+- Значения хранятся как JSON, у каждого ключа свой TTL
+- Фоновая чистка протухших ключей; брошенные раздачи закрываются по ABANDONED_HAND_POLICY
+- Раздача, которую перезаписывает новая (set), тоже закрывается как брошенная — ставка не теряется
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from database.models import Base
+from logger import logger
+
+
+# Пространства имён состояния
+STATE_VPN_PURCHASE = "vpn_purchase"  # Выбранная покупка дней VPN
+STATE_CASINO_BET = "casino_bet"  # Ставка между фазами костей: [bet, current_value]
+STATE_CASINO_GAME = "casino_game"  # Выбранная игра казино
+STATE_COOLDOWN = "cooldown"  # Кулдаун и серия проигрышей по игре
+STATE_BLACKJACK = "blackjack"  # Раздача блэкджэка
+STATE_HILO = "hilo"  # Игра Выше/Ниже
+STATE_CARDS = "cards"  # Игра Три карты
+STATE_REDBLACK = "redblack"  # Игра Красное/Чёрное
+
+# TTL по умолчанию (секунд)
+STATE_TTL = {
+    STATE_VPN_PURCHASE: 10 * 60,
+    STATE_CASINO_BET: 60 * 60,
+    STATE_CASINO_GAME: 24 * 60 * 60,
+    STATE_COOLDOWN: 24 * 60 * 60,
+    STATE_BLACKJACK: 60 * 60,
+    STATE_HILO: 60 * 60,
+    STATE_CARDS: 60 * 60,
+    STATE_REDBLACK: 60 * 60,
+}
+STATE_DEFAULT_TTL = 60 * 60
+STATE_SWEEP_INTERVAL = 60  # Как часто вычищать протухшие ключи (секунд)
+STATE_MAX_ENTRIES = 50_000  # Лимит ключей в памяти (MemoryGameStateStore), сверх — вытесняются самые старые
+
+# Незавершённые раздачи: ставка сделана, игра не закрыта
+HAND_NAMESPACES = (STATE_CASINO_BET, STATE_BLACKJACK, STATE_HILO, STATE_CARDS, STATE_REDBLACK)
+
+# Что делать с брошенной раздачей (истёк TTL или вытеснена из памяти):
+# "forfeit" — ставка проиграна, "refund" — ставка возвращается
+ABANDONED_HAND_POLICY = "forfeit"
+
+# "memory" — один процесс; "db" — несколько воркеров, состояние переживает рестарт
+# ("db" берёт соединение из общего пула на каждую операцию — не больше STATE_DB_MAX_CONNECTIONS разом)
+GAME_STATE_BACKEND = "memory"
+STATE_DB_MAX_CONNECTIONS = 4  # Соединений пула, которые бэкенд "db" занимает одновременно
+
+
+class FoxGameState(Base):
+    """Состояние игр (бэкенд DatabaseGameStateStore)"""
+    __tablename__ = "fox_game_state"
+
+    namespace = Column(String(32), primary_key=True)
+    key = Column(String(64), primary_key=True)
+    value = Column(Text, nullable=False)  # JSON
+    version = Column(Integer, default=1, nullable=False)  # Растёт на каждой записи (для compare_and_set)
+    expires_at = Column(DateTime, nullable=True, index=True)  # None — бессрочно
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+def _ttl(namespace: str, ttl: float | None) -> float:
+    return ttl if ttl is not None else STATE_TTL.get(namespace, STATE_DEFAULT_TTL)
+
+
+class GameStateStore:
+    """
+    Интерфейс хранилища.
+    version — номер записи ключа: compare_and_set(version=N) пишет, только если
+    ключ не менялся с момента чтения; version=None — только если ключа нет.
+    """
+
+    def __init__(self):
+        self.expired = 0  # Ключей удалено по TTL
+        self.evicted = 0  # Ключей вытеснено по лимиту
+        self.abandoned = 0  # Закрыто брошенных раздач
+
+    async def get_versioned(self, namespace: str, key) -> tuple[Any, int] | None:
+        """Значение и версия или None"""
+        raise NotImplementedError
+
+    async def set(self, namespace: str, key, value: Any, ttl: float | None = None) -> int:
+        """Записать значение. Возвращает новую версию."""
+        raise NotImplementedError
+
+    async def compare_and_set(
+        self, namespace: str, key, value: Any, version: int | None, ttl: float | None = None,
+    ) -> bool:
+        """Записать значение, если версия совпала. Возвращает True при успехе."""
+        raise NotImplementedError
+
+    async def pop(self, namespace: str, key) -> Any | None:
+        """Атомарно забрать и удалить значение"""
+        raise NotImplementedError
+
+    async def delete(self, namespace: str, key) -> bool:
+        """Удалить ключ"""
+        raise NotImplementedError
+
+    async def purge_expired(self) -> list[tuple[str, str, Any]]:
+        """
+        Удалить протухшие ключи, кроме раздач.
+        Возвращает брошенные раздачи (HAND_NAMESPACES): [(namespace, key, value), ...] —
+        они остаются в хранилище, пока их не заберёт take_hand().
+        """
+        raise NotImplementedError
+
+    async def take_hand(self, session, namespace: str, key) -> Any | None:
+        """
+        Забрать брошенную раздачу для закрытия. В БД удаление идёт в транзакции session —
+        коммитится вместе с расчётом, откат возвращает раздачу.
+        None — раздачу уже забрали.
+        """
+        raise NotImplementedError
+
+    async def restore_hand(self, namespace: str, key, value: Any) -> None:
+        """Вернуть раздачу, которую не удалось закрыть (закроется при следующей чистке)"""
+
+    async def stats(self) -> dict:
+        """Метрики: ключей, байт значений, разбивка по пространствам, счётчики удалений"""
+        raise NotImplementedError
+
+    def _counters(self) -> dict:
+        return {"expired": self.expired, "evicted": self.evicted, "abandoned": self.abandoned}
+
+    async def get(self, namespace: str, key, default: Any = None) -> Any:
+        """Значение или default"""
+        item = await self.get_versioned(namespace, key)
+        return item[0] if item is not None else default
+
+
+class MemoryGameStateStore(GameStateStore):
+    """
+    Состояние в памяти процесса: LRU + TTL.
+    Значения тоже хранятся как JSON — поведение совпадает с бэкендом БД
+    (изменения объекта без set() не сохраняются, кортежи становятся списками).
+    Больше max_entries ключей не держит: вытесняются давно не тронутые.
+    """
+
+    def __init__(self, max_entries: int = STATE_MAX_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        # (namespace, key) -> (json, версия, истекает, раздача); порядок — от давно не тронутых к свежим.
+        # Раздача — версия, с которой ключ записан через set(): compare_and_set её не меняет
+        self._items: OrderedDict[tuple[str, str], tuple[str, int, float, int]] = OrderedDict()
+        self._bytes = 0
+        # Раздачи, удалённые до чистки: (namespace, key, значение, раздача)
+        self._abandoned: list[tuple[str, str, Any, int]] = []
+        self._restored = 0  # Возвращённым в очередь раздачам — свои отрицательные номера
+
+    def _drop(self, item_key: tuple[str, str]) -> tuple[str, int, float, int]:
+        item = self._items.pop(item_key)
+        self._bytes -= len(item[0])
+        return item
+
+    def _lost(self, item_key: tuple[str, str], item: tuple[str, int, float, int]) -> None:
+        # Раздачу удалили не игроком — закроем её при следующей чистке
+        if item_key[0] in HAND_NAMESPACES:
+            self._abandoned.append((item_key[0], item_key[1], json.loads(item[0]), item[3]))
+
+    def _forget(self, item_key: tuple[str, str], deal: int) -> None:
+        """Убрать из очереди чистки копии раздачи deal — её закрыли"""
+        self._abandoned = [
+            hand for hand in self._abandoned
+            if (hand[0], hand[1]) != item_key or hand[3] != deal
+        ]
+
+    def _alive(self, item_key: tuple[str, str]) -> tuple[str, int, float, int] | None:
+        item = self._items.get(item_key)
+        if item is None:
+            return None
+        if item[2] <= time.monotonic():
+            self._lost(item_key, self._drop(item_key))
+            self.expired += 1
+            return None
+        self._items.move_to_end(item_key)
+        return item
+
+    def _write(self, item_key: tuple[str, str], value: Any, version: int, deal: int, ttl: float | None) -> None:
+        data = json.dumps(value)
+        self._items[item_key] = (data, version, time.monotonic() + _ttl(item_key[0], ttl), deal)
+        self._items.move_to_end(item_key)
+        self._bytes += len(data)
+
+        while len(self._items) > self.max_entries:
+            oldest_key = next(iter(self._items))
+            self._lost(oldest_key, self._drop(oldest_key))
+            self.evicted += 1
+
+    async def get_versioned(self, namespace: str, key) -> tuple[Any, int] | None:
+        item = self._alive((namespace, str(key)))
+        if item is None:
+            return None
+        return json.loads(item[0]), item[1]
+
+    async def set(self, namespace: str, key, value: Any, ttl: float | None = None) -> int:
+        item_key = (namespace, str(key))
+        item = self._alive(item_key)
+        version = item[1] + 1 if item else 1
+        if item is not None:
+            # Новая раздача поверх незакрытой — старую закроет чистка
+            self._lost(item_key, self._drop(item_key))
+        self._write(item_key, value, version, version, ttl)
+        return version
+
+    async def compare_and_set(
+        self, namespace: str, key, value: Any, version: int | None, ttl: float | None = None,
+    ) -> bool:
+        item_key = (namespace, str(key))
+        item = self._alive(item_key)
+        current = item[1] if item else None
+        if current != version:
+            return False
+        if item is None:
+            await self.set(namespace, key, value, ttl)
+            return True
+
+        # Ход в той же раздаче — значение меняется на месте, старое не брошено
+        self._drop(item_key)
+        self._write(item_key, value, version + 1, item[3], ttl)
+        return True
+
+    async def pop(self, namespace: str, key) -> Any | None:
+        item_key = (namespace, str(key))
+        if self._alive(item_key) is None:
+            return None
+        item = self._drop(item_key)
+        self._forget(item_key, item[3])
+        return json.loads(item[0])
+
+    async def delete(self, namespace: str, key) -> bool:
+        return await self.pop(namespace, key) is not None
+
+    async def purge_expired(self) -> list[tuple[str, str, Any]]:
+        now = time.monotonic()
+        expired = [item_key for item_key, item in self._items.items() if item[2] <= now]
+        for item_key in expired:
+            self._lost(item_key, self._drop(item_key))
+        self.expired += len(expired)
+        return [(namespace, key, value) for namespace, key, value, _ in self._abandoned]
+
+    async def take_hand(self, session, namespace: str, key) -> Any | None:
+        item_key = (namespace, str(key))
+        for hand_namespace, hand_key, value, deal in self._abandoned:
+            if (hand_namespace, hand_key) == item_key:
+                self._forget(item_key, deal)
+                return value
+        return None
+
+    async def restore_hand(self, namespace: str, key, value: Any) -> None:
+        self._restored -= 1
+        self._abandoned.append((namespace, str(key), value, self._restored))
+
+    async def stats(self) -> dict:
+        by_namespace: dict[str, int] = {}
+        for namespace, _ in self._items:
+            by_namespace[namespace] = by_namespace.get(namespace, 0) + 1
+        return {
+            "entries": len(self._items),
+            "bytes": self._bytes,
+            "by_namespace": by_namespace,
+            **self._counters(),
+        }
+
+
+class DatabaseGameStateStore(GameStateStore):
+    """
+    Состояние в таблице fox_game_state.
+    Каждая операция — один оператор в своей короткой транзакции,
+    поэтому не зависит от коммита/отката сессии хендлера.
+    Своя сессия на операцию — поверх сессии хендлера ещё одно соединение пула,
+    поэтому одновременно операций не больше max_connections (остальные ждут).
+    """
+
+    def __init__(self, session_maker=None, max_connections: int = STATE_DB_MAX_CONNECTIONS):
+        super().__init__()
+        self._session_maker = session_maker
+        self._slots = asyncio.Semaphore(max_connections)
+
+    @asynccontextmanager
+    async def _sessions(self):
+        if self._session_maker is None:
+            from database.db import async_session_maker
+            self._session_maker = async_session_maker
+        async with self._slots:
+            async with self._session_maker() as session:
+                yield session
+
+    @staticmethod
+    def _where(namespace: str, key):
+        return (FoxGameState.namespace == namespace, FoxGameState.key == str(key))
+
+    @staticmethod
+    def _alive(now: datetime):
+        return or_(FoxGameState.expires_at.is_(None), FoxGameState.expires_at > now)
+
+    async def _take(self, session, namespace: str, key, expired_only: bool) -> Any | None:
+        """Удалить ключ в транзакции session и вернуть значение (expired_only — только протухший)"""
+        stmt = delete(FoxGameState).where(*self._where(namespace, key))
+        if expired_only:
+            stmt = stmt.where(FoxGameState.expires_at <= datetime.utcnow())
+        result = await session.execute(stmt.returning(FoxGameState.value))
+        value = result.scalar_one_or_none()
+        return json.loads(value) if value is not None else None
+
+    async def _settle_previous(self, session, namespace: str, key, expired_only: bool) -> None:
+        """
+        Закрыть раздачу, которую сейчас перезапишут: удаление и расчёт — одним коммитом.
+        Не получилось закрыть — исключение, старая раздача остаётся на месте.
+        """
+        if namespace not in HAND_NAMESPACES:
+            return
+        previous = await self._take(session, namespace, key, expired_only)
+        if previous is not None:
+            await settle_hand(session, namespace, key, previous)
+            self.abandoned += 1
+
+    async def get_versioned(self, namespace: str, key) -> tuple[Any, int] | None:
+        async with self._sessions() as session:
+            result = await session.execute(
+                select(FoxGameState.value, FoxGameState.version)
+                .where(*self._where(namespace, key), self._alive(datetime.utcnow()))
+            )
+            row = result.one_or_none()
+        if row is None:
+            return None
+        return json.loads(row.value), row.version
+
+    async def set(self, namespace: str, key, value: Any, ttl: float | None = None) -> int:
+        now = datetime.utcnow()
+        stmt = insert(FoxGameState).values(
+            namespace=namespace,
+            key=str(key),
+            value=json.dumps(value),
+            version=1,
+            expires_at=now + timedelta(seconds=_ttl(namespace, ttl)),
+            updated_at=now,
+        )
+        async with self._sessions() as session:
+            await self._settle_previous(session, namespace, key, expired_only=False)
+            result = await session.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[FoxGameState.namespace, FoxGameState.key],
+                    set_={
+                        "value": stmt.excluded.value,
+                        "version": FoxGameState.version + 1,
+                        "expires_at": stmt.excluded.expires_at,
+                        "updated_at": stmt.excluded.updated_at,
+                    },
+                )
+                .returning(FoxGameState.version)
+            )
+            version = result.scalar_one()
+            await session.commit()
+        return version
+
+    async def compare_and_set(
+        self, namespace: str, key, value: Any, version: int | None, ttl: float | None = None,
+    ) -> bool:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=_ttl(namespace, ttl))
+
+        if version is None:
+            # Только если ключа нет (или он протух)
+            stmt = insert(FoxGameState).values(
+                namespace=namespace,
+                key=str(key),
+                value=json.dumps(value),
+                version=1,
+                expires_at=expires_at,
+                updated_at=now,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[FoxGameState.namespace, FoxGameState.key],
+                set_={
+                    "value": stmt.excluded.value,
+                    "version": FoxGameState.version + 1,
+                    "expires_at": stmt.excluded.expires_at,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+                where=FoxGameState.expires_at <= now,
+            )
+        else:
+            stmt = (
+                update(FoxGameState)
+                .where(
+                    *self._where(namespace, key),
+                    FoxGameState.version == version,
+                    self._alive(now),
+                )
+                .values(
+                    value=json.dumps(value),
+                    version=FoxGameState.version + 1,
+                    expires_at=expires_at,
+                    updated_at=now,
+                )
+            )
+
+        async with self._sessions() as session:
+            if version is None:
+                await self._settle_previous(session, namespace, key, expired_only=True)
+            result = await session.execute(stmt.returning(FoxGameState.version))
+            success = result.scalar_one_or_none() is not None
+            await session.commit()
+        return success
+
+    async def pop(self, namespace: str, key) -> Any | None:
+        # Протухшие не трогаем — их заберёт чистка (и закроет брошенную раздачу)
+        async with self._sessions() as session:
+            result = await session.execute(
+                delete(FoxGameState)
+                .where(*self._where(namespace, key), self._alive(datetime.utcnow()))
+                .returning(FoxGameState.value)
+            )
+            value = result.scalar_one_or_none()
+            await session.commit()
+        if value is None:
+            return None
+        return json.loads(value)
+
+    async def delete(self, namespace: str, key) -> bool:
+        return await self.pop(namespace, key) is not None
+
+    async def purge_expired(self) -> list[tuple[str, str, Any]]:
+        now = datetime.utcnow()
+        async with self._sessions() as session:
+            result = await session.execute(
+                delete(FoxGameState)
+                .where(FoxGameState.expires_at <= now, FoxGameState.namespace.not_in(HAND_NAMESPACES))
+            )
+            self.expired += result.rowcount
+            await session.commit()
+
+            # Раздачи удаляются только вместе с расчётом (take_hand)
+            result = await session.execute(
+                select(FoxGameState.namespace, FoxGameState.key, FoxGameState.value)
+                .where(FoxGameState.expires_at <= now, FoxGameState.namespace.in_(HAND_NAMESPACES))
+            )
+            rows = result.all()
+        return [(row.namespace, row.key, json.loads(row.value)) for row in rows]
+
+    async def take_hand(self, session, namespace: str, key) -> Any | None:
+        value = await self._take(session, namespace, key, expired_only=True)
+        if value is not None:
+            self.expired += 1
+        return value
+
+    async def stats(self) -> dict:
+        async with self._sessions() as session:
+            result = await session.execute(
+                select(
+                    FoxGameState.namespace,
+                    func.count(),
+                    func.coalesce(func.sum(func.octet_length(FoxGameState.value)), 0),
+                )
+                .group_by(FoxGameState.namespace)
+            )
+            rows = result.all()
+        return {
+            "entries": sum(count for _, count, _ in rows),
+            "bytes": int(sum(size for _, _, size in rows)),
+            "by_namespace": {namespace: count for namespace, count, _ in rows},
+            **self._counters(),
+        }
+
+
+_store: GameStateStore | None = None
+
+
+def get_state_store() -> GameStateStore:
+    """Хранилище состояния (создаётся по GAME_STATE_BACKEND при первом обращении)"""
+    global _store
+    if _store is None:
+        _store = DatabaseGameStateStore() if GAME_STATE_BACKEND == "db" else MemoryGameStateStore()
+    return _store
+
+
+def set_state_store(store: GameStateStore) -> None:
+    """Подключить своё хранилище (например, Redis)"""
+    global _store
+    _store = store
+
+
+# ==================== Фоновая чистка ====================
+
+_sweeper_task: asyncio.Task | None = None
+
+
+async def settle_hand(session, namespace: str, key, value: Any) -> None:
+    """Закрыть брошенную раздачу по ABANDONED_HAND_POLICY и закоммитить session"""
+    from .casino import settle_abandoned_hand
+
+    await settle_abandoned_hand(session, namespace, int(key), value, ABANDONED_HAND_POLICY)
+    await session.commit()
+
+
+async def sweep_state() -> int:
+    """
+    Вычистить протухшие ключи и закрыть брошенные раздачи по ABANDONED_HAND_POLICY.
+    Раздача удаляется из хранилища только вместе с успешным расчётом.
+    Возвращает количество закрытых раздач.
+    """
+    from database.db import async_session_maker
+
+    store = get_state_store()
+    hands = await store.purge_expired()
+
+    settled = 0
+    for namespace, key, _ in hands:
+        value = None
+        try:
+            async with async_session_maker() as session:
+                value = await store.take_hand(session, namespace, key)
+                if value is None:
+                    continue  # Уже закрыл другой воркер
+                await settle_hand(session, namespace, key, value)
+            settled += 1
+        except Exception as e:
+            if value is not None:
+                await store.restore_hand(namespace, key, value)
+            logger.error(f"[Gamification] Не удалось закрыть брошенную раздачу {namespace}:{key}: {e}")
+    store.abandoned += settled
+
+    stats = await store.stats()
+    logger.debug(
+        f"[Gamification] Состояние игр: {stats['entries']} ключей, {stats['bytes']} байт, "
+        f"протухло {stats['expired']}, вытеснено {stats['evicted']}, брошено раздач {stats['abandoned']}"
+    )
+    return settled
+
+
+async def _sweep_loop():
+    """Фоновая чистка состояния"""
+    while True:
+        await asyncio.sleep(STATE_SWEEP_INTERVAL)
+        try:
+            await sweep_state()
+        except Exception as e:
+            logger.warning(f"[Gamification] Ошибка чистки состояния игр: {e}")
+
+
+def start_state_sweeper():
+    """Запустить фоновую чистку состояния"""
+    global _sweeper_task
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.create_task(_sweep_loop())
+
+
+def stop_state_sweeper():
+    """Остановить фоновую чистку"""
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        _sweeper_task = None
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Корень проекта бота (модуль лежит в modules/gamification) — как в скриптах модуля
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
@@ -0,0 +1,34 @@
+"""
+Симулятор RTP: при параметрах по умолчанию каждая игра укладывается в свой коридор RTP_BANDS.
+"""
+import argparse
+
+import numpy as np
+import pytest
+
+from modules.gamification import simulator
+from modules.gamification.casino import MIN_BET
+from modules.gamification.jackpot import JACKPOT_START_POOL
+
+ROUNDS = 2_000_000  # Ошибка RTP ~0.5% даже у слотов — много меньше ширины коридоров
+SEED = 20240601
+
+
+@pytest.mark.parametrize("game", list(simulator.GAMES))
+def test_rtp_within_band(game):
+    args = argparse.Namespace(
+        boost=0, bet=MIN_BET, golden_hour=False, night=False, jackpot_pool=JACKPOT_START_POOL, days_since=0,
+    )
+    result = simulator.GAMES[game](np.random.default_rng(SEED), ROUNDS, args)
+
+    assert result.rounds == ROUNDS
+    assert simulator.check_band(result)
+
+
+def test_slots_jackpot_is_rolled_per_spin():
+    result = simulator.simulate_slots(np.random.default_rng(SEED), ROUNDS)
+
+    # try_win_jackpot: шанс JACKPOT_WIN_CHANCE на каждом спине, не «три лисы»
+    expected = ROUNDS * simulator.slots_jackpot.JACKPOT_WIN_CHANCE
+    assert abs(result.jackpot_hits - expected) < 5 * expected ** 0.5
+    assert result.jackpot_sum > 0
@@ -0,0 +1,64 @@
+"""
+Хранилище состояния в памяти: брошенные раздачи.
+Ход в раздаче (compare_and_set) не должен ставить её в очередь чистки,
+закрытая игроком раздача (pop) — закрываться чисткой повторно.
+"""
+import asyncio
+
+from modules.gamification import state_store
+from modules.gamification.state_store import STATE_BLACKJACK, STATE_HILO, MemoryGameStateStore
+
+
+def _sweep(monkeypatch, store) -> list:
+    """Прогнать sweep_state на store; вернуть закрытые чисткой раздачи"""
+    settled = []
+
+    async def settle_hand(session, namespace, key, value):
+        settled.append((namespace, key, value))
+
+    monkeypatch.setattr(state_store, "settle_hand", settle_hand)
+    monkeypatch.setattr(state_store, "_store", store)
+    asyncio.run(state_store.sweep_state())
+    return settled
+
+
+def test_cas_then_pop_is_not_swept(monkeypatch):
+    store = MemoryGameStateStore()
+
+    async def play():
+        await store.set(STATE_BLACKJACK, 1, {"bet": 10, "player": "0102"})
+        value, version = await store.get_versioned(STATE_BLACKJACK, 1)
+        assert await store.compare_and_set(STATE_BLACKJACK, 1, {"bet": 10, "player": "010203"}, version)
+        assert await store.pop(STATE_BLACKJACK, 1) == {"bet": 10, "player": "010203"}
+
+    asyncio.run(play())
+    assert _sweep(monkeypatch, store) == []
+
+
+def test_cas_keeps_version_check():
+    store = MemoryGameStateStore()
+
+    async def play():
+        await store.set(STATE_HILO, 1, {"bet": 10, "round": 1})
+        _, version = await store.get_versioned(STATE_HILO, 1)
+        assert await store.compare_and_set(STATE_HILO, 1, {"bet": 10, "round": 2}, version)
+        assert not await store.compare_and_set(STATE_HILO, 1, {"bet": 10, "round": 3}, version)
+        return await store.get(STATE_HILO, 1)
+
+    assert asyncio.run(play()) == {"bet": 10, "round": 2}
+
+
+def test_new_deal_over_unsettled_hand_is_swept_once(monkeypatch):
+    store = MemoryGameStateStore()
+
+    async def play():
+        await store.set(STATE_HILO, 1, {"bet": 10, "round": 1})
+        _, version = await store.get_versioned(STATE_HILO, 1)
+        await store.compare_and_set(STATE_HILO, 1, {"bet": 10, "round": 2}, version)
+        # Новая раздача поверх незакрытой — старая уходит в чистку, новую игрок закрывает сам
+        await store.set(STATE_HILO, 1, {"bet": 20, "round": 1})
+        await store.pop(STATE_HILO, 1)
+
+    asyncio.run(play())
+    assert _sweep(monkeypatch, store) == [(STATE_HILO, "1", {"bet": 10, "round": 2})]
+    assert _sweep(monkeypatch, store) == []
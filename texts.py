@@ -18,3 +18,6 @@ BTN_MY_PRIZES = "🎁 Мои призы"
 BTN_BALANCE = "🦊 Баланс"
 BTN_UPGRADES = "🛒 Магазин"
 BTN_BACK = "⬅️ Назад"
+
+# Ставку не удалось рассчитать
+GAME_NOT_COUNTED_TEXT = "❌ Недостаточно средств — игра не засчитана"